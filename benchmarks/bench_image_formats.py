@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+# Compares master screenshot formats: encode time in the worker's image
+# post-processing, decode time for the viewer panel and the thumbnail column,
+# and disk footprint. Uses real masters from cache/ when there are any,
+# otherwise synthetic page-like screenshots.
+#
+#   python benchmarks/bench_image_formats.py [--samples 20] [--cache cache]
+
+import argparse
+import glob
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from io import BytesIO
+from PIL import Image, ImageDraw
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from image_pipeline import (ImageOptions, SCREENSHOT_WIDTH, SCREENSHOT_HEIGHT, DEPTH_MULTIPLIER, THUMB_WIDTH,
+                            THUMB_FINAL_HEIGHT, VIEWER_WIDTH, VIEWER_HEIGHT, process_capture, decode_for_display,
+                            viewer_path)
+
+CONFIGS = [
+    ("png", {"compress_level": 1}),
+    ("png", {"compress_level": 6}),
+    ("png", {"compress_level": 9}),
+    ("jpeg", {"quality": 75}),
+    ("jpeg", {"quality": 90}),
+    ("webp", {"quality": 75}),
+    ("webp", {"quality": 90}),
+]
+
+def synthetic_screenshot(seed):
+    """A page-like screenshot: header bar, text lines, a photo-ish hero block."""
+    rng = random.Random(seed)
+    height = int(SCREENSHOT_HEIGHT * DEPTH_MULTIPLIER)
+    img = Image.new("RGB", (SCREENSHOT_WIDTH, height), "white")
+    draw = ImageDraw.Draw(img)
+    draw.rectangle((0, 0, SCREENSHOT_WIDTH, 60), fill=(rng.randrange(256), rng.randrange(256), rng.randrange(256)))
+    hero = Image.effect_noise((SCREENSHOT_WIDTH // 2, 300), 60).convert("RGB")
+    img.paste(hero.resize((SCREENSHOT_WIDTH - 80, 300)), (40, 90))
+    y = 420
+    while y < height - 20:
+        x = 40
+        while x < SCREENSHOT_WIDTH - 80:
+            word = rng.randrange(20, 90)
+            draw.rectangle((x, y, x + word, y + 10), fill=(40, 40, 40))
+            x += word + 8
+        y += rng.choice((22, 22, 22, 40))
+    buf = BytesIO()
+    img.save(buf, format="PNG")
+    return buf.getvalue()
+
+def load_samples(cache_dir, count):
+    masters = sorted(p for p in glob.glob(os.path.join(cache_dir, "*.png")) if "_" not in os.path.basename(p))[:count]
+    samples = []
+    for path in masters:
+        with open(path, "rb") as f:
+            samples.append((f.read(), "https://example.org/"))
+    while len(samples) < count:
+        samples.append((synthetic_screenshot(len(samples)), "https://example.org/"))
+    return samples, len(masters)
+
+def timed(fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - started, result
+
+def bench_config(samples, work_dir, name, kwargs):
+    options = ImageOptions(name, **kwargs)
+    encode, view_decode, variant_decode, thumb_decode, sizes, thumb_sizes = [], [], [], [], [], []
+    for i, (img_bytes, url) in enumerate(samples):
+        master_path = os.path.join(work_dir, f"s{i}{options.extension}")
+        seconds, (master_size, pixels) = timed(process_capture, img_bytes, url, master_path, options)
+        encode.append(seconds)
+        sizes.append(master_size)
+
+        seconds, _ = timed(decode_for_display, master_path, VIEWER_WIDTH, VIEWER_HEIGHT)
+        view_decode.append(seconds)
+        # The pre-scaled variant the viewer cache actually reads
+        seconds, _ = timed(decode_for_display, viewer_path(master_path), VIEWER_WIDTH, VIEWER_HEIGHT)
+        variant_decode.append(seconds)
+
+        # What a per-file thumbnail in this format would cost to load, for
+        # comparison with the atlas, which stores raw pixels
+        thumb_path = os.path.join(work_dir, f"s{i}_thumb{options.extension}")
+        Image.frombytes("RGB", (THUMB_WIDTH, THUMB_FINAL_HEIGHT), pixels).save(thumb_path, **options.save_kwargs())
+        thumb_sizes.append(os.path.getsize(thumb_path))
+        seconds, _ = timed(lambda p: Image.open(p).convert("RGB").tobytes(), thumb_path)
+        thumb_decode.append(seconds)
+
+    label = f"{name} " + " ".join(f"{k}={v}" for k, v in kwargs.items())
+    return {
+        "config": label,
+        "encode_ms": statistics.median(encode) * 1000,
+        "view_decode_ms": statistics.median(view_decode) * 1000,
+        "variant_decode_ms": statistics.median(variant_decode) * 1000,
+        "thumb_decode_ms": statistics.median(thumb_decode) * 1000,
+        "master_kb": statistics.fmean(sizes) / 1024,
+        "thumb_kb": statistics.fmean(thumb_sizes) / 1024,
+    }
+
+def bench_atlas_read(samples):
+    # Raw slot copy, which is all load_thumbnail does besides wx.Bitmap.FromBuffer
+    slot = bytes(THUMB_WIDTH * THUMB_FINAL_HEIGHT * 3) * len(samples)
+    size = THUMB_WIDTH * THUMB_FINAL_HEIGHT * 3
+    started = time.perf_counter()
+    for i in range(len(samples)):
+        bytes(memoryview(slot)[i * size:(i + 1) * size])
+    return (time.perf_counter() - started) / len(samples) * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark master screenshot formats")
+    parser.add_argument("--samples", type=int, default=20, help="Screenshots per configuration")
+    parser.add_argument("--cache", default="cache", help="Cache directory to take real masters from")
+    args = parser.parse_args()
+
+    samples, real = load_samples(args.cache, args.samples)
+    print(f"{len(samples)} samples ({real} from {args.cache}, {len(samples) - real} synthetic)\n")
+    print(f"{'config':<22} {'encode ms':>10} {'viewer ms':>10} {'variant ms':>11} {'thumb ms':>9} "
+          f"{'master KB':>10} {'thumb KB':>9}")
+    with tempfile.TemporaryDirectory() as work_dir:
+        for name, kwargs in CONFIGS:
+            r = bench_config(samples, work_dir, name, kwargs)
+            print(f"{r['config']:<22} {r['encode_ms']:>10.1f} {r['view_decode_ms']:>10.1f} {r['variant_decode_ms']:>11.1f} "
+                  f"{r['thumb_decode_ms']:>9.2f} {r['master_kb']:>10.1f} {r['thumb_kb']:>9.1f}")
+    raw_kb = THUMB_WIDTH * THUMB_FINAL_HEIGHT * 3 / 1024
+    print(f"{'atlas (raw RGB)':<22} {'':>10} {'':>10} {'':>11} {bench_atlas_read(samples):>9.2f} {'':>10} {raw_kb:>9.1f}")
+    print("\nencode: decode + crop + resize + master and viewer variant encode (process_capture);"
+          "\nviewer: decode_for_display of the master; variant: of the pre-scaled viewer JPEG;"
+          "\nthumb: decoding a per-file thumbnail in that format vs. reading an atlas slot")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# Memory per record of the project list, without wx: the old layout (a dict
+# per record from parse_records, a ProjectNode with a __dict__ and a children
+# list per row, filter results as frozensets) against the RecordStore, slotted
+# nodes and row arrays main.py uses now. Records are decoded from JSON text,
+# as they are from oshwa_projects.json, so no string is shared by accident.
+#
+#   python benchmarks/bench_memory.py [--rows 50000]
+
+import argparse
+import gc
+import json
+import os
+import sys
+import tracemalloc
+from array import array
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from oshwa_parser import parse_records
+from record_store import RecordStore, build_nodes
+from search_index import SearchIndex
+from synthetic import api_records
+
+class LegacyNode:
+    # ProjectNode as it was before the record store
+    def __init__(self, parent, data=None, is_category=False, row=None):
+        self.parent = parent
+        self.data = data or {}
+        self.is_category = is_category
+        self.row = row
+        self.children = []
+        self.expanded = False
+
+def legacy_nodes(data):
+    nodes = []
+    category_nodes = {}
+    for row, item in enumerate(data):
+        cat_name = item.get('primaryType', 'Unknown') or 'Unknown'
+        cat_node = category_nodes.get(cat_name)
+        if cat_node is None:
+            cat_node = LegacyNode(None, {'name': cat_name}, is_category=True)
+            category_nodes[cat_name] = cat_node
+        nodes.append(LegacyNode(cat_node, item, is_category=False, row=row))
+    return nodes, category_nodes
+
+def load_dicts(text):
+    return parse_records(json.loads(text))
+
+def load_store(text):
+    return RecordStore(parse_records(json.loads(text)))
+
+def all_rows_set(count):
+    return frozenset(range(count))
+
+def all_rows_array(count):
+    return array('I', range(count))
+
+def measured(build, *args):
+    """Returns (result, bytes still allocated for it once build(*args) is done)."""
+    gc.collect()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build(*args)
+    gc.collect()
+    return result, tracemalloc.get_traced_memory()[0] - before
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark memory per project record")
+    parser.add_argument("--rows", type=int, default=50000, help="Synthetic records to load")
+    args = parser.parse_args()
+
+    text = json.dumps(api_records(args.rows))
+    tracemalloc.start()
+
+    dicts, dicts_bytes = measured(load_dicts, text)
+    nodes, legacy_nodes_bytes = measured(legacy_nodes, dicts)
+    all_rows, legacy_rows_bytes = measured(all_rows_set, len(dicts))
+    del dicts, nodes, all_rows
+
+    store, store_bytes = measured(load_store, text)
+    nodes, nodes_bytes = measured(build_nodes, store)
+    all_rows, rows_bytes = measured(all_rows_array, len(store))
+    _, index_bytes = measured(SearchIndex, store)
+    tracemalloc.stop()
+
+    n = len(store)
+    print(f"{n} records; bytes per record\n")
+    print(f"{'':<24} {'before':>8} {'after':>8}")
+    for label, old, new in (("records", dicts_bytes, store_bytes),
+                            ("tree nodes", legacy_nodes_bytes, nodes_bytes),
+                            ("filter result (all rows)", legacy_rows_bytes, rows_bytes)):
+        print(f"{label:<24} {old / n:>8.0f} {new / n:>8.0f}")
+    total_old = dicts_bytes + legacy_nodes_bytes + legacy_rows_bytes
+    total_new = store_bytes + nodes_bytes + rows_bytes
+    print(f"{'total':<24} {total_old / n:>8.0f} {total_new / n:>8.0f}")
+    print(f"\nFor scale, the search index adds {index_bytes / n:.0f} bytes per record either way.")
+
+if __name__ == "__main__":
+    main()
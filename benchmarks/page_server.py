@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# Local static site for capture throughput runs: every path under /p/ is a
+# generated project page (header, hero image, paragraphs, a gallery), the
+# same for the same path, with images served from /img/. Optional latency
+# per response stands in for slow hosts, and paths containing "fail" answer
+# 503 so error handling shows up in the numbers.
+#
+#   python benchmarks/page_server.py --port 8766 --latency 0.05
+#   python benchmarks/synthetic.py 500 --site http://127.0.0.1:8766 > sites.json
+
+import argparse
+import hashlib
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+from PIL import Image
+
+DEFAULT_PORT = 8766
+IMAGE_COUNT = 8
+HERO_SIZE = (960, 320)
+GALLERY_SIZE = (300, 200)
+GALLERY_IMAGES = 3
+PARAGRAPHS = (4, 12)
+
+WORDS = ("open source hardware board sensor module controller wireless modular printed low cost kit "
+         "robot arm keyboard synth amplifier microscope weather station solar tracker battery charger").split()
+
+def make_images(seed=0):
+    """PNG bytes for the hero and gallery images, generated once per server."""
+    rng = random.Random(seed)
+    images = {}
+    for i in range(IMAGE_COUNT):
+        size = HERO_SIZE if i % 2 == 0 else GALLERY_SIZE
+        noise = Image.effect_noise((size[0] // 4, size[1] // 4), rng.randint(20, 80)).convert("RGB")
+        tint = Image.new("RGB", noise.size, (rng.randrange(256), rng.randrange(256), rng.randrange(256)))
+        img = Image.blend(noise, tint, 0.5).resize(size)
+        buf = BytesIO()
+        img.save(buf, format="PNG")
+        images[f"/img/{i}.png"] = buf.getvalue()
+    return images
+
+def render_page(path) -> bytes:
+    rng = random.Random(hashlib.sha256(path.encode("utf-8")).digest())
+    title = " ".join(rng.choice(WORDS) for _ in range(rng.randint(2, 4))).title()
+    hue = rng.randrange(360)
+    heroes = list(range(0, IMAGE_COUNT, 2))
+    gallery = list(range(1, IMAGE_COUNT, 2))
+    paragraphs = "\n".join(
+        "<p>" + " ".join(rng.choice(WORDS) for _ in range(rng.randint(30, 90))).capitalize() + ".</p>"
+        for _ in range(rng.randint(*PARAGRAPHS)))
+    images = "\n".join(f'<img src="/img/{rng.choice(gallery)}.png" width="{GALLERY_SIZE[0]}" height="{GALLERY_SIZE[1]}">'
+                       for _ in range(GALLERY_IMAGES))
+    html = f"""<!doctype html>
+<html><head><meta charset="utf-8"><title>{title}</title>
+<style>
+body {{ margin: 0; font-family: sans-serif; color: #222; }}
+header {{ background: hsl({hue}, 60%, 35%); color: white; padding: 16px 40px; font-size: 24px; }}
+main {{ max-width: 960px; margin: 0 auto; padding: 24px; line-height: 1.5; }}
+.gallery img {{ margin-right: 12px; }}
+</style></head>
+<body><header>{title}</header>
+<main>
+<img src="/img/{rng.choice(heroes)}.png" width="{HERO_SIZE[0]}" height="{HERO_SIZE[1]}">
+<h1>{title}</h1>
+{paragraphs}
+<div class="gallery">{images}</div>
+</main></body></html>
+"""
+    return html.encode("utf-8")
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.requests += 1
+        if server.latency:
+            time.sleep(server.latency)
+        path = self.path.split("?", 1)[0].split("#", 1)[0]
+        if path in server.images:
+            return self.reply(200, "image/png", server.images[path])
+        if not path.startswith("/p/"):
+            return self.reply(404, "text/plain", b"not found")
+        if "fail" in path:
+            return self.reply(503, "text/plain", b"unavailable")
+        self.reply(200, "text/html; charset=utf-8", render_page(path))
+
+    def reply(self, status, content_type, body):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+def serve(port=0, latency=0.0, verbose=False):
+    """Starts the site on a background thread; returns the server (its .url, .requests and .shutdown())."""
+    server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    server.daemon_threads = True
+    server.images = make_images()
+    server.latency = latency
+    server.verbose = verbose
+    server.requests = 0
+    server.lock = threading.Lock()
+    server.url = f"http://127.0.0.1:{server.server_address[1]}"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve generated project pages for capture benchmarks")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="Port to listen on (127.0.0.1)")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every response")
+    parser.add_argument("--verbose", action="store_true", help="Log every request")
+    args = parser.parse_args()
+
+    server = serve(args.port, args.latency, args.verbose)
+    print(f"Serving generated pages at {server.url}/p/<anything>", file=sys.stderr)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        print(f"\n{server.requests} requests", file=sys.stderr)
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
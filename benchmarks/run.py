@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+# Benchmark suite: parse, search and filter, tree nodes, sorting, facets, snapshot
+# and capture throughput, on synthetic datasets of the given sizes. Results
+# are written as JSON so two runs (say, before and after a change) can be
+# compared metric by metric.
+#
+#   python benchmarks/run.py --sizes 10000,100000 --out before.json
+#   python benchmarks/run.py --sizes 10000,100000 --out after.json --baseline before.json
+#   python benchmarks/run.py --compare before.json after.json
+#   python benchmarks/run.py --only capture --captures 200 --capture-latency 0.05
+
+import argparse
+import functools
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from facets import FacetIndex
+from oshwa_parser import parse_oshwa_projects, parse_records
+from record_store import RecordStore, build_nodes
+from search_index import SearchIndex, diff_rows
+from snapshot import Dataset, read_snapshot, write_snapshot, source_key
+from sort_keys import SortKeys, WARM_COLUMNS, DATE_COLUMN
+from synthetic import api_records
+import page_server
+
+DEFAULT_SIZES = (10000, 100000)
+DEFAULT_REPEAT = 5
+DEFAULT_THRESHOLD = 0.10 # Relative change reported as a regression
+DEFAULT_CAPTURES = 100
+
+# Someone typing "sensor board" into the search box, then refining with a regex
+TYPED_QUERIES = ["s", "se", "sen", "sens", "senso", "sensor", "sensor b", "sensor bo", "sensor board"]
+COLD_QUERIES = ["robot", "weather station", "US0000", "microscope kit", "zzz"]
+REGEX_QUERY = r"solar\s+(tracker|charger)"
+SORT_COLUMNS = (3, DATE_COLUMN) # Project name, certification date
+
+class Results:
+    def __init__(self):
+        self.entries = []
+
+    def add(self, bench, metric, value, unit, size=None, higher_is_better=False):
+        self.entries.append({"bench": bench, "size": size, "metric": metric, "value": value, "unit": unit,
+                             "higher_is_better": higher_is_better})
+        label = f"{bench}.{metric}" + (f" @{size}" if size else "")
+        print(f"  {label:<44} {value:>12.4g} {unit}", file=sys.stderr)
+
+def timed(fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - started, result
+
+def median_seconds(fn, repeat):
+    return statistics.median(timed(fn)[0] for _ in range(repeat))
+
+class SizeContext:
+    """One synthetic dataset and what the benchmarks build from it, built once and shared."""
+
+    def __init__(self, size, work_dir, seed):
+        self.size = size
+        self.path = os.path.join(work_dir, f"projects_{size}.json")
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump(api_records(size, seed), f)
+        self.store = None
+        self.index = None
+        self.sort_columns = None
+        self.facets = None
+
+def bench_parse(ctx, results, repeat):
+    seconds, records = timed(parse_oshwa_projects, ctx.path)
+    results.add("parse", "parse_s", seconds, "s", ctx.size)
+    seconds, ctx.store = timed(RecordStore, records)
+    results.add("parse", "store_s", seconds, "s", ctx.size)
+    results.add("parse", "file_mb", os.path.getsize(ctx.path) / 1e6, "MB", ctx.size)
+
+def bench_search(ctx, results, repeat):
+    seconds, ctx.index = timed(SearchIndex, ctx.store)
+    results.add("search", "index_build_s", seconds, "s", ctx.size)
+
+    def typed():
+        ctx.index.search("") # Start from a cleared box, as the GUI does
+        for query in TYPED_QUERIES:
+            ctx.index.search(query)
+    results.add("search", "typed_sequence_ms", median_seconds(typed, repeat) * 1000, "ms", ctx.size)
+
+    def cold():
+        for query in COLD_QUERIES:
+            ctx.index._last_tokens = None # No narrowing from the previous query
+            ctx.index.search(query)
+    results.add("search", "cold_query_ms", median_seconds(cold, repeat) * 1000 / len(COLD_QUERIES), "ms", ctx.size)
+    results.add("search", "regex_ms", median_seconds(lambda: ctx.index.search(REGEX_QUERY, True), repeat) * 1000,
+                "ms", ctx.size)
+
+    # What apply_filter does between two results: everything -> a query -> everything
+    everything = ctx.index.search("")
+    narrowed = ctx.index.search("sensor")
+    def diffs():
+        diff_rows(everything, narrowed)
+        diff_rows(narrowed, everything)
+    results.add("filter", "diff_all_to_query_and_back_ms", median_seconds(diffs, repeat) * 1000, "ms", ctx.size)
+
+def bench_nodes(ctx, results, repeat):
+    results.add("tree", "build_nodes_s", median_seconds(lambda: build_nodes(ctx.store), repeat), "s", ctx.size)
+
+def bench_sort(ctx, results, repeat):
+    keys = SortKeys(ctx.store)
+    seconds, _ = timed(keys.warm, WARM_COLUMNS)
+    results.add("sort", "warm_keys_s", seconds, "s", ctx.size)
+    ctx.sort_columns = keys.built_columns()
+    rows = list(range(len(ctx.store)))
+    for col in SORT_COLUMNS:
+        # The DataViewCtrl sorts through Compare, one comparator call per comparison
+        compare = functools.cmp_to_key(lambda a, b, col=col: keys.compare(a, b, col))
+        seconds, _ = timed(lambda: sorted(rows, key=compare))
+        results.add("sort", f"compare_sort_col{col}_s", seconds, "s", ctx.size)
+
+def bench_facets(ctx, results, repeat):
+    seconds, ctx.facets = timed(FacetIndex, ctx.store)
+    results.add("facets", "index_build_s", seconds, "s", ctx.size)
+    everything = ctx.index.search("")
+    narrowed = ctx.index.search("sensor")
+    # Two countries, then a type within them, as someone clicking through the panel would
+    countries = frozenset(ctx.facets.values("country")[:2])
+    selection = {"country": countries, "primaryType": frozenset(ctx.facets.values("primaryType")[:1])}
+    results.add("facets", "counts_only_ms", median_seconds(lambda: ctx.facets.filter(everything, {}), repeat) * 1000,
+                "ms", ctx.size)
+    results.add("facets", "select_ms", median_seconds(lambda: ctx.facets.filter(everything, selection), repeat) * 1000,
+                "ms", ctx.size)
+    results.add("facets", "select_with_query_ms",
+                median_seconds(lambda: ctx.facets.filter(narrowed, selection), repeat) * 1000, "ms", ctx.size)
+
+def bench_snapshot(ctx, results, repeat):
+    dataset = Dataset(ctx.store, ctx.index, ctx.sort_columns, ctx.facets)
+    path = ctx.path + ".snapshot"
+    seconds, _ = timed(write_snapshot, path, source_key(ctx.path), dataset)
+    results.add("snapshot", "write_s", seconds, "s", ctx.size)
+    results.add("snapshot", "load_s", median_seconds(lambda: read_snapshot(path), min(repeat, 3)), "s", ctx.size)
+    results.add("snapshot", "file_mb", os.path.getsize(path) / 1e6, "MB", ctx.size)
+    os.remove(path)
+
+SIZE_BENCHES = {
+    "parse": bench_parse,
+    "search": bench_search,
+    "tree": bench_nodes,
+    "sort": bench_sort,
+    "facets": bench_facets,
+    "snapshot": bench_snapshot,
+}
+# Benchmarks reuse what earlier ones built; these always run first
+DEPENDS = {"search": {"parse"}, "tree": {"parse"}, "sort": {"parse"}, "facets": {"parse", "search"},
+           "snapshot": {"parse", "search", "sort", "facets"}}
+
+def bench_capture(results, work_dir, captures, concurrency, latency) -> bool:
+    """
+    Captures against page_server.py through prefetch(), in a scratch cache
+    directory. Throughput counts successful captures only, and is not
+    recorded at all when any capture failed; returns False then.
+    """
+    from playwright_worker import playwright_available
+    if not playwright_available():
+        # The worker imports Playwright on its first capture, so check up front
+        print("  capture: skipped (Playwright is not installed)", file=sys.stderr)
+        return True
+    from prefetch import prefetch
+    server = page_server.serve(latency=latency)
+    records = parse_records(api_records(captures, seed=1, site=server.url))
+    cwd = os.getcwd()
+    os.chdir(work_dir) # The worker writes to ./cache
+    try:
+        summary = prefetch(records, concurrency, force=True, min_host_interval=0.0, per_host_limit=concurrency)
+    finally:
+        os.chdir(cwd)
+        server.shutdown()
+    results.add("capture", "failed", summary["failed"], "captures")
+    if summary["failed"]:
+        # By kind from the worker, which also covers a browser that never started
+        reasons = ", ".join(f"{kind} x{n}" for kind, n in list(summary["error_kinds"].items())[:3])
+        print(f"  capture: {summary['failed']} of {captures} captures failed ({reasons}); "
+              f"throughput not recorded", file=sys.stderr)
+        return False
+    per_minute = summary["captured"] / summary["elapsed"] * 60 if summary["elapsed"] else 0.0
+    results.add("capture", "captures_per_min", per_minute, "/min", higher_is_better=True)
+    for mode, stats in summary["latency"].items():
+        results.add("capture", f"{mode}_p50_s", stats["p50"], "s")
+        results.add("capture", f"{mode}_p95_s", stats["p95"], "s")
+    return True
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "describe", "--always", "--dirty"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def entry_key(entry):
+    return (entry["bench"], entry["metric"], entry["size"])
+
+def compare(base, new, threshold=DEFAULT_THRESHOLD) -> int:
+    """Prints every metric present in both runs; returns the number of regressions."""
+    base_entries = {entry_key(e): e for e in base["results"]}
+    print(f"{base['meta'].get('git')} -> {new['meta'].get('git')}")
+    print(f"{'metric':<48} {'base':>10} {'new':>10} {'change':>8}")
+    regressions = 0
+    for entry in new["results"]:
+        old = base_entries.get(entry_key(entry))
+        if old is None:
+            continue
+        change = (entry["value"] - old["value"]) / old["value"] if old["value"] else 0.0
+        worse = -change if entry["higher_is_better"] else change
+        flag = ""
+        if worse > threshold:
+            flag = "  REGRESSION"
+            regressions += 1
+        elif worse < -threshold:
+            flag = "  faster" if entry["unit"] in ("s", "ms") else "  better"
+        label = f"{entry['bench']}.{entry['metric']}" + (f" @{entry['size']}" if entry["size"] else "")
+        print(f"{label:<48} {old['value']:>10.4g} {entry['value']:>10.4g} {change:>+7.0%}{flag}")
+    return regressions
+
+def load(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the benchmark suite and write machine-readable results")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)),
+                        help="Comma-separated synthetic dataset sizes (10k-500k is the useful range)")
+    parser.add_argument("--only", help=f"Comma-separated benchmarks to run, from: {', '.join([*SIZE_BENCHES, 'capture'])}")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="Repetitions for the quick measurements (median is kept)")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the synthetic datasets")
+    parser.add_argument("--captures", type=int, default=DEFAULT_CAPTURES, help="Pages to capture in the capture benchmark")
+    parser.add_argument("--capture-concurrency", type=int, default=4, help="Captures in flight in the capture benchmark")
+    parser.add_argument("--capture-latency", type=float, default=0.0, help="Seconds the page server adds to every response")
+    parser.add_argument("--out", help="Write results as JSON to this file")
+    parser.add_argument("--baseline", help="Results file to compare this run against")
+    parser.add_argument("--compare", nargs=2, metavar=("BASE", "NEW"), help="Only compare two results files")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="Relative change flagged as a regression")
+    args = parser.parse_args()
+
+    if args.compare:
+        sys.exit(1 if compare(load(args.compare[0]), load(args.compare[1]), args.threshold) else 0)
+
+    sizes = [int(s) for s in args.sizes.split(",") if s]
+    only = set(args.only.split(",")) if args.only else {*SIZE_BENCHES, "capture"}
+    wanted = only & SIZE_BENCHES.keys()
+    for name in list(wanted):
+        wanted |= DEPENDS.get(name, set())
+    results = Results()
+    captures_ok = True
+    with tempfile.TemporaryDirectory() as work_dir:
+        for size in sizes if wanted else ():
+            print(f"{size} records", file=sys.stderr)
+            ctx = SizeContext(size, work_dir, args.seed)
+            for name, bench in SIZE_BENCHES.items():
+                if name in wanted:
+                    bench(ctx, results, args.repeat)
+            del ctx
+        if "capture" in only:
+            print("capture", file=sys.stderr)
+            captures_ok = bench_capture(results, work_dir, args.captures, args.capture_concurrency,
+                                        args.capture_latency)
+
+    run = {
+        "meta": {
+            "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "git": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "sizes": sizes,
+            "repeat": args.repeat,
+            "seed": args.seed,
+        },
+        "results": results.entries,
+    }
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(run, f, indent=1)
+        print(f"Wrote {len(results.entries)} results to {args.out}", file=sys.stderr)
+    else:
+        json.dump(run, sys.stdout, indent=1)
+        print()
+    regressions = compare(load(args.baseline), run, args.threshold) if args.baseline else 0
+    if not captures_ok:
+        sys.exit("Capture benchmark failed; see above")
+    sys.exit(1 if regressions else 0)
+
+if __name__ == "__main__":
+    main()
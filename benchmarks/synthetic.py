@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# Synthetic OSHWA datasets for benchmarks, shaped like the API's project
+# records so they go through the same parser as the real thing. Countries
+# and categories are skewed the way the real list is (mostly US, mostly
+# Electronics) and description lengths follow a long-tailed distribution.
+#
+#   python benchmarks/synthetic.py 100000 > /tmp/projects_100k.json
+#   python benchmarks/synthetic.py 500 --site http://127.0.0.1:8766 > /tmp/local_sites.json  # page_server.py
+
+import argparse
+import json
+import math
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from oshwa_parser import parse_records
+
+COUNTRIES = [("US", "United States of America"), ("DE", "Germany"), ("GB", "United Kingdom"), ("FR", "France"),
+             ("PL", "Poland"), ("CH", "Switzerland"), ("IN", "India"), ("CN", "China"), ("JP", "Japan"),
+             ("BR", "Brazil"), ("CA", "Canada"), ("AU", "Australia"), ("IT", "Italy"), ("ES", "Spain")]
+COUNTRY_WEIGHTS = [40, 9, 7, 6, 5, 5, 4, 4, 3, 3, 3, 3, 2, 2]
+TYPES = ["3D Printing", "Agriculture", "Arts", "Education", "Electronics", "Enclosure", "Environmental",
+         "Home Connection", "IOT", "Manufacturing", "Robotics", "Science", "Sound", "Space", "Tool",
+         "Wearables", "Other"]
+TYPE_WEIGHTS = [6, 2, 2, 7, 38, 1, 3, 2, 6, 2, 6, 8, 4, 1, 5, 2, 5]
+# Description length in words: median about 35 (a couple of sentences),
+# with a tail of multi-paragraph descriptions
+DESCRIPTION_MEDIAN_WORDS = 35
+DESCRIPTION_SIGMA = 0.9
+DESCRIPTION_MAX_WORDS = 600
+LICENSES = ["CERN-OHL-S-2.0", "CERN-OHL-P-2.0", "CC-BY-SA-4.0", "CC-BY-4.0", "GPL-3.0-or-later", "MIT",
+            "Apache-2.0", "TAPR-OHL-1.0", "Solderpad-2.1"]
+WORDS = ("open source hardware board sensor module controller wireless modular printed low cost kit "
+         "robot arm keyboard synth amplifier microscope weather station solar tracker battery charger "
+         "motor driver led matrix camera lab instrument audio interface breakout adapter shield").split()
+HOSTS = ["github.com", "gitlab.com", "hackaday.io", "www.tindie.com", "example.org", "docs.example.com"]
+OFFSETS = ["-04:00", "-05:00", "+00:00", "+01:00", "+02:00", "+05:30", "+09:00"]
+
+def description(rng):
+    words = int(rng.lognormvariate(math.log(DESCRIPTION_MEDIAN_WORDS), DESCRIPTION_SIGMA))
+    words = max(3, min(DESCRIPTION_MAX_WORDS, words))
+    sentences = []
+    while words > 0:
+        length = min(words, rng.randint(6, 18))
+        sentences.append(" ".join(rng.choice(WORDS) for _ in range(length)).capitalize())
+        words -= length
+    return ". ".join(sentences) + "."
+
+def api_records(count, seed=0, site=None):
+    """
+    `count` raw API-style project records, reproducible for a given seed.
+    With `site`, every project website is a page under that base URL
+    (see page_server.py) instead of a public host.
+    """
+    rng = random.Random(seed)
+    serials = {}
+    records = []
+    for _ in range(count):
+        code, country = rng.choices(COUNTRIES, COUNTRY_WEIGHTS)[0]
+        serials[code] = serials.get(code, 0) + 1
+        uid = f"{code}{serials[code]:06d}"
+        name = " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 4))).title()
+        host = rng.choice(HOSTS)
+        slug = name.lower().replace(" ", "-")
+        if site:
+            website = f"{site.rstrip('/')}/p/{uid}/{slug}"
+        elif host in ("github.com", "gitlab.com"):
+            website = f"https://{host}/{rng.choice(WORDS)}/{slug}"
+        else:
+            website = f"https://{host}/{slug}-{serials[code]}"
+        primary = rng.choices(TYPES, TYPE_WEIGHTS)[0]
+        records.append({
+            "oshwaUid": uid,
+            "responsibleParty": f"Maker {rng.randint(1, count)}",
+            "country": country,
+            "projectName": name,
+            "projectWebsite": website,
+            "projectVersion": str(rng.randint(1, 5)),
+            "projectDescription": description(rng),
+            "primaryType": primary,
+            "additionalType": sorted({primary, *rng.sample(TYPES, rng.randint(0, 3))}),
+            "projectKeywords": rng.sample(WORDS, rng.randint(1, 6)),
+            "citations": [],
+            "documentationUrl": website,
+            "hardwareLicense": rng.choice(LICENSES),
+            "softwareLicense": rng.choice(LICENSES + ["No software"]),
+            "documentationLicense": rng.choice(["CC-BY-SA-4.0", "CC-BY-4.0", "CC0-1.0"]),
+            "certificationDate": f"{rng.randint(2016, 2025)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+                                 f"T{rng.randint(0, 23):02d}:00{rng.choice(OFFSETS)}",
+        })
+    return records
+
+def records(count, seed=0, site=None):
+    """Parsed records, as main.py sees them after parse_oshwa_projects()."""
+    return parse_records(api_records(count, seed, site))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write a synthetic OSHWA project list as JSON to stdout")
+    parser.add_argument("count", type=int, nargs="?", default=10000, help="Projects to generate (10k-500k for benchmarks)")
+    parser.add_argument("seed", type=int, nargs="?", default=0, help="Random seed")
+    parser.add_argument("--site", help="Base URL of a page_server.py to point every project website at")
+    args = parser.parse_args()
+    json.dump(api_records(args.count, args.seed, args.site), sys.stdout)
@@ -0,0 +1,96 @@
+DEFAULT_MAX_USES = 25 # Captures served by one context before it is replaced
+
+# Clears per-origin storage of whatever site the page is on; must run before leaving it
+CLEAR_STORAGE_JS = "() => { try { localStorage.clear(); sessionStorage.clear(); } catch (e) {} }"
+
+class PooledPage:
+    __slots__ = ("context", "page", "uses")
+
+    def __init__(self, context, page):
+        self.context = context
+        self.page = page
+        self.uses = 0
+
+class ContextPool:
+    """
+    Keeps warm browser contexts, each with one open page, for reuse across
+    captures instead of creating and tearing down a context per capture.
+
+    The pool does not limit concurrency itself; callers hold a slot (the
+    worker's semaphore) while they hold a page. Pools made with
+    `share_with` keep their contexts under one `limit` of open contexts,
+    busy and idle together: when a pool needs a new context and the group
+    is at the limit, an idle one is closed in another pool first. With the
+    limit equal to the slot count, there is always such an idle context.
+    Pages are scrubbed between uses and contexts are retired after
+    `max_uses` captures or any failure.
+    """
+
+    def __init__(self, browser, context_options, max_uses=DEFAULT_MAX_USES, limit=None, share_with=None):
+        self.browser = browser
+        self.context_options = context_options
+        self.max_uses = max_uses
+        self.limit = share_with.limit if share_with is not None else limit
+        self.created = 0
+        self.recycled = 0
+        self._open = 0 # Contexts of this pool, busy or idle
+        self._idle = []
+        self._group = share_with._group if share_with is not None else []
+        self._group.append(self)
+
+    async def acquire(self) -> PooledPage:
+        if self._idle:
+            return self._idle.pop()
+        if self.limit is not None and sum(p._open for p in self._group) >= self.limit:
+            await self._evict()
+        self._open += 1 # Counted before the await, so a concurrent acquire sees it
+        try:
+            context = await self.browser.new_context(**self.context_options)
+        except Exception:
+            self._open -= 1
+            raise
+        try:
+            page = await context.new_page()
+        except Exception:
+            self._open -= 1
+            await context.close()
+            raise
+        self.created += 1
+        return PooledPage(context, page)
+
+    async def _evict(self):
+        # Make room in the group by closing an idle context of the pool holding the most
+        owner = max(self._group, key=lambda p: len(p._idle))
+        if owner._idle:
+            owner.recycled += 1
+            await owner._discard(owner._idle.pop(0))
+
+    async def release(self, pooled, reusable=True):
+        pooled.uses += 1
+        if reusable and pooled.uses < self.max_uses:
+            try:
+                await self._reset(pooled)
+                self._idle.append(pooled)
+                return
+            except Exception:
+                pass # Page is wedged; fall through and retire it
+        self.recycled += 1
+        await self._discard(pooled)
+
+    async def _reset(self, pooled):
+        await pooled.page.evaluate(CLEAR_STORAGE_JS)
+        await pooled.page.goto("about:blank", timeout=5000)
+        await pooled.context.clear_cookies()
+        await pooled.context.clear_permissions()
+
+    async def _discard(self, pooled):
+        self._open -= 1
+        try:
+            await pooled.context.close()
+        except Exception:
+            pass # Browser may already be gone
+
+    async def close(self):
+        idle, self._idle = self._idle, []
+        for pooled in idle:
+            await self._discard(pooled)
@@ -0,0 +1,212 @@
+import os
+import sqlite3
+import threading
+import time
+
+MANIFEST_FILE = "manifest.sqlite3"
+MASTER_EXTENSIONS = (".png", ".jpg", ".webp") # Master screenshot formats the worker can write
+
+STATUS_OK = "ok"
+STATUS_FAILED = "failed"
+
+COLUMNS = ("uid", "url", "captured_at", "master_file", "master_size", "thumb_size", "status", "error")
+
+class CacheManifest:
+    """
+    Record of what the screenshot cache holds, persisted as SQLite in the
+    cache directory and mirrored in a dict so that "is this cached?" is a
+    lookup rather than a stat() call.
+
+    The worker thread records captures and failures, and the thumbnail
+    loader forgets thumbnails the atlas turns out not to hold; the GUI
+    thread only reads. A missing or stale manifest can be rebuilt from the files and
+    the thumbnail atlas in the cache directory.
+    """
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        self.path = os.path.join(cache_dir, MANIFEST_FILE)
+        self.entries = {} # uid -> dict of COLUMNS
+        self._lock = threading.Lock()
+
+        os.makedirs(cache_dir, exist_ok=True)
+        self.is_new = not os.path.exists(self.path)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS captures (
+                uid TEXT PRIMARY KEY,
+                url TEXT,
+                captured_at REAL,
+                master_file TEXT,
+                master_size INTEGER,
+                thumb_size INTEGER,
+                status TEXT,
+                error TEXT
+            )""")
+        self._conn.commit()
+
+        for row in self._conn.execute(f"SELECT {', '.join(COLUMNS)} FROM captures"):
+            entry = dict(zip(COLUMNS, row))
+            self.entries[entry["uid"]] = entry
+
+    def __contains__(self, uid):
+        return uid in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, uid):
+        return self.entries.get(uid)
+
+    def has_thumb(self, uid) -> bool:
+        entry = self.entries.get(uid)
+        return bool(entry and entry["status"] == STATUS_OK and entry["thumb_size"])
+
+    def has_master(self, uid) -> bool:
+        entry = self.entries.get(uid)
+        return bool(entry and entry["status"] == STATUS_OK and entry["master_size"])
+
+    def master_path(self, uid):
+        entry = self.entries.get(uid)
+        if not entry or not entry["master_file"]:
+            return None
+        return os.path.join(self.cache_dir, entry["master_file"])
+
+    def record_capture(self, uid, url, master_file, master_size, thumb_size, captured_at=None):
+        # A recapture in another format leaves the old master behind; drop it
+        old_path = self.master_path(uid)
+        if old_path and os.path.basename(old_path) != master_file:
+            try:
+                os.remove(old_path)
+            except OSError:
+                pass
+        self._write({
+            "uid": uid,
+            "url": url,
+            "captured_at": captured_at if captured_at is not None else time.time(),
+            "master_file": master_file,
+            "master_size": master_size,
+            "thumb_size": thumb_size,
+            "status": STATUS_OK,
+            "error": None,
+        })
+
+    def record_thumb(self, uid, url, thumb_size):
+        # Thumbnail-only capture: any earlier master stays, just older than the thumbnail
+        old = self.entries.get(uid) or {}
+        self._write({
+            "uid": uid,
+            "url": url,
+            "captured_at": time.time(),
+            "master_file": old.get("master_file"),
+            "master_size": old.get("master_size", 0),
+            "thumb_size": thumb_size,
+            "status": STATUS_OK,
+            "error": None,
+        })
+
+    def record_failure(self, uid, url, error):
+        # A failed refresh keeps pointing at the files from the last good capture
+        old = self.entries.get(uid) or {}
+        self._write({
+            "uid": uid,
+            "url": url,
+            "captured_at": time.time(),
+            "master_file": old.get("master_file"),
+            "master_size": old.get("master_size", 0),
+            "thumb_size": old.get("thumb_size", 0),
+            "status": STATUS_FAILED if not old.get("thumb_size") else STATUS_OK,
+            "error": str(error),
+        })
+
+    def _write(self, entry):
+        with self._lock:
+            self.entries[entry["uid"]] = entry
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO captures ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})",
+                tuple(entry[c] for c in COLUMNS))
+            self._conn.commit()
+
+    def forget_thumbs(self, uids):
+        """
+        Marks uids as having no thumbnail, e.g. after the atlas was reset,
+        so they are captured again. Entries left with no master either are
+        dropped.
+        """
+        with self._lock:
+            forgotten = 0
+            for uid in uids:
+                entry = self.entries.get(uid)
+                if not entry or not entry["thumb_size"]:
+                    continue
+                forgotten += 1
+                if entry["master_size"]:
+                    self.entries[uid] = dict(entry, thumb_size=0)
+                    self._conn.execute("UPDATE captures SET thumb_size = 0 WHERE uid = ?", (uid,))
+                else:
+                    del self.entries[uid]
+                    self._conn.execute("DELETE FROM captures WHERE uid = ?", (uid,))
+            if forgotten:
+                self._conn.commit()
+        return forgotten
+
+    def forget_missing_thumbs(self, atlas) -> int:
+        """Forgets every thumbnail the atlas does not hold; returns how many."""
+        return self.forget_thumbs([uid for uid in list(self.entries) if uid not in atlas])
+
+    def remove(self, uid):
+        with self._lock:
+            self.entries.pop(uid, None)
+            self._conn.execute("DELETE FROM captures WHERE uid = ?", (uid,))
+            self._conn.commit()
+
+    def rebuild(self, atlas=None):
+        """
+        Replaces the manifest with what is actually on disk: one entry per
+        master screenshot or atlas thumbnail. Source URLs are not
+        recoverable from the files and are left empty.
+        """
+        found = {}
+        with os.scandir(self.cache_dir) as it:
+            for f in it:
+                name, ext = os.path.splitext(f.name)
+                if ext in MASTER_EXTENSIONS and f.is_file() and not name.endswith(("_thumb", "_viewer")):
+                    st = f.stat()
+                    found[name] = {"master_file": f.name, "master_size": st.st_size, "captured_at": st.st_mtime}
+
+        thumb_uids = set(atlas.uids()) if atlas is not None else set()
+        thumb_size = atlas.slot_size if atlas is not None else 0
+
+        with self._lock:
+            self.entries = {}
+            self._conn.execute("DELETE FROM captures")
+            for uid in found.keys() | thumb_uids:
+                master = found.get(uid, {})
+                entry = {
+                    "uid": uid,
+                    "url": None,
+                    "captured_at": master.get("captured_at", time.time()),
+                    "master_file": master.get("master_file"),
+                    "master_size": master.get("master_size", 0),
+                    "thumb_size": thumb_size if uid in thumb_uids else 0,
+                    "status": STATUS_OK,
+                    "error": None,
+                }
+                self.entries[uid] = entry
+                self._conn.execute(
+                    f"INSERT INTO captures ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})",
+                    tuple(entry[c] for c in COLUMNS))
+            self._conn.commit()
+        return len(self.entries)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+def remove_manifest(cache_dir):
+    for suffix in ("", "-wal", "-shm"):
+        path = os.path.join(cache_dir, MANIFEST_FILE + suffix)
+        if os.path.exists(path):
+            os.remove(path)
@@ -0,0 +1,244 @@
+import heapq
+import itertools
+import math
+import time
+from collections import Counter
+from urllib.parse import urlsplit
+
+DEFAULT_PER_HOST_LIMIT = 2 # Captures in flight against one host at a time
+DEFAULT_MIN_HOST_INTERVAL = 1.0 # Seconds between capture starts on one host
+
+def host_of(url):
+    return (urlsplit(url).hostname or "").lower()
+
+class CaptureJob:
+    __slots__ = ("uid", "url", "host", "priority", "seq", "callbacks", "force_refresh", "thumb_only", "queued_at")
+
+    def __init__(self, uid, url, priority, seq, force_refresh, thumb_only, queued_at=0.0):
+        self.uid = uid
+        self.url = url
+        self.host = host_of(url)
+        self.priority = priority
+        self.seq = seq
+        self.callbacks = []
+        self.force_refresh = force_refresh
+        self.thumb_only = thumb_only # No master wanted, just the thumbnail
+        self.queued_at = queued_at # Clock time of the first request
+
+class HostStats:
+    __slots__ = ("in_flight", "last_start", "completed", "failed", "total_latency", "max_latency")
+
+    def __init__(self):
+        self.in_flight = 0
+        self.last_start = -math.inf
+        self.completed = 0
+        self.failed = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+
+    def record(self, latency, ok):
+        if ok:
+            self.completed += 1
+        else:
+            self.failed += 1
+        if latency is not None:
+            self.total_latency += latency
+            self.max_latency = max(self.max_latency, latency)
+
+class CaptureScheduler:
+    """
+    Pending screenshot captures, at most one per uid, ordered by priority
+    (lower first) and then arrival, subject to per-host politeness.
+
+    Not thread-safe: the worker only touches it from its event loop. Jobs
+    are handed out by pop() at the moment a capture slot frees up, so a
+    late high-priority request still overtakes everything still waiting.
+    A request for a uid already waiting is merged into that job, keeping
+    the best priority and every callback; one for a uid being captured
+    rides along with that capture unless it forces a refresh or wants a
+    master the running job was not going to make.
+
+    Each host has its own queue. A host with `per_host_limit` captures in
+    flight, or whose last capture started less than `min_host_interval`
+    seconds ago, is parked and its jobs are skipped, so free slots go to
+    the best job of some other host instead of waiting behind it.
+    """
+
+    def __init__(self, per_host_limit=DEFAULT_PER_HOST_LIMIT, min_host_interval=DEFAULT_MIN_HOST_INTERVAL,
+                 clock=time.monotonic):
+        self.per_host_limit = per_host_limit
+        self.min_host_interval = min_host_interval
+        self.clock = clock
+        self.pending = {} # uid -> CaptureJob waiting for a slot
+        self.in_flight = {} # uid -> CaptureJob being captured
+        self.hosts = {} # host -> HostStats
+        self._counter = itertools.count()
+        self._host_queues = {} # host -> heap of (priority, seq, uid); stale entries skipped lazily
+        self._ready = [] # heap of (priority, seq, host) for each host's best job
+        self._ready_seqs = {} # host -> seq of its newest entry in _ready
+        self._parked = set() # hosts currently skipped
+        self._at_limit = set() # parked until one of their captures finishes
+        self._cooldowns = [] # heap of (time, host) parked until that time
+        self._held = {} # uid -> refresh job waiting for the same uid's running capture
+
+    def __len__(self):
+        return len(self.pending)
+
+    def submit(self, uid, url, callback, priority, force_refresh=False, thumb_only=False) -> CaptureJob:
+        running = self.in_flight.get(uid)
+        if (running is not None and (running.force_refresh or not force_refresh)
+                and (thumb_only or not running.thumb_only)):
+            running.callbacks.append(callback)
+            return running
+
+        job = self.pending.get(uid)
+        if job is None:
+            job = CaptureJob(uid, url, priority, next(self._counter), force_refresh, thumb_only, self.clock())
+            self.pending[uid] = job
+            self.hosts.setdefault(job.host, HostStats())
+            self._queue(job)
+        else:
+            job.force_refresh = job.force_refresh or force_refresh
+            job.thumb_only = job.thumb_only and thumb_only
+            if priority < job.priority:
+                job.priority = priority
+                job.seq = next(self._counter)
+                if uid not in self._held:
+                    self._queue(job)
+        job.callbacks.append(callback)
+        return job
+
+    def _queue(self, job):
+        queue = self._host_queues.setdefault(job.host, [])
+        heapq.heappush(queue, (job.priority, job.seq, job.uid))
+        self._push_ready(job.host)
+
+    def _push_ready(self, host):
+        # Makes sure the host's current head, not some cancelled or stale job, has a ready entry
+        if host in self._parked:
+            return
+        head = self._head(host)
+        if head is not None and self._ready_seqs.get(host) != head[1]:
+            self._ready_seqs[host] = head[1]
+            heapq.heappush(self._ready, (head[0], head[1], host))
+
+    def _head(self, host):
+        queue = self._host_queues.get(host)
+        while queue:
+            priority, seq, uid = queue[0]
+            job = self.pending.get(uid)
+            if job is not None and job.seq == seq and uid not in self._held:
+                return queue[0]
+            heapq.heappop(queue) # Cancelled, re-prioritized or held
+        self._host_queues.pop(host, None)
+        return None
+
+    def _unpark(self, host):
+        self._parked.discard(host)
+        self._at_limit.discard(host)
+        self._push_ready(host)
+
+    def cancel(self, uid):
+        """Drops a waiting job; captures already running are not interrupted."""
+        held = self._held.pop(uid, None)
+        job = self.pending.pop(uid, None)
+        if job is not None and held is None:
+            # It may have been its host's head; the next job needs a ready entry
+            self._push_ready(job.host)
+        return job
+
+    def pop(self):
+        """Returns the most urgent job whose host may start a capture now, or None."""
+        now = self.clock()
+        while self._cooldowns and self._cooldowns[0][0] <= now:
+            _, host = heapq.heappop(self._cooldowns)
+            if host not in self._at_limit:
+                self._unpark(host)
+
+        while self._ready:
+            priority, seq, host = heapq.heappop(self._ready)
+            if self._ready_seqs.get(host) == seq:
+                del self._ready_seqs[host]
+            head = self._head(host)
+            if head is None or head[1] != seq or host in self._parked:
+                self._push_ready(host) # Stale entry; queue the host's current head instead
+                continue
+
+            stats = self.hosts[host]
+            if stats.in_flight >= self.per_host_limit:
+                self._parked.add(host)
+                self._at_limit.add(host)
+                continue
+            if now - stats.last_start < self.min_host_interval:
+                self._parked.add(host)
+                heapq.heappush(self._cooldowns, (stats.last_start + self.min_host_interval, host))
+                continue
+
+            job = self.pending[head[2]]
+            heapq.heappop(self._host_queues[host])
+            if job.uid in self.in_flight:
+                # A refresh waits for the capture already running for its uid
+                self._held[job.uid] = job
+                self._unpark(host)
+                continue
+
+            del self.pending[job.uid]
+            self.in_flight[job.uid] = job
+            stats.in_flight += 1
+            stats.last_start = now
+            self._unpark(host) # Queue the host's next job; it is re-checked when popped
+            return job
+        return None
+
+    def next_wakeup(self):
+        """Seconds until a parked host may start again, or None if only a finish can help."""
+        if not self._cooldowns:
+            return None
+        return max(0.0, self._cooldowns[0][0] - self.clock())
+
+    def finish(self, job, latency=None, ok=True):
+        if self.in_flight.get(job.uid) is not job:
+            return
+        del self.in_flight[job.uid]
+
+        stats = self.hosts[job.host]
+        stats.in_flight -= 1
+        stats.record(latency, ok)
+        if job.host in self._at_limit:
+            self._unpark(job.host)
+
+        held = self._held.pop(job.uid, None)
+        if held is not None and self.pending.get(job.uid) is held:
+            self._queue(held)
+
+    def depth_by_priority(self) -> dict:
+        # A snapshot of the values, so other threads may call this too
+        return dict(Counter(job.priority for job in list(self.pending.values())))
+
+    def host_report(self, limit=None) -> list:
+        """
+        Per-host queue depth, in-flight count and capture latency, busiest
+        hosts first. Safe to call from another thread; it only reads
+        snapshots of the scheduler's dicts.
+        """
+        queued = Counter(job.host for job in list(self.pending.values()))
+        in_flight = {host: stats.in_flight for host, stats in list(self.hosts.items())}
+        return summarize_hosts(dict(self.hosts), queued, in_flight, limit)
+
+def summarize_hosts(hosts, queued, in_flight, limit=None):
+    """Report rows from a host -> HostStats dict plus per-host queued and in-flight counts."""
+    report = []
+    for host in hosts.keys() | queued.keys():
+        stats = hosts.get(host) or HostStats()
+        finished = stats.completed + stats.failed
+        report.append({
+            "host": host,
+            "queued": queued.get(host, 0),
+            "in_flight": in_flight.get(host, 0),
+            "completed": stats.completed,
+            "failed": stats.failed,
+            "mean_latency": stats.total_latency / finished if finished else 0.0,
+            "max_latency": stats.max_latency,
+        })
+    report.sort(key=lambda r: (r["queued"] + r["in_flight"], r["completed"] + r["failed"]), reverse=True)
+    return report[:limit] if limit else report
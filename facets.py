@@ -0,0 +1,128 @@
+from array import array
+from record_store import UNKNOWN_CATEGORY
+
+# Facets in the order they are shown, with their tab labels
+FACETS = ("primaryType", "additionalType", "country", "hardwareLicense", "softwareLicense", "documentationLicense",
+          "year")
+FACET_LABELS = {
+    "primaryType": "Type",
+    "additionalType": "Also",
+    "country": "Country",
+    "hardwareLicense": "Hardware license",
+    "softwareLicense": "Software license",
+    "documentationLicense": "Docs license",
+    "year": "Certified",
+}
+# The record field behind a facet, where it is not the facet's own name
+FACET_FIELDS = {"year": "certificationDate"}
+# Fields holding several values; a row is counted under each of them
+MULTI_VALUED = frozenset({"additionalType"})
+
+# Bit positions set in each byte value, for turning a bitset back into rows
+_BYTE_BITS = tuple(tuple(b for b in range(8) if byte >> b & 1) for byte in range(256))
+
+def facet_values(facet, value) -> tuple:
+    """The values of `facet` a row files under, given its value of the facet's field."""
+    if facet == "year":
+        year = (value or "")[:4]
+        return (year if year.isdigit() else UNKNOWN_CATEGORY,)
+    if facet in MULTI_VALUED:
+        return tuple(value or ())
+    return (value or UNKNOWN_CATEGORY,)
+
+def rows_to_bits(rows) -> int:
+    bitmap = bytearray((max(rows) >> 3) + 1 if rows else 0)
+    for row in rows:
+        bitmap[row >> 3] |= 1 << (row & 7)
+    return int.from_bytes(bitmap, "little")
+
+def bits_to_rows(bits) -> array:
+    """Ascending row numbers of the bits set in `bits`."""
+    rows = array('I')
+    data = bits.to_bytes((bits.bit_length() + 7) >> 3, "little")
+    for i, byte in enumerate(data):
+        if byte:
+            base = i << 3
+            rows.extend([base + b for b in _BYTE_BITS[byte]])
+    return rows
+
+class FacetIndex:
+    """
+    One bitset (a Python int, bit n for row n) per value of each facet.
+
+    A selection maps facets to sets of values: values of one facet are
+    alternatives (OR), facets narrow each other (AND), and a facet with
+    nothing selected does not filter. filter() combines a selection with a
+    text search result and counts, for every value, the rows it would
+    leave if it were toggled on, so the counts shown next to a facet do
+    not collapse to its own selection.
+    """
+
+    def __init__(self, records):
+        self.size = 0
+        self.all_bits = 0
+        self.bits = {facet: {} for facet in FACETS}
+        self.extend(records)
+
+    def extend(self, records):
+        """Indexes the rows of `records` past the ones already indexed, as SearchIndex.extend() does."""
+        start = self.size
+        count = len(records) - start
+        if count <= 0:
+            return
+        nbytes = (count + 7) >> 3
+        for facet, bits in self.bits.items():
+            column = records.columns.get(FACET_FIELDS.get(facet, facet))
+            if column is None:
+                continue
+            bitmaps = {}
+            for offset, value in enumerate(column[start:]):
+                for v in facet_values(facet, value):
+                    bitmap = bitmaps.get(v)
+                    if bitmap is None:
+                        bitmap = bitmaps[v] = bytearray(nbytes)
+                    bitmap[offset >> 3] |= 1 << (offset & 7)
+            for v, bitmap in bitmaps.items():
+                bits[v] = bits.get(v, 0) | int.from_bytes(bitmap, "little") << start
+        self.size = len(records)
+        self.all_bits = (1 << self.size) - 1
+
+    def values(self, facet) -> list:
+        """The facet's values, most common first (newest first for years)."""
+        bits = self.bits[facet]
+        if facet == "year":
+            return sorted(bits, reverse=True)
+        return sorted(bits, key=lambda v: (-bits[v].bit_count(), v))
+
+    def _union(self, facet, values):
+        bits = self.bits[facet]
+        union = 0
+        for v in values:
+            union |= bits.get(v, 0)
+        return union
+
+    def filter(self, rows, selection):
+        """
+        (rows, counts) for a text search result `rows` narrowed by
+        `selection`: the surviving ascending rows, and per facet a
+        {value: count} for every value of that facet.
+        """
+        selection = {facet: values for facet, values in selection.items() if values and facet in self.bits}
+        # Every row matching everything is the common case; skip the conversion then
+        query_bits = self.all_bits if len(rows) == self.size else rows_to_bits(rows)
+        masks = {facet: self._union(facet, values) for facet, values in selection.items()}
+
+        counts = {}
+        for facet, bits in self.bits.items():
+            base = query_bits
+            for other, mask in masks.items():
+                if other != facet:
+                    base &= mask
+            counts[facet] = {v: (b & base).bit_count() for v, b in bits.items()}
+
+        if not masks:
+            return rows, counts
+        result = query_bits
+        for mask in masks.values():
+            result &= mask
+        return bits_to_rows(result), counts
@@ -0,0 +1,114 @@
+import cProfile
+import functools
+import sys
+import threading
+import time
+
+DEFAULT_STALL_MS = 50.0
+MAX_STALLS = 200 # Slowest stalls kept for the report
+REPORT_FILE = "profile_report.txt"
+
+class MethodStats:
+    __slots__ = ("name", "calls", "total", "max", "stalls")
+
+    def __init__(self, name):
+        self.name = name
+        self.calls = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.stalls = 0
+
+class GuiProfiler:
+    """
+    Call counts and cumulative/max time for selected methods, plus GUI
+    thread stalls: an outermost instrumented call on the GUI thread that
+    takes longer than the threshold is recorded with its handler's name.
+    Methods are wrapped on their class, so instrument() has to run before
+    the instances whose bound methods get passed to Bind() are created.
+    """
+
+    def __init__(self, stall_ms=DEFAULT_STALL_MS, gui_thread=None):
+        self.stall_threshold = stall_ms / 1000.0
+        self.gui_thread = gui_thread or threading.main_thread()
+        self.started = time.perf_counter()
+        self.stats = {}
+        self.stalls = []
+        self.stall_count = 0
+        self._depth = 0 # Nesting of instrumented calls on the GUI thread
+        self._lock = threading.Lock()
+        self._profile = None
+
+    def instrument(self, cls, names):
+        for name in names:
+            method = getattr(cls, name)
+            setattr(cls, name, self.wrap(method, f"{cls.__name__}.{name}"))
+
+    def wrap(self, fn, name):
+        stats = self.stats.setdefault(name, MethodStats(name))
+        profiler = self
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            on_gui = threading.current_thread() is profiler.gui_thread
+            if on_gui:
+                profiler._depth += 1
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - started
+                outermost = False
+                if on_gui:
+                    profiler._depth -= 1
+                    outermost = profiler._depth == 0
+                profiler.record(stats, elapsed, started, outermost and elapsed > profiler.stall_threshold)
+        return wrapper
+
+    def record(self, stats, elapsed, started, stalled):
+        with self._lock:
+            stats.calls += 1
+            stats.total += elapsed
+            if elapsed > stats.max:
+                stats.max = elapsed
+            if stalled:
+                stats.stalls += 1
+                self.stall_count += 1
+                self.stalls.append((elapsed, started - self.started, stats.name))
+                if len(self.stalls) > MAX_STALLS:
+                    # Forget the shortest so the worst ones survive a long session
+                    self.stalls.remove(min(self.stalls))
+
+    def start_cprofile(self):
+        """cProfile of the GUI thread; call on that thread."""
+        self._profile = cProfile.Profile()
+        self._profile.enable()
+
+    def stop_cprofile(self, path):
+        if self._profile is not None:
+            self._profile.disable()
+            self._profile.dump_stats(path)
+            self._profile = None
+
+    def report(self) -> str:
+        with self._lock:
+            stats = sorted(self.stats.values(), key=lambda s: s.total, reverse=True)
+            stalls = sorted(self.stalls, reverse=True)
+            stall_count = self.stall_count
+        lines = [f"Session {time.perf_counter() - self.started:.1f}s, "
+                 f"{stall_count} GUI stalls over {self.stall_threshold * 1000:g} ms", "",
+                 f"{'method':<44} {'calls':>9} {'total ms':>10} {'mean ms':>9} {'max ms':>9} {'stalls':>7}"]
+        for s in stats:
+            if s.calls:
+                lines.append(f"{s.name:<44} {s.calls:>9} {s.total * 1000:>10.1f} {s.total / s.calls * 1000:>9.3f} "
+                             f"{s.max * 1000:>9.1f} {s.stalls:>7}")
+        if stalls:
+            lines += ["", f"Slowest stalls ({len(stalls)} kept):"]
+            lines += [f"  {elapsed * 1000:8.1f} ms at {at:8.1f}s  {name}" for elapsed, at, name in stalls]
+        return "\n".join(lines) + "\n"
+
+    def write_report(self, path=REPORT_FILE):
+        report = self.report()
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(report)
+        sys.stdout.write(report)
+        print(f"Profile report written to {path}")
@@ -0,0 +1,297 @@
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+# PIL is imported inside the functions that use it: the viewer loads this
+# module at startup but needs no image codecs until it decodes or captures
+
+# Screenshot and Thumbnail Constants
+SCREENSHOT_WIDTH = 1024
+SCREENSHOT_HEIGHT = 768
+DEPTH_MULTIPLIER = 1.5
+
+THUMB_WIDTH = 256
+THUMB_HEIGHT = 192
+THUMB_CROP_PERCENT = 0.15
+THUMB_FINAL_HEIGHT = THUMB_HEIGHT - 2 * int(THUMB_HEIGHT * THUMB_CROP_PERCENT)
+
+# Viewer-panel variant written next to each master, ready to show unscaled
+VIEWER_WIDTH = 512
+VIEWER_HEIGHT = int(VIEWER_WIDTH * (0.75 * DEPTH_MULTIPLIER)) # 0.75 is 4:3 aspect ratio
+VIEWER_SUFFIX = "_viewer"
+VIEWER_QUALITY = 85
+
+GITHUB_CROP_TOP = 50
+GITHUB_CROP_RIGHT = 312
+GITHUB_CROP_BOTTOM = 301
+GITHUB_THUMB_SOURCE_HEIGHT = 534 # 2/3 of the 801px cropped master
+
+# Device scale factor for thumbnail-only captures: a GitHub thumbnail source
+# renders straight at thumbnail width, others need only a small downscale
+THUMB_SCALE = THUMB_WIDTH / (SCREENSHOT_WIDTH - GITHUB_CROP_RIGHT)
+THUMB_JPEG_QUALITY = 90
+INTERMEDIATE_QUALITY = 95 # JPEG handed from Chromium to PIL when the master is re-encoded
+
+# Master image formats: name -> (PIL format, file extension)
+FORMATS = {
+    "png": ("PNG", ".png"),
+    "jpeg": ("JPEG", ".jpg"),
+    "webp": ("WEBP", ".webp"),
+}
+DEFAULT_FORMAT = "png"
+DEFAULT_QUALITY = 85 # JPEG and WebP
+DEFAULT_COMPRESS_LEVEL = 6 # PNG zlib level, 0-9
+CHROMIUM_PNG_COMPRESS_LEVEL = 6 # zlib level of Chromium's own PNG screenshots
+
+DEFAULT_IMAGE_PROCESSES = 2
+DEFAULT_BATCH_SIZE = 4
+BATCH_WINDOW = 0.02 # Seconds a partial batch waits for company before it is sent
+
+class ImageOptions:
+    """How master screenshots are encoded. Picklable, so it travels to pool processes."""
+
+    def __init__(self, format=DEFAULT_FORMAT, quality=DEFAULT_QUALITY, compress_level=DEFAULT_COMPRESS_LEVEL):
+        if format not in FORMATS:
+            raise ValueError(f"Unknown image format {format!r}; expected one of {', '.join(FORMATS)}")
+        self.format = format
+        self.quality = quality
+        self.compress_level = compress_level
+
+    @property
+    def extension(self):
+        return FORMATS[self.format][1]
+
+    def save_kwargs(self):
+        if self.format == "png":
+            return {"format": "PNG", "compress_level": self.compress_level}
+        if self.format == "jpeg":
+            return {"format": "JPEG", "quality": self.quality, "optimize": True}
+        return {"format": "WEBP", "quality": self.quality, "method": 4}
+
+    def chromium_encodes(self):
+        """
+        Whether a clipped screenshot is already the master as asked for, so
+        it is written out unchanged. PNG at another compression level is
+        re-encoded, losslessly. JPEG keeps Chromium's encoding at the
+        requested quality rather than lose a generation to a re-encode, so
+        it goes without save_kwargs()' Huffman table optimization.
+        """
+        if self.format == "png":
+            return self.compress_level == CHROMIUM_PNG_COMPRESS_LEVEL
+        return self.format == "jpeg"
+
+def is_github(url):
+    return url.startswith("https://github.com/")
+
+def master_clip(url):
+    """
+    Region of the page kept as the master, in CSS pixels, or None for the
+    whole viewport. GitHub pages lose their header, sidebar and footer.
+    """
+    if is_github(url):
+        # Crop 50px top, 312px right, 301px bottom
+        return {"x": 0, "y": GITHUB_CROP_TOP, "width": master_width(url),
+                "height": int(SCREENSHOT_HEIGHT * DEPTH_MULTIPLIER) - GITHUB_CROP_TOP - GITHUB_CROP_BOTTOM}
+    return None
+
+def master_width(url):
+    return SCREENSHOT_WIDTH - GITHUB_CROP_RIGHT if is_github(url) else SCREENSHOT_WIDTH
+
+def thumb_source_height(url):
+    # Top of the master the thumbnail is made from: 2/3 of a GitHub master, else the first screenful
+    return GITHUB_THUMB_SOURCE_HEIGHT if is_github(url) else SCREENSHOT_HEIGHT
+
+def thumb_clip(url):
+    """Region of the page, in CSS pixels, that ends up in the thumbnail after its center crop."""
+    source_h = thumb_source_height(url)
+    top = GITHUB_CROP_TOP if is_github(url) else 0
+    skip = source_h * int(THUMB_HEIGHT * THUMB_CROP_PERCENT) / THUMB_HEIGHT
+    return {"x": 0, "y": top + skip, "width": master_width(url), "height": source_h - 2 * skip}
+
+def screenshot_options(url, options):
+    """
+    page.screenshot() arguments for a clipped capture: Chromium crops the
+    master and, for PNG and JPEG masters, encodes it in its final format
+    (see ImageOptions.chromium_encodes() for when PNG is re-encoded).
+    WebP masters go through a high-quality JPEG, which is far cheaper for
+    Chromium to encode and PIL to decode than PNG.
+    """
+    kwargs = {"type": "png"} if options.format == "png" else {"type": "jpeg"}
+    if options.format == "jpeg":
+        kwargs["quality"] = options.quality
+    elif options.format == "webp":
+        kwargs["quality"] = INTERMEDIATE_QUALITY
+    clip = master_clip(url)
+    if clip is not None:
+        kwargs["clip"] = clip
+    return kwargs
+
+def thumbnail_from_master(img, url):
+    """Thumbnail of a (cropped) master image: scaled to THUMB_WIDTH, center-cropped to THUMB_FINAL_HEIGHT."""
+    from PIL import Image
+    # 1. Crop top portion; coordinates scale with images decoded in draft mode
+    source_h = int(thumb_source_height(url) * img.width / master_width(url))
+    cropped_img = img.crop((0, 0, img.width, source_h))
+
+    # 2. Scale width to THUMB_WIDTH, preserving aspect ratio
+    w, h = cropped_img.size
+    scale = THUMB_WIDTH / float(w)
+    new_h = int(h * scale)
+    thumb = cropped_img.resize((THUMB_WIDTH, new_h), Image.Resampling.LANCZOS)
+
+    # 3. Center crop to target thumbnail height
+    crop_top = (thumb.height - THUMB_FINAL_HEIGHT) // 2
+    return thumb.crop((0, crop_top, THUMB_WIDTH, crop_top + THUMB_FINAL_HEIGHT))
+
+def viewer_path(master_path):
+    return os.path.splitext(master_path)[0] + VIEWER_SUFFIX + ".jpg"
+
+def save_viewer(img, master_path):
+    from PIL import Image
+    viewer = img.convert("RGB").resize((VIEWER_WIDTH, VIEWER_HEIGHT), Image.Resampling.LANCZOS)
+    viewer.save(viewer_path(master_path), format="JPEG", quality=VIEWER_QUALITY)
+
+def process_capture(img_bytes, url, master_path, options):
+    """
+    Turns a full-viewport PNG screenshot into a master image file, its
+    viewer variant and thumbnail pixels. Returns (master_size,
+    thumb_pixels). Runs in a pool process, so it only takes and returns
+    plain picklable values.
+    """
+    from PIL import Image
+    img = Image.open(BytesIO(img_bytes))
+    if options.format == "jpeg":
+        img = img.convert("RGB") # JPEG has no alpha
+
+    clip = master_clip(url)
+    if clip is not None:
+        img = img.crop((clip["x"], clip["y"], clip["x"] + clip["width"], clip["y"] + clip["height"]))
+
+    img.save(master_path, **options.save_kwargs())
+    save_viewer(img, master_path)
+    return os.path.getsize(master_path), thumb_pixels(thumbnail_from_master(img, url))
+
+def process_clipped(img_bytes, url, master_path, options):
+    """
+    Like process_capture() for a screenshot taken with screenshot_options():
+    already cropped and, when options.chromium_encodes(), already encoded
+    as the master, so its bytes are written out as they are.
+    """
+    from PIL import Image
+    img = Image.open(BytesIO(img_bytes))
+    if not options.chromium_encodes():
+        img.save(master_path, **options.save_kwargs())
+    else:
+        with open(master_path, "wb") as f:
+            f.write(img_bytes)
+        # Only the viewer variant and thumbnail need pixels; JPEGs can decode at reduced scale
+        img.draft("RGB", (VIEWER_WIDTH, VIEWER_HEIGHT))
+    save_viewer(img, master_path)
+    return os.path.getsize(master_path), thumb_pixels(thumbnail_from_master(img, url))
+
+def process_thumbnail(img_bytes):
+    """Thumbnail pixels from a thumb_clip() screenshot taken at THUMB_SCALE."""
+    from PIL import Image
+    img = Image.open(BytesIO(img_bytes))
+    img.draft("RGB", (THUMB_WIDTH, THUMB_FINAL_HEIGHT))
+    return thumb_pixels(img.convert("RGB").resize((THUMB_WIDTH, THUMB_FINAL_HEIGHT), Image.Resampling.LANCZOS))
+
+def process_batch(items):
+    # One result per item, so a page that fails to decode does not sink its batch
+    results = []
+    for fn, args in items:
+        try:
+            results.append((True, fn(*args)))
+        except Exception as e:
+            results.append((False, e))
+    return results
+
+def thumb_pixels(img):
+    """Raw RGB bytes of a thumbnail, padded or cropped to the atlas slot size."""
+    img = img.convert("RGB")
+    if img.size != (THUMB_WIDTH, THUMB_FINAL_HEIGHT):
+        img = img.crop((0, 0, THUMB_WIDTH, THUMB_FINAL_HEIGHT))
+    return img.tobytes()
+
+def decode_for_display(path, width, height):
+    """
+    Decodes a master image of any supported format, scaled to width x
+    height, and returns its raw RGB bytes. JPEGs are decoded at a reduced
+    DCT scale when the target is small enough, which skips most of the work.
+    """
+    from PIL import Image
+    with Image.open(path) as img:
+        img.draft("RGB", (width, height))
+        return img.convert("RGB").resize((width, height), Image.Resampling.LANCZOS).tobytes()
+
+class ImagePipeline:
+    """
+    Post-processes screenshots in a pool of worker processes, so decoding,
+    resizing and encoding do not hold the GIL the capture loop and the GUI
+    thread share.
+
+    Captures finishing close together are sent to the pool as one batch
+    (up to `batch_size`, or whatever arrived within BATCH_WINDOW), which
+    saves a round trip per image. With `processes=0` images are processed
+    on a thread instead, as inside shard processes, which may not start
+    children of their own.
+    """
+
+    def __init__(self, processes=DEFAULT_IMAGE_PROCESSES, batch_size=DEFAULT_BATCH_SIZE):
+        self.processes = processes
+        self.batch_size = batch_size
+        self._executor = None
+        self._batch = [] # (args, future) waiting to be sent
+        self._flush_handle = None
+
+    def start(self):
+        if self.processes:
+            # Spawn, not fork: the parent may be a GUI process with live threads
+            self._executor = ProcessPoolExecutor(self.processes, mp_context=multiprocessing.get_context("spawn"))
+
+    async def run(self, fn, *args):
+        """Returns fn(*args) once it has run; fn must be a module-level function of this module."""
+        if self._executor is None:
+            return await asyncio.to_thread(fn, *args)
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._batch.append(((fn, args), future))
+        if len(self._batch) >= self.batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(BATCH_WINDOW, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch, self._batch = self._batch, []
+        if not batch:
+            return
+        done = asyncio.wrap_future(self._executor.submit(process_batch, [item for item, _ in batch]))
+        done.add_done_callback(lambda f: self._deliver(batch, f))
+
+    def _deliver(self, batch, done):
+        if done.cancelled() or done.exception() is not None:
+            # The pool itself failed, e.g. a worker process died
+            error = done.exception() if not done.cancelled() else RuntimeError("Image pool shut down")
+            results = [(False, error)] * len(batch)
+        else:
+            results = done.result()
+        for (_, future), (ok, value) in zip(batch, results):
+            if future.done():
+                continue # Caller went away
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(value)
+
+    def close(self):
+        self._flush()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
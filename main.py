@@ -4,10 +4,27 @@ import wx.dataview as dv
 import os
 import argparse
 import glob
-import shlex
-import re
-from oshwa_parser import parse_oshwa_projects
-from playwright_worker import ScreenshotWorker
+import heapq
+import threading
+from array import array
+from record_store import build_nodes
+from search_index import SearchIndex, BackgroundFilter, diff_rows
+from facets import FacetIndex, FACETS, FACET_LABELS
+from sort_keys import SortKeys, WARM_COLUMNS, THUMB_COLUMN
+from snapshot import load_projects, remove_snapshot
+from playwright_worker import ScreenshotWorker, CAPTURE_MODES, DEFAULT_CAPTURE_MODE, DEFAULT_BROWSER_IDLE
+from sharded_worker import ShardedScreenshotWorker
+from capture_scheduler import DEFAULT_PER_HOST_LIMIT, DEFAULT_MIN_HOST_INTERVAL
+from viewport import ViewportScheduler, DEFAULT_LOOKAHEAD, VISIBLE_PRIORITY, neighbors
+from viewer_cache import ViewerImageCache, DEFAULT_NEIGHBORS
+from thumbnail_cache import ThumbnailCache, DEFAULT_BUDGET_MB
+from thumbnail_loader import ThumbnailLoader
+from thumb_atlas import ThumbnailAtlas, remove_atlas
+from worker_metrics import format_status, serve_metrics
+from gui_profiler import GuiProfiler, DEFAULT_STALL_MS, REPORT_FILE
+from cache_manifest import CacheManifest, remove_manifest, MASTER_EXTENSIONS
+from image_pipeline import (ImageOptions, FORMATS, DEFAULT_FORMAT, DEFAULT_QUALITY, DEFAULT_COMPRESS_LEVEL, VIEWER_WIDTH,
+                            VIEWER_HEIGHT, decode_for_display, viewer_path)
 
 # Screenshot and Thumbnail Constants
 THUMB_WIDTH = 256
@@ -16,18 +33,9 @@ THUMB_CROP_PERCENT = 0.15
 THUMB_HEIGHT_CROP = int(THUMB_HEIGHT_BASE * THUMB_CROP_PERCENT)
 THUMB_HEIGHT = THUMB_HEIGHT_BASE - 2 * THUMB_HEIGHT_CROP
 
-# Viewer Constants
-VIEWER_WIDTH = 512
-DEPTH_MULTIPLIER = 1.5
-VIEWER_HEIGHT = int(VIEWER_WIDTH * (0.75 * DEPTH_MULTIPLIER)) # 0.75 is 4:3 aspect ratio
-
-class ProjectNode:
-    def __init__(self, parent, data=None, is_category=False):
-        self.parent = parent
-        self.data = data or {}
-        self.is_category = is_category
-        self.children = []
-        self.expanded = False
+# Search Constants
+SEARCH_DEBOUNCE_MS = 200
+FACET_PANEL_HEIGHT = 180
 
 class WordWrapRenderer(dv.DataViewCustomRenderer):
     def __init__(self):
@@ -57,13 +65,27 @@ class WordWrapRenderer(dv.DataViewCustomRenderer):
         return False
 
 class ProjectDataViewModel(dv.PyDataViewModel):
-    def __init__(self, data):
+    def __init__(self, data, thumbnails, has_thumb=None, search_index=None, sort_columns=None, facet_index=None):
         super().__init__()
         self.all_data = data
+        self.thumbnails = thumbnails
+        self.search_index = search_index if search_index is not None else SearchIndex(data)
+        self.facet_index = facet_index if facet_index is not None else FacetIndex(data)
+        self.sort_keys = SortKeys(data, has_thumb, columns=sort_columns)
+        # Short columns are keyed up front, off the GUI thread (a no-op when
+        # they came from the snapshot); the long description column waits
+        # until someone sorts by it
+        threading.Thread(target=self.sort_keys.warm, args=(WARM_COLUMNS,), daemon=True).start()
         self.root_nodes = []
         self.node_by_uid = {}
+        self.visible_rows = array('I') # Ascending rows currently attached
+        self.generation = 0 # Bumped whenever the set of attached rows changes
         self.filter_query = ""
         self.filter_is_regex = False
+        self.filter_selection = {} # facet -> values, see FacetIndex.filter()
+        self.facet_counts = {}
+        self._display_order = (None, {}) # (generation, column, ascending), category id -> sorted children
+        self._build_nodes()
         self.build_tree()
         self.default_bmp = self._create_empty_bitmap()
 
@@ -75,57 +97,127 @@ class ProjectDataViewModel(dv.PyDataViewModel):
         del dc
         return empty_bmp
 
+    def _build_nodes(self):
+        # One node per record and per category for the lifetime of the model;
+        # filtering only changes which of them are attached to the tree.
+        self.nodes, self.category_nodes = build_nodes(self.all_data)
+
     def build_tree(self):
+        rows, self.facet_counts = self.compute_filter(self.filter_query, self.filter_is_regex, self.filter_selection)
+
         self.root_nodes = []
         self.node_by_uid = {}
-        categories = {}
-        
-        query = self.filter_query.strip()
-        is_regex = self.filter_is_regex
-        
-        tokens = []
-        if query and not is_regex:
-            try:
-                tokens = shlex.split(query)
-            except:
-                tokens = [query]
-
-        for item in self.all_data:
-            if query:
-                text_to_search = f"{item.get('uid', '')} {item.get('projectName', '')} {item.get('projectDescription', '')} {item.get('primaryType', '')}".lower()
-                if is_regex:
-                    try:
-                        if not re.search(query, text_to_search, re.IGNORECASE):
-                            continue
-                    except:
-                        pass # Invalid regex
-                else:
-                    match = True
-                    for t in tokens:
-                        if t.lower() not in text_to_search:
-                            match = False
-                            break
-                    if not match:
-                        continue
-
-            cat_name = item.get('primaryType', 'Unknown') or 'Unknown'
-            if cat_name not in categories:
-                cat_node = ProjectNode(None, {'name': cat_name}, is_category=True)
-                categories[cat_name] = cat_node
+        for cat_node in self.category_nodes.values():
+            cat_node.children = []
+
+        for row in rows:
+            child_node = self.nodes[row]
+            cat_node = child_node.parent
+            if not cat_node.children:
                 self.root_nodes.append(cat_node)
-            
-            child_node = ProjectNode(categories[cat_name], item, is_category=False)
-            categories[cat_name].children.append(child_node)
-            if 'uid' in item:
-                self.node_by_uid[item['uid']] = child_node
+            cat_node.children.append(child_node)
+            if 'uid' in child_node.data:
+                self.node_by_uid[child_node.data['uid']] = child_node
 
         self.root_nodes.sort(key=lambda n: n.data['name'])
-
-    def set_filter(self, query, is_regex):
+        self.visible_rows = rows
+        self.generation += 1
+
+    def compute_filter(self, query, is_regex, selection=None):
+        """(rows, facet counts) for a query and facet selection; see FacetIndex.filter()."""
+        # Safe to call from a background thread; touches only the search and facet indexes
+        return self.facet_index.filter(self.search_index.search(query, is_regex), selection or {})
+
+    def apply_filter(self, query, is_regex, rows, selection=None):
+        """
+        Brings the tree in line with a filter result by notifying the control
+        of the rows that left and joined, instead of rebuilding everything.
+        """
         self.filter_query = query
         self.filter_is_regex = is_regex
-        self.build_tree()
-        self.Cleared()
+        self.filter_selection = selection or {}
+
+        removed, added = diff_rows(self.visible_rows, rows)
+        self.visible_rows = rows
+        self.generation += 1
+
+        removed_by_cat = {}
+        for row in removed:
+            node = self.nodes[row]
+            removed_by_cat.setdefault(node.parent, []).append(node)
+            uid = node.data.get('uid')
+            if self.node_by_uid.get(uid) is node:
+                del self.node_by_uid[uid]
+
+        for cat_node, gone in removed_by_cat.items():
+            gone_ids = {id(n) for n in gone}
+            cat_node.children = [c for c in cat_node.children if id(c) not in gone_ids]
+            cat_item = self.ObjectToItem(cat_node)
+            if cat_node.children:
+                items = dv.DataViewItemArray()
+                for node in gone:
+                    items.append(self.ObjectToItem(node))
+                self.ItemsDeleted(cat_item, items)
+            else:
+                self.root_nodes.remove(cat_node)
+                self.ItemDeleted(dv.NullDataViewItem, cat_item)
+
+        added_by_cat = {}
+        for row in added:
+            node = self.nodes[row]
+            added_by_cat.setdefault(node.parent, []).append(node)
+            if 'uid' in node.data:
+                self.node_by_uid[node.data['uid']] = node
+
+        for cat_node, new in added_by_cat.items():
+            cat_item = self.ObjectToItem(cat_node)
+            if not cat_node.children:
+                # Category was hidden: attach it with its children in one go
+                cat_node.children = new
+                self.root_nodes.append(cat_node)
+                self.root_nodes.sort(key=lambda n: n.data['name'])
+                self.ItemAdded(dv.NullDataViewItem, cat_item)
+            else:
+                # Keep row order, so an unsorted control shows the new rows where a rebuild would
+                cat_node.children = list(heapq.merge(cat_node.children, new, key=lambda n: n.row))
+                items = dv.DataViewItemArray()
+                for node in new:
+                    items.append(self.ObjectToItem(node))
+                self.ItemsAdded(cat_item, items)
+
+    def displayed_children(self, cat_node, col=None, ascending=True):
+        """
+        cat_node's children in the order the control shows them: row order,
+        or sorted by model column `col` the way Compare() sorts them.
+        """
+        if col is None:
+            return cat_node.children
+        state = (self.generation, col, ascending)
+        if self._display_order[0] != state:
+            self._display_order = (state, {})
+        cache = self._display_order[1]
+        children = cache.get(id(cat_node))
+        if children is None:
+            # Stable sort, so ties keep row order in either direction
+            children = sorted(cat_node.children, key=lambda n: self.sort_keys.key(n.row, col), reverse=not ascending)
+            cache[id(cat_node)] = children
+        return children
+
+    def thumbs_changed(self) -> bool:
+        """
+        Forgets the displayed order if it sorts by the thumbnail column,
+        whose keys follow has_thumb rather than the filter generation.
+        Returns whether it did.
+        """
+        state = self._display_order[0]
+        if state is None or state[1] != THUMB_COLUMN:
+            return False
+        self._display_order = (None, {})
+        return True
+
+    def set_filter(self, query, is_regex, selection=None):
+        rows, self.facet_counts = self.compute_filter(query, is_regex, selection)
+        self.apply_filter(query, is_regex, rows, selection)
 
     def GetColumnCount(self):
         return 8
@@ -184,9 +276,9 @@ class ProjectDataViewModel(dv.PyDataViewModel):
         if col == 5: return str(data.get('certificationDate', ''))
         if col == 6: return str(data.get('url', ''))
         if col == 7:
-            if 'thumbnail' in data:
-                return data['thumbnail']
-            return self.default_bmp
+            # A miss schedules an asynchronous load; show the placeholder meanwhile
+            bmp = self.thumbnails.get(data.get('uid'))
+            return bmp if bmp is not None else self.default_bmp
         return ""
         
     def Compare(self, item1, item2, col, ascending):
@@ -194,29 +286,41 @@ class ProjectDataViewModel(dv.PyDataViewModel):
         node2 = self.ItemToObject(item2)
         
         if node1.is_category and node2.is_category:
-            val1 = node1.data.get('name', '').lower()
-            val2 = node2.data.get('name', '').lower()
+            val1 = node1.data.get('name', '').casefold()
+            val2 = node2.data.get('name', '').casefold()
         elif not node1.is_category and not node2.is_category:
-            val1 = self.GetValue(item1, col)
-            val2 = self.GetValue(item2, col)
-            if isinstance(val1, str): val1 = val1.lower()
-            if isinstance(val2, str): val2 = val2.lower()
+            # Precomputed keys: casefolded text, dates as timestamps, has-thumbnail for the bitmap column
+            res = self.sort_keys.compare(node1.row, node2.row, col)
+            return res if ascending else -res
         else:
             return 0 # Do not compare categories with children
-
-        if not isinstance(val1, (str, int, float)) or not isinstance(val2, (str, int, float)):
-            return 0
             
         res = -1 if val1 < val2 else 1 if val1 > val2 else 0
         return res if ascending else -res
 
 class MainFrame(wx.Frame):
-    def __init__(self, data):
+    def __init__(self, data, lookahead=DEFAULT_LOOKAHEAD, thumb_cache_mb=DEFAULT_BUDGET_MB, shards=1,
+                 per_host_limit=DEFAULT_PER_HOST_LIMIT, min_host_interval=DEFAULT_MIN_HOST_INTERVAL, image_options=None,
+                 capture_mode=DEFAULT_CAPTURE_MODE, viewer_neighbors=DEFAULT_NEIGHBORS, browser_idle=DEFAULT_BROWSER_IDLE):
         super().__init__(None, title="OSHWA Project Viewer", size=(1400, 800))
         self.data_source = data
-        self.worker = ScreenshotWorker()
+        self.thumbnails = ThumbnailCache(thumb_cache_mb * 1024 * 1024, loader=self.on_thumbnail_miss)
+        self.atlas = ThumbnailAtlas("cache", THUMB_WIDTH, THUMB_HEIGHT)
+        self.thumb_loader = ThumbnailLoader(self.read_thumbnail, self.on_thumbnails_loaded)
+        self.thumb_loader.start()
+        self.manifest = CacheManifest("cache")
+        politeness = {"per_host_limit": per_host_limit, "min_host_interval": min_host_interval,
+                      "image_options": image_options, "capture_mode": capture_mode, "browser_idle": browser_idle}
+        if shards > 1:
+            self.worker = ShardedScreenshotWorker(shards, atlas=self.atlas, manifest=self.manifest, **politeness)
+        else:
+            self.worker = ScreenshotWorker(atlas=self.atlas, manifest=self.manifest, **politeness)
         self.worker.start()
-        self.pending_requests = set()
+        self.viewer_images = ViewerImageCache(self.decode_viewer_image, self.on_viewer_image_decoded, viewer_neighbors)
+        self.viewer_images.start()
+        self.selected_uid = None
+        self.pending_requests = {} # uid -> priority of the outstanding request
+        self.viewport = ViewportScheduler(lookahead)
         
         self.current_font_size = 11
         self.current_image = None
@@ -226,8 +330,14 @@ class MainFrame(wx.Frame):
         
         # Left side: DataViewCtrl
         self.dvc = dv.DataViewCtrl(self.splitter, style=wx.BORDER_THEME | dv.DV_ROW_LINES | dv.DV_VERT_RULES | dv.DV_VARIABLE_LINE_HEIGHT)
-        self.model = ProjectDataViewModel(self.data_source)
+        self.model = ProjectDataViewModel(self.data_source.records, self.thumbnails, has_thumb=self.manifest.has_thumb,
+                                          search_index=self.data_source.search_index,
+                                          sort_columns=self.data_source.sort_columns,
+                                          facet_index=self.data_source.facet_index)
         self.dvc.AssociateModel(self.model)
+        self.search_timer = None
+        self.filter_thread = BackgroundFilter(self.model.compute_filter, self.on_filter_computed)
+        self.filter_thread.start()
         
         # Add Columns
         self.dvc.AppendTextColumn("Category", 0, width=150, mode=dv.DATAVIEW_CELL_INERT)
@@ -287,6 +397,23 @@ class MainFrame(wx.Frame):
         img_sizer.Add(self.static_bitmap, 0, wx.ALIGN_CENTER | wx.ALL, 10)
         img_sizer.Add(self.links_panel, 0, wx.EXPAND | wx.LEFT | wx.RIGHT, 10)
         img_sizer.Add(self.desc_text, 1, wx.EXPAND | wx.ALL, 10)
+
+        # Facet Panel: one checklist per facet, each value with its count
+        self.facet_book = wx.Notebook(self.img_panel)
+        self.facet_lists = {} # facet -> CheckListBox
+        self.facet_values = {} # facet -> values, in list order
+        for facet in FACETS:
+            values = self.model.facet_index.values(facet)
+            if not values:
+                continue
+            facet_list = wx.CheckListBox(self.facet_book, choices=values)
+            facet_list.Bind(wx.EVT_CHECKLISTBOX, self.on_facet_toggled)
+            self.facet_book.AddPage(facet_list, FACET_LABELS[facet])
+            self.facet_lists[facet] = facet_list
+            self.facet_values[facet] = values
+        self.facet_book.SetMinSize((-1, FACET_PANEL_HEIGHT))
+        self.update_facet_counts(self.model.facet_counts)
+        img_sizer.Add(self.facet_book, 0, wx.EXPAND | wx.LEFT | wx.RIGHT, 10)
         
         # Search Filter Panel
         self.search_panel = wx.Panel(self.img_panel)
@@ -300,8 +427,12 @@ class MainFrame(wx.Frame):
         self.regex_cb = wx.CheckBox(self.search_panel, label="Regex")
         self.regex_cb.Bind(wx.EVT_CHECKBOX, self.on_search)
         
+        self.clear_facets_btn = wx.Button(self.search_panel, label="Clear facets", style=wx.BU_EXACTFIT)
+        self.clear_facets_btn.Bind(wx.EVT_BUTTON, self.on_clear_facets)
+
         search_sizer.Add(self.search_ctrl, 1, wx.ALL | wx.EXPAND, 5)
         search_sizer.Add(self.regex_cb, 0, wx.ALL | wx.ALIGN_CENTER_VERTICAL, 5)
+        search_sizer.Add(self.clear_facets_btn, 0, wx.ALL | wx.ALIGN_CENTER_VERTICAL, 5)
         self.search_panel.SetSizer(search_sizer)
         
         img_sizer.Add(self.search_panel, 0, wx.EXPAND | wx.ALL, 5)
@@ -321,6 +452,8 @@ class MainFrame(wx.Frame):
         # Event binding
         self.dvc.Bind(dv.EVT_DATAVIEW_SELECTION_CHANGED, self.on_item_selected)
         self.dvc.Bind(dv.EVT_DATAVIEW_ITEM_ACTIVATED, self.on_item_activated)
+        self.dvc.Bind(dv.EVT_DATAVIEW_ITEM_EXPANDED, self.on_expansion_changed)
+        self.dvc.Bind(dv.EVT_DATAVIEW_ITEM_COLLAPSED, self.on_expansion_changed)
         self.dvc.Bind(wx.EVT_KEY_DOWN, self.on_dvc_key)
         self.dvc.Bind(wx.EVT_SIZE, self.on_dvc_size)
         
@@ -340,6 +473,8 @@ class MainFrame(wx.Frame):
         ])
         self.SetAcceleratorTable(accel_tbl)
         
+        self.CreateStatusBar()
+
         self.timer = wx.Timer(self)
         self.Bind(wx.EVT_TIMER, self.on_timer, self.timer)
         self.timer.Start(1000)
@@ -458,56 +593,154 @@ class MainFrame(wx.Frame):
 
     def on_timer(self, event):
         self.check_visible_items()
+        self.SetStatusText(format_status(self.worker.metrics_report()))
+
+    def on_expansion_changed(self, event):
+        self.viewport.invalidate()
+        event.Skip()
 
     def check_visible_items(self):
-        # DataViewCtrl doesn't have an easy GetTopItem API like ListCtrl,
-        # so we fetch screenshots for all currently expanded items
-        # To avoid lag, we only process expanded nodes.
-        for root in self.model.root_nodes:
-            root_item = self.model.ObjectToItem(root)
-            if self.dvc.IsExpanded(root_item):
-                for child in root.children:
-                    self.fetch_for_node(child)
-                    
-    def fetch_for_node(self, node):
+        top_item = self.dvc.GetTopItem()
+        signature = (
+            self.model.ItemToObject(top_item) if top_item.IsOk() else None,
+            self.dvc.GetScrollPos(wx.VERTICAL),
+            tuple(self.dvc.GetClientSize()),
+            self.model.generation,
+            self.sort_order(),
+        )
+        if not self.viewport.changed(signature):
+            return # Nothing scrolled, resized, expanded or filtered since last tick
+
+        plan = self.viewport.plan(self.get_visible_nodes(), self.displayed_children)
+        for node, priority in plan:
+            self.fetch_for_node(node, priority)
+
+        # Timer-driven fetches for rows that left the window give up their place;
+        # selection and reload requests (higher priority) are left alone
+        wanted = {node.data.get('uid') for node, _ in plan}
+        for uid, priority in list(self.pending_requests.items()):
+            if priority >= VISIBLE_PRIORITY and uid not in wanted:
+                self.cancel_request(uid)
+
+    def sort_order(self):
+        """(model column, ascending) the list is sorted by, or (None, True) when unsorted."""
+        sort_col = self.dvc.GetSortingColumn()
+        if sort_col is None:
+            return None, True
+        return sort_col.GetModelColumn(), sort_col.IsSortOrderAscending()
+
+    def displayed_children(self, cat_node):
+        """A category's children in on-screen order, following the column the list is sorted by."""
+        return self.model.displayed_children(cat_node, *self.sort_order())
+
+    def on_thumbs_changed(self):
+        # Sorted by the thumbnail column, rows move as thumbnails come and go; plan the lookahead again
+        if self.model.thumbs_changed():
+            self.viewport.invalidate()
+
+    def cancel_request(self, uid):
+        self.pending_requests.pop(uid, None)
+        self.worker.cancel(uid)
+
+    def get_visible_nodes(self):
+        # DataViewCtrl has no API listing the rows on screen, so probe the
+        # client area top to bottom, skipping past each row found.
+        nodes = []
+        height = self.dvc.GetClientSize().height
+        min_step = max(4, self.dvc.GetCharHeight())
+        y = 0
+        while y < height:
+            item, _ = self.dvc.HitTest(wx.Point(5, y))
+            if not item.IsOk():
+                y += min_step
+                continue
+            node = self.model.ItemToObject(item)
+            if not nodes or nodes[-1] is not node:
+                nodes.append(node)
+            rect = self.dvc.GetItemRect(item)
+            y = rect.GetBottom() + 1 if rect.GetBottom() >= y else y + min_step
+        return nodes
+
+    def fetch_for_node(self, node, priority=10):
         uid = node.data.get('uid')
         url = node.data.get('url')
         if not uid or not url: return
 
-        if 'thumbnail' in node.data or uid in self.pending_requests:
+        if uid in self.thumbnails:
             return
+        if uid in self.pending_requests and self.pending_requests[uid] <= priority:
+            return # Already queued at least as urgently
             
-        thumb_path = os.path.join("cache", f"{uid}_thumb.png")
-        if os.path.exists(thumb_path):
-            self.load_thumbnail(node, thumb_path)
-            # Find item and signal change
-            item = self.model.ObjectToItem(node)
-            self.model.ItemChanged(item)
-        else:
-            self.pending_requests.add(uid)
-            # Priority 10 for background timer fetches
-            self.worker.request_screenshot(uid, url, self.on_screenshot_ready, priority=10)
-
-    def load_thumbnail(self, node, thumb_path):
-        if not os.path.exists(thumb_path): return
-        bmp = wx.Bitmap(wx.Image(thumb_path, wx.BITMAP_TYPE_PNG))
-        node.data['thumbnail'] = bmp
-
-    def on_screenshot_ready(self, uid, cache_path):
-        if uid in self.pending_requests:
-            self.pending_requests.remove(uid)
+        if not self.manifest.has_thumb(uid):
+            # Re-requesting at a better priority moves a row that scrolled
+            # into view ahead of the lookahead rows queued earlier
+            self.pending_requests[uid] = priority
+            # Only the thumbnail is needed until the row is selected
+            self.worker.request_screenshot(uid, url, self.on_thumbnail_ready, priority=priority, thumb_only=True)
+
+    def on_thumbnail_miss(self, uid):
+        # Called from GetValue while the control is painting; the loader
+        # thread reads the atlas and reports back in batches
+        self.thumb_loader.request(uid)
+
+    def read_thumbnail(self, uid):
+        # Runs on the loader thread
+        pixels = self.atlas.get(uid)
+        if pixels is None and self.manifest.has_thumb(uid):
+            # The atlas lost it (reset, new geometry); stop trusting the manifest so the row is captured again
+            self.manifest.forget_thumbs((uid,))
+        return pixels
+
+    def on_thumbnails_loaded(self, batch):
+        # Called on the loader thread
+        wx.CallAfter(self.apply_thumbnails, batch)
+
+    def apply_thumbnails(self, batch):
+        # Only the bitmap wrapping happens here; the pixels are already read
+        items = dv.DataViewItemArray()
+        for uid, pixels in batch:
+            if pixels is None:
+                self.on_thumbs_changed() # The manifest may have just forgotten it
+                self.thumbnails.mark_missing(uid)
+                node = self.model.node_by_uid.get(uid)
+                if node:
+                    # Painted with the placeholder, so it is on screen: capture it
+                    self.fetch_for_node(node, VISIBLE_PRIORITY)
+                continue
+            bmp = wx.Bitmap.FromBuffer(THUMB_WIDTH, THUMB_HEIGHT, pixels)
+            self.thumbnails.put(uid, bmp, THUMB_WIDTH * THUMB_HEIGHT * 4)
+            node = self.model.node_by_uid.get(uid)
+            if node:
+                items.append(self.model.ObjectToItem(node))
+        if items:
+            # One repaint for the whole batch
+            self.model.ItemsChanged(items)
+
+    def on_thumbnail_ready(self, uid, cache_path):
+        # A thumbnail-only capture leaves the master, and so the viewer image, as it was
+        self.on_screenshot_ready(uid, cache_path, master_changed=False)
+
+    def on_screenshot_ready(self, uid, cache_path, master_changed=True):
+        self.pending_requests.pop(uid, None)
+        if cache_path is None:
+            return # Capture failed; the worker has logged it
+        self.on_thumbs_changed()
+        if master_changed:
+            self.viewer_images.invalidate(uid)
             
         node = self.model.node_by_uid.get(uid)
         if node:
-            self.load_thumbnail(node, cache_path)
-            item = self.model.ObjectToItem(node)
-            self.model.ItemChanged(item)
+            # The fresh thumbnail arrives with the loader's next batch, which
+            # repaints the row; until then the old bitmap, if any, is shown
+            self.thumbnails.reload(uid)
             
             # Check if this node is currently selected
             selected_item = self.dvc.GetSelection()
             if selected_item.IsOk() and self.model.ItemToObject(selected_item) == node:
-                master_path = os.path.join("cache", f"{uid}.png")
-                self.update_image_display(master_path)
+                if self.manifest.has_master(uid):
+                    self.select_viewer_image(node) # Decoded off-thread, then shown
+        else:
+            self.thumbnails.invalidate(uid) # Filtered out; reloaded if it comes back
 
     def on_image_clicked(self, event):
         item = self.dvc.GetSelection()
@@ -531,21 +764,71 @@ class MainFrame(wx.Frame):
         url = node.data.get('url')
         if not uid or not url: return
         
-        # Priority 0 for user-initiated reloads, bypassing cache
-        if uid in self.pending_requests:
-            # We don't remove it from pending_requests because we want to avoid duplicate fetches
-            # but priority 0 will jump it to the front of the queue
-            pass
-        
+        # Priority 0 for user-initiated reloads, bypassing cache; the worker
+        # merges this with any request already queued for the uid
+        self.pending_requests[uid] = 0
         self.worker.request_screenshot(uid, url, self.on_screenshot_ready, priority=0, force_refresh=True)
 
     def on_item_activated(self, event):
         pass # Remove default double click routing for DVC 6th col
 
     def on_search(self, event):
+        # Restart the debounce window on every keystroke
+        if self.search_timer and self.search_timer.IsRunning():
+            self.search_timer.Stop()
+        self.search_timer = wx.CallLater(SEARCH_DEBOUNCE_MS, self.start_filter)
+
+    def start_filter(self):
         query = self.search_ctrl.GetValue()
         is_regex = self.regex_cb.GetValue()
-        self.model.set_filter(query, is_regex)
+        self.filter_thread.submit(query, is_regex, self.facet_selection())
+
+    def facet_selection(self):
+        selection = {}
+        for facet, facet_list in self.facet_lists.items():
+            checked = facet_list.GetCheckedItems()
+            if checked:
+                values = self.facet_values[facet]
+                selection[facet] = frozenset(values[i] for i in checked)
+        return selection
+
+    def on_facet_toggled(self, event):
+        # No debounce: facet filtering is set algebra on precomputed bitsets
+        self.start_filter()
+
+    def on_clear_facets(self, event):
+        for facet_list in self.facet_lists.values():
+            for i in facet_list.GetCheckedItems():
+                facet_list.Check(i, False)
+        self.start_filter()
+
+    def update_facet_counts(self, counts):
+        for facet, facet_list in self.facet_lists.items():
+            facet_counts = counts.get(facet, {})
+            for i, value in enumerate(self.facet_values[facet]):
+                label = f"{value} ({facet_counts.get(value, 0)})"
+                if facet_list.GetString(i) != label:
+                    checked = facet_list.IsChecked(i)
+                    facet_list.SetString(i, label)
+                    facet_list.Check(i, checked) # Not every platform keeps the check across SetString
+
+    def on_filter_computed(self, generation, args, result):
+        # Called on the filter thread
+        wx.CallAfter(self.apply_filter_result, generation, args, result)
+
+    def apply_filter_result(self, generation, args, result):
+        if not self.filter_thread.is_current(generation):
+            return # A newer query is already on its way
+        query, is_regex, selection = args
+        rows, counts = result
+        self.model.apply_filter(query, is_regex, rows, selection)
+        self.model.facet_counts = counts
+        self.update_facet_counts(counts)
+
+        # Rows the filter removed should not hold on to a capture slot
+        for uid in list(self.pending_requests):
+            if uid not in self.model.node_by_uid:
+                self.cancel_request(uid)
         
     def on_search_cancel(self, event):
         self.search_ctrl.SetValue("")
@@ -557,6 +840,7 @@ class MainFrame(wx.Frame):
         
         node = self.model.ItemToObject(item)
         if getattr(node, 'is_category', False):
+            self.selected_uid = None
             self.desc_text.SetValue("")
             self.links_panel.Hide()
             self.img_panel.Layout()
@@ -580,14 +864,43 @@ class MainFrame(wx.Frame):
             
         self.img_panel.Layout()
         
-        cache_path = os.path.join("cache", f"{uid}.png")
-        if os.path.exists(cache_path):
-            self.update_image_display(cache_path)
+        self.selected_uid = uid
+        if self.manifest.has_master(uid):
+            # Usually decoded already, while a neighbouring row was selected
+            pixels = self.viewer_images.get(uid)
+            if pixels is not None:
+                self.update_image_display(pixels)
         else:
-            if uid not in self.pending_requests:
-                self.pending_requests.add(uid)
+            if self.pending_requests.get(uid, 10) > 5:
+                self.pending_requests[uid] = 5
                 # Priority 5 for active selection fetches
                 self.worker.request_screenshot(uid, url, self.on_screenshot_ready, priority=5)
+        self.select_viewer_image(node)
+
+    def select_viewer_image(self, node):
+        uids = [n.data.get('uid') for n in neighbors(node, self.viewer_images.neighbors, self.displayed_children) if not n.is_category]
+        self.viewer_images.select(node.data.get('uid'), uids)
+
+    def decode_viewer_image(self, uid):
+        # Runs on the viewer cache thread
+        if not self.manifest.has_master(uid):
+            return None
+        master_path = self.manifest.master_path(uid)
+        path = viewer_path(master_path)
+        if not os.path.exists(path):
+            path = master_path # Captured before viewer variants were written
+        try:
+            return decode_for_display(path, VIEWER_WIDTH, VIEWER_HEIGHT)
+        except OSError:
+            return None # A file deleted behind the manifest's back is not worth a message
+
+    def on_viewer_image_decoded(self, uid, pixels):
+        # Called on the viewer cache thread
+        wx.CallAfter(self.show_viewer_image, uid, pixels)
+
+    def show_viewer_image(self, uid, pixels):
+        if uid == self.selected_uid:
+            self.update_image_display(pixels)
 
     def on_img_panel_size(self, event):
         self.scale_current_image()
@@ -597,34 +910,97 @@ class MainFrame(wx.Frame):
         # Disabled for comparison
         pass
 
-    def update_image_display(self, cache_path):
-        if not os.path.exists(cache_path): return
-        img = wx.Image(cache_path, wx.BITMAP_TYPE_PNG)
-        # Scale master image for display in side panel
-        img = img.Scale(VIEWER_WIDTH, VIEWER_HEIGHT, wx.IMAGE_QUALITY_HIGH)
+    def update_image_display(self, pixels):
+        # Already decoded and scaled by the viewer cache thread
+        img = wx.Image(VIEWER_WIDTH, VIEWER_HEIGHT, pixels)
         self.current_image = img
         bmp = wx.Bitmap(img)
         self.static_bitmap.SetBitmap(bmp)
         self.img_panel.Layout()
 
 class MyApp(wx.App):
+    def __init__(self, options, **kwargs):
+        self.options = options
+        super().__init__(**kwargs)
+
     def OnInit(self):
-        data = parse_oshwa_projects("oshwa_projects.json")
-        frame = MainFrame(data)
+        data = load_projects("oshwa_projects.json", "cache")
+        frame = MainFrame(data, lookahead=self.options.lookahead, thumb_cache_mb=self.options.thumb_cache_mb,
+                          shards=self.options.shards, per_host_limit=self.options.per_host_limit,
+                          min_host_interval=self.options.host_interval,
+                          image_options=ImageOptions(self.options.image_format, self.options.image_quality,
+                                                     self.options.png_compress_level),
+                          capture_mode=self.options.capture_mode, viewer_neighbors=self.options.viewer_neighbors,
+                          browser_idle=self.options.browser_idle or None)
+        if self.options.metrics_port:
+            serve_metrics(frame.worker.metrics_report, self.options.metrics_port)
         frame.Show()
         return True
 
+def instrument_gui(profiler):
+    """The model callbacks, renderer and frame handlers that run on the GUI thread."""
+    profiler.instrument(WordWrapRenderer, ("Render", "GetSize"))
+    profiler.instrument(ProjectDataViewModel, ("build_tree", "apply_filter", "GetChildren", "IsContainer", "GetParent",
+                                               "GetValue", "Compare"))
+    profiler.instrument(MainFrame, ("_adjust_columns", "update_fonts", "on_timer", "check_visible_items",
+                                    "on_thumbnail_miss", "apply_thumbnails", "on_screenshot_ready", "apply_filter_result",
+                                    "on_item_selected", "show_viewer_image", "scale_current_image",
+                                    "update_facet_counts"))
+    profiler.instrument(MyApp, ("OnInit",))
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="OSHWA Project Viewer")
     parser.add_argument("--clear-cache", action="store_true", help="Invalidate the cache by deleting all cached screenshots")
+    parser.add_argument("--rebuild-manifest", action="store_true", help="Rebuild the cache manifest from the files in the cache directory")
+    parser.add_argument("--lookahead", type=int, default=DEFAULT_LOOKAHEAD, help="Rows above and below the visible area to fetch thumbnails for")
+    parser.add_argument("--thumb-cache-mb", type=int, default=DEFAULT_BUDGET_MB, help="Memory budget in MB for decoded thumbnails kept in memory")
+    parser.add_argument("--shards", type=int, default=1, help="Number of browser processes to spread captures over")
+    parser.add_argument("--per-host-limit", type=int, default=DEFAULT_PER_HOST_LIMIT, help="Captures in flight against one host at a time")
+    parser.add_argument("--host-interval", type=float, default=DEFAULT_MIN_HOST_INTERVAL, help="Minimum seconds between capture starts on one host")
+    parser.add_argument("--image-format", choices=sorted(FORMATS), default=DEFAULT_FORMAT, help="Format for newly captured master screenshots")
+    parser.add_argument("--image-quality", type=int, default=DEFAULT_QUALITY, help="JPEG/WebP quality for master screenshots")
+    parser.add_argument("--png-compress-level", type=int, default=DEFAULT_COMPRESS_LEVEL, help="PNG compression level (0-9) for master screenshots")
+    parser.add_argument("--capture-mode", choices=CAPTURE_MODES, default=DEFAULT_CAPTURE_MODE, help="clip: browser-side crop, thumbnail-only background captures; full: whole-viewport PNG per capture")
+    parser.add_argument("--viewer-neighbors", type=int, default=DEFAULT_NEIGHBORS, help="Rows above and below the selection whose screenshots are decoded ahead of time")
+    parser.add_argument("--browser-idle", type=float, default=DEFAULT_BROWSER_IDLE, help="Seconds without captures before the browser is shut down (0 keeps it running)")
+    parser.add_argument("--metrics-port", type=int, default=0, help="Serve capture worker metrics as JSON at http://127.0.0.1:<port>/metrics")
+    parser.add_argument("--profile", action="store_true", help=f"Time GUI handlers and model callbacks; report to {REPORT_FILE} on exit")
+    parser.add_argument("--stall-ms", type=float, default=DEFAULT_STALL_MS, help="With --profile, GUI thread calls longer than this are reported as stalls")
+    parser.add_argument("--profile-dump", help="With --profile, also write a cProfile dump of the GUI thread to this file")
     args = parser.parse_args()
     
     if args.clear_cache:
-        for f in glob.glob(os.path.join("cache", "*.png")):
+        masters = [f for ext in MASTER_EXTENSIONS for f in glob.glob(os.path.join("cache", "*" + ext))]
+        for f in masters:
             try:
                 os.remove(f)
             except OSError as e:
                 print(f"Error removing cached file {f}: {e}")
+        try:
+            remove_atlas("cache")
+            remove_manifest("cache")
+            remove_snapshot("cache")
+        except OSError as e:
+            print(f"Error removing cache index files: {e}")
+
+    if args.rebuild_manifest and not args.clear_cache:
+        manifest = CacheManifest("cache")
+        atlas = ThumbnailAtlas("cache", THUMB_WIDTH, THUMB_HEIGHT)
+        print(f"Rebuilt cache manifest with {manifest.rebuild(atlas)} entries")
+        atlas.close()
+        manifest.close()
                 
-    app = MyApp(clearSigInt=True)
+    profiler = None
+    if args.profile:
+        profiler = GuiProfiler(args.stall_ms)
+        instrument_gui(profiler)
+        if args.profile_dump:
+            profiler.start_cprofile()
+
+    app = MyApp(args, clearSigInt=True)
     app.MainLoop()
+
+    if profiler is not None:
+        if args.profile_dump:
+            profiler.stop_cprofile(args.profile_dump)
+        profiler.write_report()
@@ -9,30 +9,58 @@ def parse_oshwa_projects(filepath: str) -> list[dict]:
     if not os.path.exists(filepath):
         return []
 
-    results = []
     with open(filepath, 'r', encoding='utf-8') as f:
         try:
             data = json.load(f)
-            for record in data:
-                uid = record.get("oshwaUid")
-                website = record.get("projectWebsite")
-                if uid and website:
-                    if "github.com" in website.lower() and "#readme" not in website.lower():
-                        website = website.rstrip("/") + "#readme"
-                        
-                    results.append({
-                        "uid": uid,
-                        "url": website,
-                        "country": record.get("country", ""),
-                        "projectName": record.get("projectName", ""),
-                        "projectDescription": record.get("projectDescription", ""),
-                        "documentationUrl": record.get("documentationUrl", ""),
-                        "certificationDate": record.get("certificationDate", ""),
-                        "primaryType": record.get("primaryType", "")
-                    })
         except json.JSONDecodeError as e:
             print(f"Error parsing JSON: {e}")
+            return []
+
+    return parse_records(data)
+
+def changes_path(data_path: str) -> str:
+    """Where a sync of `data_path` reports what it changed: oshwa_projects.json -> oshwa_projects.changes.json"""
+    return os.path.splitext(data_path)[0] + ".changes.json"
 
+def read_changes(data_path: str):
+    """The last sync report for `data_path` (see util/oshwa_api_get_all_projects.py), or None."""
+    try:
+        with open(changes_path(data_path), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+
+def clean_list(values) -> list[str]:
+    """A list field of a raw record with blank entries dropped, e.g. projectKeywords' ' automatic' -> 'automatic'."""
+    if isinstance(values, str):
+        values = values.split(",")
+    return [v.strip() for v in values or () if isinstance(v, str) and v.strip()]
+
+def parse_records(data) -> list[dict]:
+    """Maps raw API records to the fields the viewer uses, skipping ones without a uid or website."""
+    results = []
+    for record in data:
+        uid = record.get("oshwaUid")
+        website = record.get("projectWebsite")
+        if uid and website:
+            if "github.com" in website.lower() and "#readme" not in website.lower():
+                website = website.rstrip("/") + "#readme"
+                
+            results.append({
+                "uid": uid,
+                "url": website,
+                "country": record.get("country", ""),
+                "projectName": record.get("projectName", ""),
+                "projectDescription": record.get("projectDescription", ""),
+                "documentationUrl": record.get("documentationUrl", ""),
+                "certificationDate": record.get("certificationDate", ""),
+                "primaryType": record.get("primaryType", ""),
+                "additionalType": clean_list(record.get("additionalType")),
+                "projectKeywords": clean_list(record.get("projectKeywords")),
+                "hardwareLicense": record.get("hardwareLicense", ""),
+                "softwareLicense": record.get("softwareLicense", ""),
+                "documentationLicense": record.get("documentationLicense", "")
+            })
     return results
 
 if __name__ == "__main__":
@@ -1,132 +1,406 @@
 import asyncio
+import importlib.util
+import statistics
 import threading
+import time
 import os
-import wx
-from io import BytesIO
-from PIL import Image
-from playwright.async_api import async_playwright
+import glob
+from collections import deque
+from thumb_atlas import ThumbnailAtlas
+from cache_manifest import CacheManifest
+from browser_pool import ContextPool, DEFAULT_MAX_USES
+from capture_scheduler import CaptureScheduler, DEFAULT_PER_HOST_LIMIT, DEFAULT_MIN_HOST_INTERVAL
+from worker_metrics import WorkerMetrics, error_kind
+from image_pipeline import (ImagePipeline, ImageOptions, DEFAULT_IMAGE_PROCESSES, SCREENSHOT_WIDTH, SCREENSHOT_HEIGHT,
+                            DEPTH_MULTIPLIER, THUMB_WIDTH, THUMB_FINAL_HEIGHT, THUMB_SCALE, THUMB_JPEG_QUALITY,
+                            thumb_pixels, thumb_clip, screenshot_options, process_capture, process_clipped,
+                            process_thumbnail)
 
 CACHE_DIR = "cache"
 MAX_CONCURRENT_SCREENSHOTS = 6
+# Seconds without captures before the browser and image pool are shut down;
+# None keeps them running until stop()
+DEFAULT_BROWSER_IDLE = 120.0
 
-# Screenshot and Thumbnail Constants
-SCREENSHOT_WIDTH = 1024
-SCREENSHOT_HEIGHT = 768
-DEPTH_MULTIPLIER = 1.5
+# "clip": Chromium crops and encodes the master itself, and thumbnail-only
+# requests are rendered at thumbnail scale. "full": one PNG of the whole
+# viewport, cropped and re-encoded by PIL, for every request.
+CAPTURE_MODES = ("clip", "full")
+DEFAULT_CAPTURE_MODE = "clip"
 
-THUMB_WIDTH = 256
-THUMB_HEIGHT = 192
-THUMB_CROP_PERCENT = 0.15
+def playwright_available() -> bool:
+    """Whether Playwright can be imported, without importing it (the worker only does on its first capture)."""
+    return importlib.util.find_spec("playwright") is not None
+
+def wx_call_after(callback, *args):
+    # Imported here so headless users of the worker never load wx
+    import wx
+    wx.CallAfter(callback, *args)
 
 class ScreenshotWorker(threading.Thread):
-    def __init__(self):
+    """
+    Captures project sites with Playwright on its own thread and asyncio loop.
+    The browser is launched when the first uncached capture needs it and
+    closed again after `browser_idle` seconds without work, so a session
+    that only shows cached thumbnails never starts one.
+
+    Callbacks are invoked as callback(uid, master_path) through `dispatch`,
+    which defaults to wx.CallAfter so GUI callers run on the GUI thread;
+    master_path is None when the capture failed. A thumbnail-only request
+    may be answered without a master, so check the manifest before
+    opening master_path.
+    """
+
+    def __init__(self, atlas=None, manifest=None, max_concurrent=MAX_CONCURRENT_SCREENSHOTS, dispatch=wx_call_after,
+                 use_pool=True, pool_max_uses=DEFAULT_MAX_USES, per_host_limit=DEFAULT_PER_HOST_LIMIT,
+                 min_host_interval=DEFAULT_MIN_HOST_INTERVAL, image_options=None,
+                 image_processes=DEFAULT_IMAGE_PROCESSES, capture_mode=DEFAULT_CAPTURE_MODE,
+                 browser_idle=DEFAULT_BROWSER_IDLE):
         super().__init__(daemon=True)
-        self.loop = None
-        self.queue = None
+        # Created up front so requests made before the thread runs are queued, not lost
+        self.loop = asyncio.new_event_loop()
+        self.scheduler = CaptureScheduler(per_host_limit, min_host_interval)
+        self.wakeup = asyncio.Event() # Set when jobs arrive or stop() is called
+        self.stopping = False
         self.semaphore = None
+        self.max_concurrent = max_concurrent
+        self.dispatch = dispatch
+        self.ready = threading.Event() # Set once the cache has been prepared
+        self.use_pool = use_pool
+        self.pool_max_uses = pool_max_uses
+        self.browser_idle = browser_idle
+        self.playwright = None
+        self.browser = None # Running browser, or None until a capture needs one
+        self.launches = 0
+        self.last_used = 0.0 # Clock time the last capture finished
+        self.pool = None
+        self.thumb_pool = None # Contexts rendering at THUMB_SCALE, for thumbnail-only captures
+        self._launch_lock = None
+        self.capture_mode = capture_mode
+        self.image_options = image_options or ImageOptions()
+        self.images = ImagePipeline(image_processes)
+        # Recent capture latencies in seconds, split by how the page was obtained
+        self.latencies = {"pooled": deque(maxlen=1000), "fresh": deque(maxlen=1000)}
+        self.metrics = WorkerMetrics()
+        # Opened in prepare_cache() when not supplied by the caller
+        self.atlas = atlas
+        self.manifest = manifest
 
     def run(self):
-        self.loop = asyncio.new_event_loop()
         asyncio.set_event_loop(self.loop)
         self.loop.run_until_complete(self.main_loop())
 
     async def main_loop(self):
-        self.queue = asyncio.PriorityQueue()
-        self.semaphore = asyncio.Semaphore(MAX_CONCURRENT_SCREENSHOTS)
-        
-        async with async_playwright() as p:
-            browser = await p.chromium.launch(headless=True)
-            
-            while True:
-                # PriorityQueue returns (priority, data)
-                item = await self.queue.get()
-                if item is None:
-                    break
-                
-                priority, uid, url, callback, force_refresh = item
-                asyncio.create_task(self.process_request(browser, uid, url, callback, force_refresh))
-
-            await browser.close()
-
-    async def process_request(self, browser, uid, url, callback, force_refresh):
-        cache_path = os.path.join(CACHE_DIR, f"{uid}.png")
-        thumb_path = os.path.join(CACHE_DIR, f"{uid}_thumb.png")
-        
-        if not force_refresh and os.path.exists(thumb_path):
-            wx.CallAfter(callback, uid, thumb_path)
+        self.semaphore = asyncio.Semaphore(self.max_concurrent)
+        self._launch_lock = asyncio.Lock()
+        # Requests queue up while old per-file thumbnails are imported
+        await asyncio.to_thread(self.prepare_cache)
+        self.ready.set()
+
+        tasks = set()
+        while True:
+            # Take a capture slot first and only then pick the job, so
+            # priority is decided when the slot is granted, not at enqueue
+            await self.semaphore.acquire()
+            job = await self.next_job()
+            if job is None:
+                self.semaphore.release()
+                break
+
+            task = asyncio.create_task(self.run_job(job))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await self.close_browser()
+
+    async def launch_browser(self):
+        """The running browser, launching it and the image pool first if needed."""
+        async with self._launch_lock:
+            if self.browser is None:
+                # Imported on first use: Playwright is slow to load and a warm cache never needs it
+                from playwright.async_api import async_playwright
+                self.images.start()
+                try:
+                    self.playwright = await async_playwright().start()
+                    self.browser = await self.playwright.chromium.launch(headless=True)
+                except Exception:
+                    # Leave nothing running; the next capture tries again from scratch
+                    if self.playwright is not None:
+                        await self.playwright.stop()
+                        self.playwright = None
+                    await asyncio.to_thread(self.images.close)
+                    raise
+                # Both pools share the slot count as their limit, so idle contexts of one
+                # kind are closed to make room for the other instead of piling up
+                self.pool = ContextPool(self.browser, self.context_options(), self.pool_max_uses,
+                                        limit=self.max_concurrent)
+                self.thumb_pool = ContextPool(self.browser, self.context_options(thumb_only=True), self.pool_max_uses,
+                                              share_with=self.pool)
+                self.launches += 1
+            return self.browser
+
+    async def close_browser(self):
+        if self.browser is None:
             return
+        browser, self.browser = self.browser, None
+        await self.pool.close()
+        await self.thumb_pool.close()
+        await browser.close()
+        await self.playwright.stop()
+        self.playwright = None
+        await asyncio.to_thread(self.images.close)
 
-        async with self.semaphore:
-            # Re-check cache inside semaphore if not forcing
-            if not force_refresh and os.path.exists(thumb_path):
-                wx.CallAfter(callback, uid, thumb_path)
-                return
+    def idle_deadline(self):
+        """Clock time at which the idle browser should be closed, or None while it is busy or not running."""
+        if self.browser is None or self.browser_idle is None or self.scheduler.in_flight or self.scheduler:
+            return None
+        return self.last_used + self.browser_idle
 
-            context = None
+    async def next_job(self):
+        while True:
+            job = self.scheduler.pop()
+            if job is not None or (self.stopping and not self.scheduler):
+                return job
+            self.wakeup.clear()
+            # Every waiting host may be parked for politeness; sleep until the
+            # first one is due unless a new job or a finished capture comes first
+            delay = self.scheduler.next_wakeup()
+            idle_at = self.idle_deadline()
+            if idle_at is not None:
+                remaining = idle_at - time.monotonic()
+                if remaining <= 0:
+                    await self.close_browser()
+                    continue
+                delay = remaining if delay is None else min(delay, remaining)
             try:
-                context = await browser.new_context(viewport={'width': SCREENSHOT_WIDTH, 'height': int(SCREENSHOT_HEIGHT * DEPTH_MULTIPLIER)})
+                await asyncio.wait_for(self.wakeup.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+
+    async def run_job(self, job):
+        cache_path = None
+        started = time.monotonic()
+        self.metrics.observe("queue", started - job.queued_at)
+        try:
+            cache_path = await self.process_request(job)
+        finally:
+            self.last_used = time.monotonic()
+            elapsed = self.last_used - started
+            self.scheduler.finish(job, elapsed, cache_path is not None)
+            self.finished(job, elapsed, cache_path is not None)
+            self.metrics.observe("total", elapsed)
+            self.metrics.completed(cache_path is not None)
+            self.semaphore.release()
+            self.wakeup.set() # The host, or a held-back refresh for this uid, may be free now
+        for callback in job.callbacks:
+            self.dispatch(callback, job.uid, cache_path)
+
+    def context_options(self, thumb_only=False):
+        options = {"viewport": {'width': SCREENSHOT_WIDTH, 'height': int(SCREENSHOT_HEIGHT * DEPTH_MULTIPLIER)}}
+        if thumb_only:
+            # Same CSS layout, rendered with fewer device pixels
+            options["device_scale_factor"] = THUMB_SCALE
+        return options
+
+    def prepare_cache(self):
+        if self.atlas is None:
+            self.atlas = ThumbnailAtlas(CACHE_DIR, THUMB_WIDTH, THUMB_FINAL_HEIGHT)
+        if self.manifest is None:
+            self.manifest = CacheManifest(CACHE_DIR)
+        prepare_cache(self.atlas, self.manifest)
+
+    def is_cached(self, uid, thumb_only=False):
+        return self.manifest.has_thumb(uid) and (thumb_only or self.manifest.has_master(uid))
+
+    def master_path(self, uid):
+        return os.path.join(CACHE_DIR, uid + self.image_options.extension)
+
+    def cached_master_path(self, uid):
+        return self.manifest.master_path(uid) or self.master_path(uid)
+
+    def store_capture(self, uid, url, master_path, master_size, pixels):
+        self.atlas.put(uid, pixels)
+        self.manifest.record_capture(uid, url, os.path.basename(master_path), master_size, self.atlas.slot_size)
+
+    def store_thumb(self, uid, url, pixels):
+        self.atlas.put(uid, pixels)
+        self.manifest.record_thumb(uid, url, self.atlas.slot_size)
+
+    def store_failure(self, uid, url, error):
+        self.manifest.record_failure(uid, url, error)
+
+    def record_latency(self, mode, seconds):
+        self.latencies[mode].append(seconds)
+
+    async def process_request(self, job):
+        """Captures one site while holding a slot; returns the master path, or None on failure."""
+        uid, url = job.uid, job.url
+        # Re-check the cache now that the slot is ours, if not forcing
+        if not job.force_refresh and self.is_cached(uid, job.thumb_only):
+            return self.cached_master_path(uid)
+        try:
+            browser = await self.launch_browser()
+        except Exception as e:
+            # Not the site's fault, so nothing is recorded against the project
+            print(f"Could not start the browser for {uid}: {e}")
+            self.metrics.error(error_kind(e))
+            return None
+        cache_path = self.master_path(uid)
+        thumb_only = job.thumb_only and self.capture_mode == "clip"
+
+        context = None
+        pooled = None
+        reusable = False
+        started = mark = time.monotonic()
+
+        def lap(phase):
+            nonlocal mark
+            now = time.monotonic()
+            self.metrics.observe(phase, now - mark)
+            mark = now
+
+        try:
+            if self.use_pool:
+                pooled = await (self.thumb_pool if thumb_only else self.pool).acquire()
+                page = pooled.page
+            else:
+                context = await browser.new_context(**self.context_options(thumb_only))
                 page = await context.new_page()
-                await page.goto(url, wait_until="load", timeout=30000)
+            lap("acquire")
+            await page.goto(url, wait_until="load", timeout=30000)
+            lap("goto")
+
+            # Decoding, resizing and encoding run in the image pool, off this process's GIL
+            if thumb_only:
+                img_bytes = await page.screenshot(clip=thumb_clip(url), type="jpeg", quality=THUMB_JPEG_QUALITY)
+                lap("screenshot")
+                pixels = await self.images.run(process_thumbnail, img_bytes)
+                lap("process")
+                self.store_thumb(uid, url, pixels)
+                cache_path = self.cached_master_path(uid)
+            elif self.capture_mode == "clip":
+                img_bytes = await page.screenshot(**screenshot_options(url, self.image_options))
+                lap("screenshot")
+                master_size, pixels = await self.images.run(process_clipped, img_bytes, url, cache_path,
+                                                            self.image_options)
+                lap("process")
+                self.store_capture(uid, url, cache_path, master_size, pixels)
+            else:
                 img_bytes = await page.screenshot()
-                
-                def process_images():
-                    # Save Master
-                    img = Image.open(BytesIO(img_bytes))
-                    
-                    is_github = url.startswith("https://github.com/")
-                    if is_github:
-                        # Crop 50px top, 312px right, 301px bottom
-                        right = SCREENSHOT_WIDTH - 312
-                        bottom = int(SCREENSHOT_HEIGHT * DEPTH_MULTIPLIER) - 301
-                        img = img.crop((0, 50, right, bottom))
-                        
-                    img.save(cache_path, format="PNG")
-
-                    # Create Thumbnail
-                    if is_github:
-                        # Crop top 534px (2/3 of the 801px cropped master)
-                        crop_box = (0, 0, right, 534)
-                        cropped_img = img.crop(crop_box)
-                    else:
-                        # 1. Crop top portion (original SCREENSHOT_HEIGHT)
-                        crop_box = (0, 0, SCREENSHOT_WIDTH, SCREENSHOT_HEIGHT)
-                        cropped_img = img.crop(crop_box)
-                    
-                    # 2. Scale width to THUMB_WIDTH, preserving aspect ratio
-                    w, h = cropped_img.size
-                    scale = THUMB_WIDTH / float(w)
-                    new_h = int(h * scale)
-                    thumb = cropped_img.resize((THUMB_WIDTH, new_h), Image.Resampling.LANCZOS)
-                    
-                    # 3. Center crop to target thumbnail height
-                    main_crop_h = int(THUMB_HEIGHT * THUMB_CROP_PERCENT)
-                    target_final_h = THUMB_HEIGHT - 2 * main_crop_h
-                    
-                    crop_top = (thumb.height - target_final_h) // 2
-                    thumb_crop_box = (0, crop_top, THUMB_WIDTH, crop_top + target_final_h)
-                    final_thumb = thumb.crop(thumb_crop_box)
-                    
-                    final_thumb.save(thumb_path, format="PNG")
-
-                await asyncio.to_thread(process_images)
-
-                wx.CallAfter(callback, uid, thumb_path)
-
-            except Exception as e:
-                print(f"Error fetching {url} for {uid}: {e}")
-            finally:
-                if context:
-                    await context.close()
-
-    def request_screenshot(self, uid, url, callback, priority=10, force_refresh=False):
-        if not self.loop or not self.queue:
-            return
-            
+                lap("screenshot")
+                master_size, pixels = await self.images.run(process_capture, img_bytes, url, cache_path,
+                                                            self.image_options)
+                lap("process")
+                self.store_capture(uid, url, cache_path, master_size, pixels)
+            lap("store")
+            self.record_latency("pooled" if pooled else "fresh", time.monotonic() - started)
+            reusable = True
+            return cache_path
+
+        except Exception as e:
+            print(f"Error fetching {url} for {uid}: {e}")
+            self.metrics.error(error_kind(e))
+            self.store_failure(uid, url, e)
+            return None
+        finally:
+            if pooled:
+                await (self.thumb_pool if thumb_only else self.pool).release(pooled, reusable)
+            if context:
+                await context.close()
+
+    def request_screenshot(self, uid, url, callback, priority=10, force_refresh=False, thumb_only=False):
         def _enqueue():
-            # (priority, uid, url, callback, force_refresh)
             # Standard background fetches use priority 10
             # Selection-based fetches use priority 5
             # Manual reloads use priority 0
-            self.queue.put_nowait((priority, uid, url, callback, force_refresh))
+            if not force_refresh and self.manifest is not None and self.is_cached(uid, thumb_only):
+                # Cache hits are answered without ever taking a capture slot
+                self.metrics.hit()
+                self.dispatch(callback, uid, self.cached_master_path(uid))
+                return
+            self.metrics.miss()
+            self.scheduler.submit(uid, url, callback, priority, force_refresh, thumb_only)
+            self.wakeup.set()
             
         self.loop.call_soon_threadsafe(_enqueue)
+
+    def cancel(self, uid):
+        """
+        Withdraws a request that has not started yet, e.g. for a row that
+        scrolled away or was filtered out. Its callbacks are never called.
+        """
+        def _cancel():
+            job = self.scheduler.cancel(uid)
+            if job is not None:
+                self.cancelled(job)
+        self.loop.call_soon_threadsafe(_cancel)
+
+    def cancelled(self, job):
+        pass
+
+    def finished(self, job, seconds, ok):
+        pass
+
+    def latency_report(self):
+        """Capture latency summary per page source, in seconds."""
+        return summarize_latencies(self.latencies)
+
+    def host_report(self, limit=None):
+        """Per-host queue depth and capture latency; see CaptureScheduler.host_report()."""
+        return self.scheduler.host_report(limit)
+
+    def metrics_report(self):
+        """WorkerMetrics.report() plus queue depth by priority, captures in flight and the busiest hosts."""
+        report = self.metrics.report()
+        report["queued"] = self.scheduler.depth_by_priority()
+        report["in_flight"] = len(self.scheduler.in_flight)
+        report["hosts"] = self.host_report(limit=5)
+        report["browser"] = self.browser is not None
+        report["launches"] = self.launches
+        return report
+
+    def stop(self):
+        """Finishes everything queued so far, then closes the browser and ends the thread."""
+        def _stop():
+            self.stopping = True
+            self.wakeup.set()
+        self.loop.call_soon_threadsafe(_stop)
+
+def prepare_cache(atlas, manifest):
+    migrated = migrate_legacy_thumbnails(atlas)
+    if migrated or manifest.is_new:
+        manifest.rebuild(atlas)
+    else:
+        # An atlas started over (new geometry, lost file) leaves the manifest vouching for thumbnails it no longer has
+        manifest.forget_missing_thumbs(atlas)
+
+def migrate_legacy_thumbnails(atlas):
+    # Older caches kept one {uid}_thumb.png per project; fold them into the atlas
+    migrated = 0
+    for thumb_path in glob.glob(os.path.join(CACHE_DIR, "*_thumb.png")):
+        from PIL import Image
+        uid = os.path.basename(thumb_path)[:-len("_thumb.png")]
+        try:
+            if uid not in atlas:
+                with Image.open(thumb_path) as img:
+                    atlas.put(uid, thumb_pixels(img))
+            os.remove(thumb_path)
+            migrated += 1
+        except (OSError, ValueError) as e:
+            print(f"Error migrating thumbnail {thumb_path}: {e}")
+    return migrated
+
+def summarize_latencies(latencies):
+    report = {}
+    for mode, samples in latencies.items():
+        if not samples:
+            continue
+        ordered = sorted(samples)
+        report[mode] = {
+            "count": len(ordered),
+            "mean": statistics.fmean(ordered),
+            "p50": ordered[len(ordered) // 2],
+            "p95": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+        }
+    return report
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+# Warm the screenshot cache for every project without opening the viewer.
+# Uses the same ScreenshotWorker, thumbnail atlas and manifest as main.py,
+# but never imports wx. Safe to interrupt: finished captures are recorded in
+# the manifest as they complete, so a rerun picks up where it left off.
+
+import argparse
+import queue
+import sys
+import time
+from collections import Counter
+from oshwa_parser import parse_oshwa_projects, read_changes
+from playwright_worker import (ScreenshotWorker, CACHE_DIR, MAX_CONCURRENT_SCREENSHOTS, THUMB_WIDTH, THUMB_FINAL_HEIGHT,
+                               CAPTURE_MODES, DEFAULT_CAPTURE_MODE)
+from sharded_worker import ShardedScreenshotWorker
+from thumb_atlas import ThumbnailAtlas
+from cache_manifest import CacheManifest, STATUS_FAILED
+from capture_scheduler import DEFAULT_PER_HOST_LIMIT, DEFAULT_MIN_HOST_INTERVAL
+from worker_metrics import dump_metrics, serve_metrics
+from image_pipeline import ImageOptions, FORMATS, DEFAULT_FORMAT, DEFAULT_QUALITY, DEFAULT_COMPRESS_LEVEL
+
+def select_records(records, manifest, retry_failed=False, force=False, thumbs_only=False):
+    """Splits records into those still needing a capture and those to skip."""
+    todo = []
+    skipped = 0
+    seen = set()
+    for record in records:
+        uid = record["uid"]
+        if uid in seen:
+            continue # Duplicate uid in the dataset
+        seen.add(uid)
+        entry = manifest.get(uid)
+        if not force and manifest.has_thumb(uid) and (thumbs_only or manifest.has_master(uid)):
+            skipped += 1
+        elif not force and not retry_failed and entry and entry["status"] == STATUS_FAILED:
+            skipped += 1
+        else:
+            todo.append(record)
+    return todo, skipped
+
+def prefetch(records, concurrency=MAX_CONCURRENT_SCREENSHOTS, retry_failed=False, force=False, use_pool=True, shards=1,
+             per_host_limit=DEFAULT_PER_HOST_LIMIT, min_host_interval=DEFAULT_MIN_HOST_INTERVAL, image_options=None,
+             capture_mode=DEFAULT_CAPTURE_MODE, thumbs_only=False, metrics_file=None, metrics_port=0):
+    atlas = ThumbnailAtlas(CACHE_DIR, THUMB_WIDTH, THUMB_FINAL_HEIGHT)
+    manifest = CacheManifest(CACHE_DIR)
+    results = queue.Queue()
+
+    # Callbacks run on the worker thread; just hand the results over
+    def dispatch(callback, *args):
+        callback(*args)
+
+    politeness = {"per_host_limit": per_host_limit, "min_host_interval": min_host_interval,
+                  "image_options": image_options, "capture_mode": capture_mode}
+    if shards > 1:
+        # concurrency is per shard process
+        worker = ShardedScreenshotWorker(shards, atlas=atlas, manifest=manifest, max_concurrent=concurrency,
+                                         dispatch=dispatch, use_pool=use_pool, **politeness)
+    else:
+        worker = ScreenshotWorker(atlas=atlas, manifest=manifest, max_concurrent=concurrency,
+                                  dispatch=dispatch, use_pool=use_pool, **politeness)
+    worker.start()
+    worker.ready.wait()
+    server = serve_metrics(worker.metrics_report, metrics_port) if metrics_port else None
+
+    todo, skipped = select_records(records, manifest, retry_failed, force, thumbs_only)
+    print(f"{len(records)} records: {skipped} already cached or failed before, {len(todo)} to capture",
+          file=sys.stderr)
+
+    captured = 0
+    failed = []
+    started = time.monotonic()
+    # Keep a bounded window in flight so an interrupt leaves little half-done work
+    window = concurrency * shards * 2
+    next_idx = 0
+    outstanding = 0
+    try:
+        while next_idx < len(todo) or outstanding:
+            while next_idx < len(todo) and outstanding < window:
+                record = todo[next_idx]
+                worker.request_screenshot(record["uid"], record["url"], lambda uid, path: results.put((uid, path)),
+                                          priority=10, force_refresh=True, thumb_only=thumbs_only)
+                next_idx += 1
+                outstanding += 1
+
+            uid, path = results.get()
+            outstanding -= 1
+            if path is None:
+                failed.append(uid)
+            else:
+                captured += 1
+
+            done = captured + len(failed)
+            if done % 25 == 0:
+                rate = captured / (time.monotonic() - started) * 60 # Failures are counted apart
+                busiest = ", ".join(f"{h['host']} {h['queued']}" for h in worker.host_report(limit=3) if h["queued"])
+                print(f"{done}/{len(todo)} done, {len(failed)} failed, {rate:.1f} captures/min"
+                      + (f"; queued by host: {busiest}" if busiest else ""), file=sys.stderr)
+                if metrics_file:
+                    dump_metrics(worker.metrics_report(), metrics_file)
+    except KeyboardInterrupt:
+        print("Interrupted; rerun to resume.", file=sys.stderr)
+    else:
+        worker.stop()
+        worker.join()
+    metrics = worker.metrics_report()
+    if metrics_file:
+        dump_metrics(metrics, metrics_file)
+    if server is not None:
+        server.shutdown()
+
+    elapsed = time.monotonic() - started
+    errors = Counter((manifest.get(uid) or {}).get("error") or "unknown" for uid in failed)
+    return {
+        "records": len(records),
+        "skipped": skipped,
+        "captured": captured,
+        "failed": len(failed),
+        "elapsed": elapsed,
+        "per_minute": captured / elapsed * 60 if elapsed else 0.0, # Successful captures only
+        "errors": errors,
+        "latency": worker.latency_report(),
+        "hosts": worker.host_report(limit=10),
+        "phases": metrics["phases"],
+        "error_kinds": metrics["errors"],
+    }
+
+def print_summary(summary):
+    print(f"Captured {summary['captured']}, failed {summary['failed']}, skipped {summary['skipped']} "
+          f"of {summary['records']} records in {summary['elapsed']:.1f}s "
+          f"({summary['per_minute']:.1f} captures/min)")
+    for mode, stats in summary["latency"].items():
+        print(f"  {mode} pages: {stats['count']} captures, mean {stats['mean']:.2f}s, "
+              f"p50 {stats['p50']:.2f}s, p95 {stats['p95']:.2f}s")
+    for phase, stats in summary["phases"].items():
+        print(f"  {phase:<10} {stats['count']:6d}  mean {stats['mean']:.3f}s, p50 <= {stats['p50']:g}s, "
+              f"p95 <= {stats['p95']:g}s, max {stats['max']:.2f}s")
+    for host in summary["hosts"]:
+        print(f"  {host['host'] or '(no host)'}: {host['completed']} captured, {host['failed']} failed, "
+              f"{host['queued']} queued, mean {host['mean_latency']:.2f}s, max {host['max_latency']:.2f}s")
+    for error, count in summary["errors"].most_common(10):
+        print(f"  {count:5d}  {error[:120]}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pre-warm the OSHWA screenshot cache headlessly")
+    parser.add_argument("--data", default="oshwa_projects.json", help="Project dataset to capture")
+    parser.add_argument("--concurrency", type=int, default=MAX_CONCURRENT_SCREENSHOTS, help="Captures to run at once (per shard)")
+    parser.add_argument("--shards", type=int, default=1, help="Number of browser processes to spread captures over")
+    parser.add_argument("--retry-failed", action="store_true", help="Retry projects whose last capture failed")
+    parser.add_argument("--force", action="store_true", help="Recapture everything, ignoring the cache")
+    parser.add_argument("--per-host-limit", type=int, default=DEFAULT_PER_HOST_LIMIT, help="Captures in flight against one host at a time")
+    parser.add_argument("--host-interval", type=float, default=DEFAULT_MIN_HOST_INTERVAL, help="Minimum seconds between capture starts on one host")
+    parser.add_argument("--image-format", choices=sorted(FORMATS), default=DEFAULT_FORMAT, help="Format for master screenshots")
+    parser.add_argument("--image-quality", type=int, default=DEFAULT_QUALITY, help="JPEG/WebP quality for master screenshots")
+    parser.add_argument("--png-compress-level", type=int, default=DEFAULT_COMPRESS_LEVEL, help="PNG compression level (0-9) for master screenshots")
+    parser.add_argument("--capture-mode", choices=CAPTURE_MODES, default=DEFAULT_CAPTURE_MODE, help="clip: browser-side crop and encode; full: whole-viewport PNG re-encoded by PIL")
+    parser.add_argument("--thumbs-only", action="store_true", help="Capture thumbnails only (clip mode), leaving masters for when a project is opened")
+    parser.add_argument("--changed", action="store_true", help="Recapture only the projects the last dataset sync added or changed")
+    parser.add_argument("--no-pool", action="store_true", help="Create a fresh browser context per capture (for latency comparison)")
+    parser.add_argument("--metrics-file", help="Write capture metrics as JSON to this file as the run progresses")
+    parser.add_argument("--metrics-port", type=int, default=0, help="Serve capture metrics as JSON at http://127.0.0.1:<port>/metrics")
+    args = parser.parse_args()
+
+    records = parse_oshwa_projects(args.data)
+    force = args.force
+    if args.changed:
+        changes = read_changes(args.data)
+        if changes is None:
+            sys.exit(f"No sync report for {args.data}; run util/oshwa_api_get_all_projects.py first")
+        wanted = set(changes["added"]) | set(changes["changed"])
+        records = [r for r in records if r["uid"] in wanted]
+        force = True # A changed project's old screenshot may be of the wrong page
+        print(f"Sync of {changes['synced_at']}: {len(changes['added'])} added, {len(changes['changed'])} changed",
+              file=sys.stderr)
+    summary = prefetch(records, args.concurrency, args.retry_failed, force, use_pool=not args.no_pool,
+                       shards=args.shards, per_host_limit=args.per_host_limit, min_host_interval=args.host_interval,
+                       image_options=ImageOptions(args.image_format, args.image_quality, args.png_compress_level),
+                       capture_mode=args.capture_mode, thumbs_only=args.thumbs_only,
+                       metrics_file=args.metrics_file, metrics_port=args.metrics_port)
+    print_summary(summary)
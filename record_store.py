@@ -0,0 +1,128 @@
+import sys
+
+# Fields kept per record, as produced by oshwa_parser.parse_records
+FIELDS = ("uid", "url", "country", "projectName", "projectDescription", "documentationUrl",
+          "certificationDate", "primaryType", "additionalType", "projectKeywords", "hardwareLicense",
+          "softwareLicense", "documentationLicense")
+
+# Few distinct values over many records: one shared string per value. The
+# JSON decoder hands out a fresh string for every occurrence otherwise.
+# List values are stored as tuples of shared strings.
+INTERNED_FIELDS = frozenset({"country", "primaryType", "certificationDate", "additionalType", "projectKeywords",
+                             "hardwareLicense", "softwareLicense", "documentationLicense"})
+
+# documentationUrl is usually the project website again; share the url string then
+SHARED_FIELDS = {"documentationUrl": "url"}
+
+UNKNOWN_CATEGORY = "Unknown"
+
+class Record:
+    """
+    Read-only, dict-like view of one row of a RecordStore, for code that
+    reads records with .get() and [].
+    """
+    __slots__ = ("store", "row")
+
+    def __init__(self, store, row):
+        self.store = store
+        self.row = row
+
+    def get(self, field, default=None):
+        column = self.store.columns.get(field)
+        return default if column is None else column[self.row]
+
+    def __getitem__(self, field):
+        return self.store.columns[field][self.row]
+
+    def __contains__(self, field):
+        return field in self.store.columns
+
+    def keys(self):
+        return self.store.columns.keys()
+
+    def to_dict(self) -> dict:
+        return {field: column[self.row] for field, column in self.store.columns.items()}
+
+    def __repr__(self):
+        return f"Record({self.to_dict()!r})"
+
+class RecordStore:
+    """
+    The project records as one list per field, addressed by row number.
+
+    Replaces a dict per record: a row costs one slot per field plus its
+    strings, and repeated values (countries, types, dates, documentation
+    URLs equal to the website) share a single string.
+    """
+
+    def __init__(self, records=(), fields=FIELDS):
+        self.fields = tuple(fields)
+        self.columns = {field: [] for field in self.fields}
+        self.extend(records)
+
+    def extend(self, records):
+        """Appends records given as dicts (or anything with .get)."""
+        columns = []
+        for i, field in enumerate(self.fields):
+            shared = SHARED_FIELDS.get(field)
+            if shared not in self.fields[:i]:
+                shared = None # Only a field stored before this one can be shared
+            columns.append((field, self.columns[field], field in INTERNED_FIELDS, shared))
+        for record in records:
+            for field, column, interned, shared in columns:
+                value = record.get(field, "")
+                if interned and type(value) is str:
+                    value = sys.intern(value)
+                elif interned and type(value) is list:
+                    value = tuple(sys.intern(v) for v in value)
+                elif shared is not None and value == record.get(shared):
+                    value = self.columns[shared][-1]
+                column.append(value)
+
+    def __len__(self):
+        return len(self.columns[self.fields[0]])
+
+    def __getitem__(self, row) -> Record:
+        if row < 0:
+            row += len(self)
+        if not 0 <= row < len(self):
+            raise IndexError(row)
+        return Record(self, row)
+
+    def __iter__(self):
+        for row in range(len(self)):
+            yield Record(self, row)
+
+    def column(self, field) -> list:
+        return self.columns[field]
+
+    def value(self, row, field, default=None):
+        column = self.columns.get(field)
+        return default if column is None else column[row]
+
+class ProjectNode:
+    """
+    A category or a project row in the tree. Project nodes point at their
+    record by row; only categories carry a list of children.
+    """
+    __slots__ = ("parent", "data", "is_category", "row", "children")
+
+    def __init__(self, parent, data=None, is_category=False, row=None):
+        self.parent = parent
+        self.data = data or {}
+        self.is_category = is_category
+        self.row = row
+        self.children = [] if is_category else ()
+
+def build_nodes(store):
+    """One node per record, grouped under one node per primaryType."""
+    nodes = []
+    category_nodes = {}
+    for row, cat_name in enumerate(store.column("primaryType")):
+        cat_name = cat_name or UNKNOWN_CATEGORY
+        cat_node = category_nodes.get(cat_name)
+        if cat_node is None:
+            cat_node = ProjectNode(None, {'name': cat_name}, is_category=True)
+            category_nodes[cat_name] = cat_node
+        nodes.append(ProjectNode(cat_node, Record(store, row), is_category=False, row=row))
+    return nodes, category_nodes
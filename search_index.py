@@ -0,0 +1,199 @@
+import re
+import shlex
+import threading
+from array import array
+
+# Fields that take part in the free-text search, in the order they are joined
+SEARCH_FIELDS = ("uid", "projectName", "projectDescription", "primaryType")
+
+# Token length used for the inverted index; shorter query tokens fall back to scanning
+GRAM_SIZE = 3
+
+def split_query(query: str) -> list[str]:
+    """
+    Splits a free-text query the same way the search box always has:
+    shell-style tokens, falling back to the raw string on bad quoting.
+    """
+    try:
+        tokens = shlex.split(query)
+    except ValueError:
+        tokens = [query]
+    return [t.lower() for t in tokens if t]
+
+def diff_rows(old, new):
+    """(removed, added) between two search results; `added` ascending."""
+    old_set = set(old)
+    return old_set.difference(new), sorted(set(new).difference(old_set))
+
+def _grams(text: str) -> set[str]:
+    return {text[i:i + GRAM_SIZE] for i in range(len(text) - GRAM_SIZE + 1)}
+
+class SearchIndex:
+    """
+    Trigram inverted index over the searchable text of each record.
+
+    Records are addressed by their row in the RecordStore handed to the
+    constructor, and results are sorted arrays of row numbers. Plain queries intersect the posting lists of each token's
+    trigrams and then verify the surviving candidates with a substring test,
+    so results are identical to the old linear scan. A query that only
+    extends the previous one is answered by narrowing the previous result.
+    """
+
+    def __init__(self, records):
+        self.texts = []
+        self.postings = {}
+        self.all_rows = array('I')
+        self._lock = threading.Lock()
+        self._last_tokens = None
+        self._last_rows = None
+        self.extend(records)
+
+    def extend(self, records):
+        """Indexes the rows of `records` past the ones already indexed, e.g. after the store grew."""
+        start = len(self.texts)
+        columns = [records.column(f)[start:] for f in SEARCH_FIELDS]
+        with self._lock:
+            for row, values in enumerate(zip(*columns), start):
+                text = " ".join(str(v or '') for v in values).lower()
+                self.texts.append(text)
+                for gram in _grams(text):
+                    posting = self.postings.get(gram)
+                    if posting is None:
+                        self.postings[gram] = array('I', (row,))
+                    else:
+                        posting.append(row)
+            self.all_rows = array('I', range(len(self.texts)))
+            self._last_tokens = None
+            self._last_rows = None
+
+    def __len__(self):
+        return len(self.texts)
+
+    def __getstate__(self):
+        # Only the index itself; the lock and the last query are per process
+        return {"texts": self.texts, "postings": self.postings, "all_rows": self.all_rows}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+        self._last_tokens = None
+        self._last_rows = None
+
+    def search(self, query: str, is_regex: bool = False) -> array:
+        """
+        Returns the ascending row numbers matching the query. An empty query
+        matches everything, as does an invalid regular expression.
+        """
+        query = query.strip()
+        if not query:
+            return self.all_rows
+        with self._lock:
+            if is_regex:
+                return self._search_regex(query)
+
+            tokens = split_query(query)
+            if not tokens:
+                return self.all_rows
+
+            candidates = None
+            if self._last_tokens is not None and self._extends(tokens):
+                candidates = self._last_rows
+
+            rows = self._search_tokens(tokens, candidates)
+            self._last_tokens = tokens
+            self._last_rows = rows
+            return rows
+
+    def _extends(self, tokens):
+        # Every old token contained in some new token means every new match
+        # was already an old match, so the old result is a valid candidate set.
+        return all(any(old in new for new in tokens) for old in self._last_tokens)
+
+    def _search_tokens(self, tokens, candidates):
+        if candidates is None:
+            candidates = self._candidates_from_index(tokens)
+        texts = self.texts
+        return array('I', (
+            row for row in candidates
+            if all(t in texts[row] for t in tokens)
+        ))
+
+    def _candidates_from_index(self, tokens):
+        postings = []
+        for token in tokens:
+            if len(token) < GRAM_SIZE:
+                continue
+            for gram in _grams(token):
+                posting = self.postings.get(gram)
+                if posting is None:
+                    return ()
+                postings.append(posting)
+
+        if not postings:
+            # Only very short tokens: nothing to intersect, scan everything
+            return range(len(self.texts))
+
+        postings.sort(key=len)
+        result = set(postings[0])
+        for posting in postings[1:]:
+            if len(result) < 64:
+                # Few candidates left, the substring check is cheaper than more sets
+                break
+            result.intersection_update(posting)
+            if not result:
+                break
+        return sorted(result)
+
+    def _search_regex(self, query):
+        self._last_tokens = None
+        self._last_rows = None
+        try:
+            pattern = re.compile(query, re.IGNORECASE)
+        except re.error:
+            return self.all_rows # Invalid regex
+        return array('I', (row for row, text in enumerate(self.texts) if pattern.search(text)))
+
+class BackgroundFilter(threading.Thread):
+    """
+    Runs filter computations off the GUI thread.
+
+    Every submit() bumps a generation counter; requests queued while a
+    search is running collapse into the newest one, and results whose
+    generation is no longer current are dropped. `deliver` is called on
+    this thread and is responsible for hopping back to the GUI.
+    """
+
+    def __init__(self, compute, deliver):
+        super().__init__(daemon=True)
+        self.compute = compute
+        self.deliver = deliver
+        self.generation = 0
+        self._cond = threading.Condition()
+        self._pending = None
+
+    def submit(self, *args) -> int:
+        with self._cond:
+            self.generation += 1
+            self._pending = (self.generation, args)
+            self._cond.notify()
+            return self.generation
+
+    def is_current(self, generation: int) -> bool:
+        return generation == self.generation
+
+    def run(self):
+        while True:
+            with self._cond:
+                while self._pending is None:
+                    self._cond.wait()
+                generation, args = self._pending
+                self._pending = None
+
+            try:
+                result = self.compute(*args)
+            except Exception as e:
+                print(f"Error filtering {args}: {e}")
+                continue
+
+            if self.is_current(generation):
+                self.deliver(generation, args, result)
@@ -0,0 +1,283 @@
+import itertools
+import multiprocessing
+import os
+import threading
+from collections import Counter, deque
+from playwright_worker import (ScreenshotWorker, CACHE_DIR, MAX_CONCURRENT_SCREENSHOTS, DEFAULT_CAPTURE_MODE, DEFAULT_BROWSER_IDLE,
+                               THUMB_WIDTH, THUMB_FINAL_HEIGHT, wx_call_after, prepare_cache, summarize_latencies)
+from thumb_atlas import ThumbnailAtlas
+from image_pipeline import ImageOptions
+from cache_manifest import CacheManifest
+from capture_scheduler import (DEFAULT_PER_HOST_LIMIT, DEFAULT_MIN_HOST_INTERVAL, HostStats, host_of,
+                               summarize_hosts)
+from worker_metrics import WorkerMetrics, MetricsForwarder
+
+class ShardProcessWorker(ScreenshotWorker):
+    """
+    ScreenshotWorker running inside a shard process. It owns a browser and
+    an event loop but none of the cache indexes: thumbnails, failures and
+    completions are sent to the parent process, which records them.
+    """
+
+    def __init__(self, shard, results, **kwargs):
+        # Images are processed on a thread: the shard is a daemon process and
+        # may not start a process pool of its own, and its GIL is its own anyway
+        super().__init__(dispatch=self._send_done, image_processes=0, **kwargs)
+        self.shard = shard
+        self.results = results
+        self.metrics = MetricsForwarder(results)
+
+    def prepare_cache(self):
+        pass # The parent prepared the cache before starting shards
+
+    def is_cached(self, uid, thumb_only=False):
+        return False # The parent only routes uncached or forced work here
+
+    def cached_master_path(self, uid):
+        return self.master_path(uid) # The parent substitutes the one in its manifest
+
+    def store_capture(self, uid, url, master_path, master_size, pixels):
+        self.results.put(("thumb", uid, url, os.path.basename(master_path), master_size, pixels))
+
+    def store_thumb(self, uid, url, pixels):
+        self.results.put(("thumb", uid, url, None, 0, pixels))
+
+    def store_failure(self, uid, url, error):
+        self.results.put(("failed", uid, url, str(error)))
+
+    def record_latency(self, mode, seconds):
+        self.results.put(("latency", mode, seconds))
+
+    def finished(self, job, seconds, ok):
+        self.results.put(("host", job.host, seconds, ok))
+
+    def cancelled(self, job):
+        # The callbacks are the parent's request ids; those requests will get no "done"
+        self.results.put(("cancelled", self.shard, job.uid, list(job.callbacks)))
+
+    def _send_done(self, request, uid, cache_path):
+        # Called once per request the finished job answers
+        self.results.put(("done", self.shard, uid, request, cache_path))
+
+def run_shard(shard, jobs, results, max_concurrent, use_pool, per_host_limit, min_host_interval, image_options,
+              capture_mode, browser_idle):
+    worker = ShardProcessWorker(shard, results, max_concurrent=max_concurrent, use_pool=use_pool,
+                                per_host_limit=per_host_limit, min_host_interval=min_host_interval,
+                                image_options=image_options, capture_mode=capture_mode, browser_idle=browser_idle)
+    worker.start()
+    while True:
+        job = jobs.get()
+        if job is None:
+            break
+        if job[0] == "cancel":
+            worker.cancel(job[1])
+            continue
+        _, priority, uid, url, force_refresh, thumb_only, request = job
+        # The shard's scheduler merges repeats of a uid and upgrades their priority;
+        # the parent's request id stands in for the callback, so each "done" names its request
+        worker.request_screenshot(uid, url, request, priority=priority, force_refresh=force_refresh,
+                                  thumb_only=thumb_only)
+    worker.stop()
+    worker.join()
+    results.put(("exit",))
+
+class ShardedScreenshotWorker:
+    """
+    Drop-in replacement for ScreenshotWorker that spreads captures over
+    several processes, each with its own browser, event loop and GIL.
+
+    The parent keeps the thumbnail atlas and manifest, answers cache hits
+    itself and routes each uid to the shard with the fewest outstanding
+    uids; repeat requests and cancellations for a uid follow it to the same
+    shard, whose scheduler merges or drops them. While a host has uids
+    outstanding, new uids for it go to the same shard, so the per-host
+    limits hold across processes. A listener thread applies shard results
+    to the cache and dispatches callbacks as usual.
+
+    Every request sent to a shard carries an id, and the shard answers
+    each id exactly once: a "done" from the capture that served it, or a
+    "cancelled". A uid stays routed until all its requests are answered,
+    so a thumbnail-only capture finishing does not settle a full or
+    forced request for the same uid that the shard is still working on.
+    """
+
+    def __init__(self, shards, atlas=None, manifest=None, max_concurrent=MAX_CONCURRENT_SCREENSHOTS,
+                 dispatch=wx_call_after, use_pool=True, per_host_limit=DEFAULT_PER_HOST_LIMIT,
+                 min_host_interval=DEFAULT_MIN_HOST_INTERVAL, image_options=None, capture_mode=DEFAULT_CAPTURE_MODE,
+                 browser_idle=DEFAULT_BROWSER_IDLE):
+        self.shards = shards
+        self.atlas = atlas
+        self.manifest = manifest
+        self.max_concurrent = max_concurrent
+        self.dispatch = dispatch
+        self.use_pool = use_pool
+        self.per_host_limit = per_host_limit
+        self.min_host_interval = min_host_interval
+        self.image_options = image_options or ImageOptions()
+        self.capture_mode = capture_mode
+        self.browser_idle = browser_idle # Each shard launches its browser on its first capture
+        self.ready = threading.Event()
+        self.latencies = {"pooled": deque(maxlen=1000), "fresh": deque(maxlen=1000)}
+        self.metrics = WorkerMetrics() # Parent-side hits plus what the shards forward
+
+        # Spawn, not fork: the parent may be a GUI process with live threads
+        self._mp = multiprocessing.get_context("spawn")
+        self._jobs = [self._mp.Queue() for _ in range(shards)]
+        self._results = self._mp.Queue()
+        self._processes = []
+        self._outstanding = [0] * shards
+        self._routed = {} # uid -> shard handling it
+        self._uid_hosts = {} # uid -> host, for routed uids
+        self._host_shards = {} # host -> shard, while the host has routed uids
+        self._host_outstanding = Counter() # host -> routed uids
+        self._priorities = {} # uid -> best priority requested, for routed uids
+        self.hosts = {} # host -> HostStats, from shard reports
+        self._request_ids = itertools.count()
+        self._requests = {} # uid -> {request id: callback, or None once cancelled} not yet answered by its shard
+        self._lock = threading.Lock()
+        self._listener = threading.Thread(target=self._listen, daemon=True)
+
+    def start(self):
+        if self.atlas is None:
+            self.atlas = ThumbnailAtlas(CACHE_DIR, THUMB_WIDTH, THUMB_FINAL_HEIGHT)
+        if self.manifest is None:
+            self.manifest = CacheManifest(CACHE_DIR)
+        prepare_cache(self.atlas, self.manifest)
+
+        for shard, jobs in enumerate(self._jobs):
+            process = self._mp.Process(target=run_shard, args=(shard, jobs, self._results, self.max_concurrent,
+                                                               self.use_pool, self.per_host_limit,
+                                                               self.min_host_interval, self.image_options,
+                                                               self.capture_mode, self.browser_idle),
+                                         daemon=True)
+            process.start()
+            self._processes.append(process)
+        self._listener.start()
+        self.ready.set()
+
+    def request_screenshot(self, uid, url, callback, priority=10, force_refresh=False, thumb_only=False):
+        if not force_refresh and self.manifest.has_thumb(uid) and (thumb_only or self.manifest.has_master(uid)):
+            master_path = self.manifest.master_path(uid) or os.path.join(CACHE_DIR, uid + self.image_options.extension)
+            self.metrics.hit()
+            self.dispatch(callback, uid, master_path)
+            return
+
+        with self._lock:
+            request = next(self._request_ids)
+            self._requests.setdefault(uid, {})[request] = callback
+            self._priorities[uid] = min(priority, self._priorities.get(uid, priority))
+            shard = self._routed.get(uid)
+            if shard is None:
+                host = host_of(url)
+                shard = self._host_shards.get(host)
+                if shard is None:
+                    shard = min(range(self.shards), key=self._outstanding.__getitem__)
+                    self._host_shards[host] = shard
+                self._routed[uid] = shard
+                self._uid_hosts[uid] = host
+                self._host_outstanding[host] += 1
+                self._outstanding[shard] += 1
+        self._jobs[shard].put(("capture", priority, uid, url, force_refresh, thumb_only, request))
+
+    def cancel(self, uid):
+        # The callbacks are dropped right away. The route stays until the
+        # shard has answered every request, with "cancelled" for a waiting
+        # job or "done" for one it had already started, whose result is
+        # only recorded in the cache.
+        with self._lock:
+            shard = self._routed.get(uid)
+            requests = self._requests.get(uid, {})
+            for request in requests:
+                requests[request] = None
+        if shard is not None:
+            self._jobs[shard].put(("cancel", uid))
+
+    def _answer(self, uid, request):
+        # Called with the lock held; returns the request's callback, if still wanted
+        requests = self._requests.get(uid)
+        if not requests or request not in requests:
+            return None
+        callback = requests.pop(request)
+        if not requests:
+            self._settle(uid)
+        return callback
+
+    def _settle(self, uid):
+        # Called with the lock held once a shard has answered every request for uid
+        shard = self._routed.pop(uid, None)
+        if shard is not None:
+            self._outstanding[shard] -= 1
+            host = self._uid_hosts.pop(uid)
+            self._host_outstanding[host] -= 1
+            if not self._host_outstanding[host]:
+                del self._host_outstanding[host]
+                del self._host_shards[host]
+        self._requests.pop(uid, None)
+        self._priorities.pop(uid, None)
+        return shard
+
+    def _listen(self):
+        exited = 0
+        while exited < self.shards:
+            message = self._results.get()
+            kind = message[0]
+            if kind == "thumb":
+                _, uid, url, master_file, master_size, pixels = message
+                self.atlas.put(uid, pixels)
+                if master_file is None:
+                    self.manifest.record_thumb(uid, url, self.atlas.slot_size)
+                else:
+                    self.manifest.record_capture(uid, url, master_file, master_size, self.atlas.slot_size)
+            elif kind == "failed":
+                _, uid, url, error = message
+                self.manifest.record_failure(uid, url, error)
+            elif kind == "latency":
+                _, mode, seconds = message
+                self.latencies[mode].append(seconds)
+            elif kind == "metric":
+                _, method, args = message
+                getattr(self.metrics, method)(*args)
+            elif kind == "host":
+                _, host, seconds, ok = message
+                self.hosts.setdefault(host, HostStats()).record(seconds, ok)
+            elif kind == "done":
+                _, shard, uid, request, cache_path = message
+                if cache_path is not None:
+                    cache_path = self.manifest.master_path(uid) or cache_path
+                with self._lock:
+                    callback = self._answer(uid, request)
+                if callback is not None:
+                    self.dispatch(callback, uid, cache_path)
+            elif kind == "cancelled":
+                _, shard, uid, requests = message
+                with self._lock:
+                    for request in requests:
+                        self._answer(uid, request)
+            elif kind == "exit":
+                exited += 1
+
+    def latency_report(self):
+        return summarize_latencies(self.latencies)
+
+    def host_report(self, limit=None):
+        # Shards do not report starts, so in-flight captures count as queued here
+        with self._lock:
+            queued = dict(self._host_outstanding)
+        return summarize_hosts(dict(self.hosts), queued, {}, limit)
+
+    def metrics_report(self):
+        # As in host_report, captures a shard has started still count as queued
+        report = self.metrics.report()
+        with self._lock:
+            report["queued"] = dict(Counter(self._priorities.values()))
+        report["hosts"] = self.host_report(limit=5)
+        return report
+
+    def stop(self):
+        for jobs in self._jobs:
+            jobs.put(None)
+
+    def join(self, timeout=None):
+        for process in self._processes:
+            process.join(timeout)
+        self._listener.join(timeout)
@@ -0,0 +1,171 @@
+import gc
+import hashlib
+import json
+import os
+import pickle
+
+from oshwa_parser import parse_oshwa_projects
+from record_store import RecordStore, FIELDS
+from search_index import SearchIndex
+from facets import FacetIndex
+from sort_keys import SortKeys, WARM_COLUMNS
+
+SNAPSHOT_FILE = "projects.snapshot"
+SNAPSHOT_MAGIC = b"OSHWA-SNAPSHOT "
+# Bump when the pickled classes change shape so old snapshots are rebuilt
+SNAPSHOT_VERSION = 2
+
+HASH_CHUNK = 1024 * 1024
+
+class Dataset:
+    """The parsed records and the search, sort and facet indexes derived from them."""
+
+    def __init__(self, records, search_index, sort_columns=None, facet_index=None):
+        self.records = records
+        self.search_index = search_index
+        self.sort_columns = sort_columns or {}
+        self.facet_index = facet_index
+
+    @classmethod
+    def build(cls, records):
+        keys = SortKeys(records)
+        keys.warm(WARM_COLUMNS)
+        return cls(records, SearchIndex(records), keys.built_columns(), FacetIndex(records))
+
+    def extended(self, records):
+        """
+        This dataset grown to `records` when they are its own records with
+        more appended (what an incremental sync usually produces), indexing
+        only the new rows; None when anything earlier changed.
+        """
+        n = len(self.records)
+        if records.fields != self.records.fields or len(records) < n:
+            return None
+        for field in records.fields:
+            if records.column(field)[:n] != self.records.column(field):
+                return None
+        self.search_index.extend(records)
+        keys = SortKeys(records, columns=self.sort_columns)
+        keys.extend()
+        self.facet_index.extend(records)
+        return Dataset(records, self.search_index, keys.built_columns(), self.facet_index)
+
+def file_sha256(path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(HASH_CHUNK):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def source_key(source_path, sha256=None) -> dict:
+    st = os.stat(source_path)
+    return {
+        "version": SNAPSHOT_VERSION,
+        "fields": list(FIELDS),
+        "size": st.st_size,
+        "mtime_ns": st.st_mtime_ns,
+        "sha256": sha256,
+    }
+
+def same_format(key) -> bool:
+    return key.get("version") == SNAPSHOT_VERSION and key.get("fields") == list(FIELDS)
+
+def is_current(key, source_path) -> bool:
+    """
+    Whether a snapshot made under `key` still matches the source file.
+    Size and mtime decide when they agree; a file that was only touched
+    (same size, new mtime) is hashed before the snapshot is thrown away.
+    """
+    current = source_key(source_path)
+    if not same_format(key):
+        return False
+    if key.get("size") != current["size"]:
+        return False
+    if key.get("mtime_ns") == current["mtime_ns"]:
+        return True
+    return key.get("sha256") == file_sha256(source_path)
+
+def read_snapshot(path):
+    """(key, Dataset) stored at `path`, or None if it is missing, damaged or in an older format."""
+    try:
+        with open(path, "rb") as f:
+            data = f.read() # Header and payload in one read
+    except OSError:
+        return None
+    end = data.find(b"\n")
+    if not data.startswith(SNAPSHOT_MAGIC) or end < 0:
+        return None
+    try:
+        key = json.loads(data[len(SNAPSHOT_MAGIC):end])
+        if not same_format(key):
+            return None
+        # Unpickling allocates millions of objects and none of them are garbage
+        gc.disable()
+        try:
+            return key, pickle.loads(memoryview(data)[end + 1:])
+        finally:
+            gc.enable()
+    except Exception as e:
+        print(f"Ignoring unreadable snapshot {path}: {e}")
+        return None
+
+def write_snapshot(path, key, dataset):
+    header = SNAPSHOT_MAGIC + json.dumps(key).encode("ascii") + b"\n"
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(header)
+        pickle.dump(dataset, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+
+def refresh_key(path, key, dataset):
+    """Replaces the key in a snapshot's header, in place when the new header is the same length."""
+    header = SNAPSHOT_MAGIC + json.dumps(key).encode("ascii") + b"\n"
+    try:
+        with open(path, "r+b") as f:
+            if len(f.readline()) == len(header):
+                f.seek(0)
+                f.write(header)
+                return
+        write_snapshot(path, key, dataset)
+    except OSError as e:
+        print(f"Could not update snapshot {path}: {e}")
+
+def load_projects(source_path, cache_dir="cache") -> Dataset:
+    """
+    The dataset for `source_path`, from the snapshot in `cache_dir` when it
+    matches the source file. Otherwise the file is parsed; if it only adds
+    projects at the end, the snapshot's indexes are extended, else they
+    are rebuilt. Either way the result is written back as the new snapshot.
+    """
+    path = os.path.join(cache_dir, SNAPSHOT_FILE)
+    stored = None
+    if os.path.exists(source_path):
+        stored = read_snapshot(path)
+        if stored is not None and is_current(stored[0], source_path):
+            current = source_key(source_path, stored[0].get("sha256"))
+            if current != stored[0]:
+                # Touched but unchanged: keep the new mtime so the next start skips the hash
+                refresh_key(path, current, stored[1])
+            return stored[1]
+        # Keyed before parsing: if the file changes meanwhile, the next start notices
+        key = source_key(source_path, file_sha256(source_path))
+    else:
+        key = None
+
+    records = RecordStore(parse_oshwa_projects(source_path))
+    dataset = stored[1].extended(records) if stored is not None else None
+    if dataset is None:
+        dataset = Dataset.build(records)
+    if key is not None and len(dataset.records):
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            write_snapshot(path, key, dataset)
+        except OSError as e:
+            print(f"Could not write snapshot {path}: {e}")
+    return dataset
+
+def remove_snapshot(cache_dir):
+    for suffix in ("", ".tmp"):
+        path = os.path.join(cache_dir, SNAPSHOT_FILE + suffix)
+        if os.path.exists(path):
+            os.remove(path)
@@ -0,0 +1,100 @@
+import threading
+from datetime import datetime
+
+# Record field behind each sortable text column of the project list
+TEXT_COLUMNS = {
+    1: "uid",
+    2: "country",
+    3: "projectName",
+    4: "projectDescription",
+    6: "url",
+}
+DATE_COLUMN = 5
+DATE_FIELD = "certificationDate"
+THUMB_COLUMN = 7
+
+# Short columns worth keying before the first sort; the long description waits
+WARM_COLUMNS = (1, 2, 3, DATE_COLUMN, 6)
+
+MISSING_DATE = float("-inf") # Undated records sort before every real date
+
+def text_key(value) -> str:
+    return str(value or "").casefold()
+
+def date_key(value) -> float:
+    """POSIX timestamp of an ISO date such as 2025-10-10T00:00-04:00, so offsets compare correctly."""
+    if not value:
+        return MISSING_DATE
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except (TypeError, ValueError):
+        return MISSING_DATE
+
+class SortKeys:
+    """
+    Typed, normalized sort keys per record and column, so comparing two
+    rows is two list lookups instead of str()/lower() on every call.
+
+    Each column's keys are computed the first time that column is sorted
+    and kept for the life of the records; the long description column,
+    say, costs nothing until someone sorts by it. The thumbnail column
+    depends on the cache rather than the record, so its key comes from
+    `has_thumb(uid)` at comparison time. Keys built earlier for the same
+    records (e.g. from a snapshot) can be handed in as `columns`.
+    """
+
+    def __init__(self, records, has_thumb=None, columns=None):
+        self.records = records # A RecordStore
+        self.has_thumb = has_thumb
+        self._columns = dict(columns or {}) # column -> list of keys, indexed by row
+        self._lock = threading.Lock()
+
+    def column(self, col) -> list:
+        keys = self._columns.get(col)
+        if keys is None:
+            with self._lock:
+                keys = self._columns.get(col)
+                if keys is None:
+                    keys = self._build(col)
+                    self._columns[col] = keys
+        return keys
+
+    def _build(self, col, start=0):
+        if col == DATE_COLUMN:
+            return [date_key(v) for v in self.records.column(DATE_FIELD)[start:]]
+        field = TEXT_COLUMNS.get(col)
+        if field is None:
+            return [""] * (len(self.records) - start) # Unsortable column: every row ties
+        return [text_key(v) for v in self.records.column(field)[start:]]
+
+    def extend(self):
+        """Keys the rows appended to the records since the built columns were made."""
+        with self._lock:
+            for col, keys in self._columns.items():
+                keys.extend(self._build(col, len(keys)))
+
+    def key(self, row, col):
+        if col == THUMB_COLUMN:
+            if self.has_thumb is None:
+                return 0
+            return 1 if self.has_thumb(self.records.value(row, "uid")) else 0
+        return self.column(col)[row]
+
+    def compare(self, row1, row2, col) -> int:
+        """-1, 0 or 1, as DataViewModel.Compare wants for ascending order."""
+        if col == THUMB_COLUMN:
+            val1, val2 = self.key(row1, col), self.key(row2, col)
+        else:
+            keys = self.column(col)
+            val1, val2 = keys[row1], keys[row2]
+        return -1 if val1 < val2 else 1 if val1 > val2 else 0
+
+    def warm(self, columns=(DATE_COLUMN, *TEXT_COLUMNS)):
+        """Builds keys ahead of the first sort, e.g. from a background thread."""
+        for col in columns:
+            self.column(col)
+
+    def built_columns(self) -> dict:
+        """The keys built so far, column -> list, for reuse with the same records."""
+        with self._lock:
+            return dict(self._columns)
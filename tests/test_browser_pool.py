@@ -0,0 +1,80 @@
+import asyncio
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from browser_pool import ContextPool
+
+class FakeBrowser:
+    def __init__(self):
+        self.open = 0
+        self.peak = 0
+
+    async def new_context(self, **options):
+        await asyncio.sleep(0)
+        self.open += 1
+        self.peak = max(self.peak, self.open)
+        return FakeContext(self)
+
+class FakeContext:
+    def __init__(self, browser):
+        self.browser = browser
+
+    async def new_page(self):
+        await asyncio.sleep(0)
+        return FakePage()
+
+    async def close(self):
+        self.browser.open -= 1
+
+    async def clear_cookies(self):
+        pass
+
+    async def clear_permissions(self):
+        pass
+
+class FakePage:
+    async def evaluate(self, script):
+        pass
+
+    async def goto(self, url, timeout=None):
+        pass
+
+class SharedLimitTest(unittest.TestCase):
+    def test_pools_share_one_limit(self):
+        async def run():
+            browser = FakeBrowser()
+            slots = asyncio.Semaphore(2)
+            full = ContextPool(browser, {}, limit=2)
+            thumb = ContextPool(browser, {}, share_with=full)
+
+            async def capture(pool):
+                async with slots:
+                    pooled = await pool.acquire()
+                    await asyncio.sleep(0)
+                    await pool.release(pooled)
+
+            # Both pools fill up with idle contexts in turn
+            await asyncio.gather(*(capture(full) for _ in range(4)))
+            await asyncio.gather(*(capture(thumb) for _ in range(4)))
+            await asyncio.gather(*(capture(p) for p in (full, thumb) * 4))
+            return browser
+
+        browser = asyncio.run(run())
+        self.assertEqual(browser.peak, 2)
+
+    def test_unshared_pool_has_no_limit(self):
+        async def run():
+            browser = FakeBrowser()
+            pool = ContextPool(browser, {})
+            pages = [await pool.acquire() for _ in range(3)]
+            for pooled in pages:
+                await pool.release(pooled)
+            return browser
+
+        self.assertEqual(asyncio.run(run()).open, 3)
+
+if __name__ == "__main__":
+    unittest.main()
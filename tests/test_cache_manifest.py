@@ -0,0 +1,42 @@
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from cache_manifest import CacheManifest
+
+class ForgetThumbsTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.manifest = CacheManifest(self.tmp.name)
+
+    def tearDown(self):
+        self.manifest.close()
+        self.tmp.cleanup()
+
+    def test_forget_missing_thumbs(self):
+        self.manifest.record_capture("A", "https://a.example/", "A.png", 100, 10)
+        self.manifest.record_thumb("B", "https://b.example/", 10)
+        self.manifest.record_thumb("C", "https://c.example/", 10)
+        self.assertEqual(self.manifest.forget_missing_thumbs({"C"}), 2)
+
+        self.assertFalse(self.manifest.has_thumb("A"))
+        self.assertTrue(self.manifest.has_master("A")) # The master is still on disk
+        self.assertNotIn("B", self.manifest) # Nothing left to record
+        self.assertTrue(self.manifest.has_thumb("C"))
+
+    def test_forgotten_thumbs_persist(self):
+        self.manifest.record_capture("A", "https://a.example/", "A.png", 100, 10)
+        self.manifest.record_thumb("B", "https://b.example/", 10)
+        self.manifest.forget_thumbs(["A", "B"])
+        self.manifest.close()
+
+        self.manifest = CacheManifest(self.tmp.name)
+        self.assertFalse(self.manifest.has_thumb("A"))
+        self.assertTrue(self.manifest.has_master("A"))
+        self.assertNotIn("B", self.manifest)
+
+if __name__ == "__main__":
+    unittest.main()
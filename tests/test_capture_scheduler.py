@@ -0,0 +1,72 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from capture_scheduler import CaptureScheduler
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def scheduler(per_host_limit=2, min_host_interval=0.0):
+    return CaptureScheduler(per_host_limit, min_host_interval, clock=FakeClock())
+
+def submit(s, uid, host="a.example", priority=10):
+    return s.submit(uid, f"https://{host}/{uid}", None, priority)
+
+class CancelTest(unittest.TestCase):
+    def test_cancel_head_then_pop(self):
+        s = scheduler()
+        submit(s, "A")
+        submit(s, "B")
+        s.cancel("A")
+        job = s.pop()
+        self.assertIsNotNone(job)
+        self.assertEqual(job.uid, "B")
+
+    def test_cancel_all_then_submit(self):
+        s = scheduler()
+        for uid in "ABC":
+            submit(s, uid)
+        for uid in "ABC":
+            s.cancel(uid)
+        self.assertEqual(len(s), 0)
+        submit(s, "D")
+        self.assertEqual(s.pop().uid, "D")
+
+    def test_cancel_keeps_other_hosts_and_order(self):
+        s = scheduler(per_host_limit=10)
+        submit(s, "A", priority=5)
+        submit(s, "B", priority=10)
+        submit(s, "C", priority=10)
+        submit(s, "X", host="b.example", priority=7)
+        s.cancel("A")
+        self.assertEqual([s.pop().uid for _ in range(3)], ["X", "B", "C"])
+        self.assertIsNone(s.pop())
+
+    def test_cancel_after_reprioritize(self):
+        s = scheduler()
+        submit(s, "A")
+        submit(s, "B")
+        submit(s, "B", priority=0) # B becomes the head
+        s.cancel("B")
+        self.assertEqual(s.pop().uid, "A")
+
+    def test_cancel_while_host_at_limit(self):
+        s = scheduler(per_host_limit=1)
+        submit(s, "A")
+        submit(s, "B")
+        submit(s, "C")
+        running = s.pop()
+        self.assertIsNone(s.pop()) # Host parked at its limit
+        s.cancel("B")
+        s.finish(running)
+        self.assertEqual(s.pop().uid, "C")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,52 @@
+import os
+import sys
+import tempfile
+import unittest
+from io import BytesIO
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from PIL import Image
+
+from image_pipeline import ImageOptions, process_clipped, CHROMIUM_PNG_COMPRESS_LEVEL
+
+URL = "https://example.com/"
+
+def screenshot(format, **kwargs):
+    img = Image.new("RGB", (1024, 1152), (200, 100, 50))
+    for y in range(0, img.height, 7):
+        for x in range(0, img.width, 5):
+            img.putpixel((x, y), (x % 256, y % 256, 0))
+    data = BytesIO()
+    img.save(data, format=format, **kwargs)
+    return data.getvalue()
+
+class ProcessClippedTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.master = os.path.join(self.tmp.name, "master")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def written(self, img_bytes, options):
+        process_clipped(img_bytes, URL, self.master, options)
+        with open(self.master, "rb") as f:
+            return f.read()
+
+    def test_png_at_chromium_level_is_kept(self):
+        img_bytes = screenshot("PNG", compress_level=CHROMIUM_PNG_COMPRESS_LEVEL)
+        self.assertEqual(self.written(img_bytes, ImageOptions("png")), img_bytes)
+
+    def test_png_compress_level_is_applied(self):
+        img_bytes = screenshot("PNG", compress_level=CHROMIUM_PNG_COMPRESS_LEVEL)
+        master = self.written(img_bytes, ImageOptions("png", compress_level=1))
+        self.assertGreater(len(master), len(img_bytes))
+        self.assertEqual(Image.open(BytesIO(master)).tobytes(), Image.open(BytesIO(img_bytes)).tobytes())
+
+    def test_webp_is_reencoded(self):
+        master = self.written(screenshot("JPEG", quality=95), ImageOptions("webp"))
+        self.assertEqual(Image.open(BytesIO(master)).format, "WEBP")
+
+if __name__ == "__main__":
+    unittest.main()
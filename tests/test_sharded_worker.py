@@ -0,0 +1,63 @@
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from cache_manifest import CacheManifest
+from sharded_worker import ShardedScreenshotWorker
+
+URL = "https://a.example/"
+
+class ListenerTest(unittest.TestCase):
+    """Drives the parent's bookkeeping with hand-made shard messages; no shard processes run."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.manifest = CacheManifest(self.tmp.name)
+        self.worker = ShardedScreenshotWorker(1, manifest=self.manifest, dispatch=lambda callback, *args: callback(*args))
+        self.worker._listener.start()
+        self.calls = []
+
+    def tearDown(self):
+        self.manifest.close()
+        self.tmp.cleanup()
+
+    def callback(self, name):
+        def record(uid, cache_path):
+            self.calls.append((name, uid, uid in self.worker._routed))
+        return record
+
+    def request(self, name, uid="u", **kwargs):
+        self.worker.request_screenshot(uid, URL, self.callback(name), **kwargs)
+        return self.worker._jobs[0].get(timeout=5)[-1] # The request id the shard would echo
+
+    def shard_says(self, *messages):
+        for message in messages:
+            self.worker._results.put(message)
+        self.worker._results.put(("exit",))
+        self.worker._listener.join(5)
+
+    def test_thumb_done_leaves_full_request_routed(self):
+        thumb = self.request("thumb", thumb_only=True)
+        full = self.request("full", priority=5)
+        self.shard_says(("done", 0, "u", thumb, "u.png"), ("done", 0, "u", full, "u.png"))
+        self.assertEqual(self.calls, [("thumb", "u", True), ("full", "u", False)])
+        self.assertEqual(self.worker._host_shards, {})
+        self.assertEqual(self.worker._outstanding, [0])
+
+    def test_cancel_keeps_route_until_shard_answers(self):
+        running = self.request("running")
+        waiting = self.request("waiting", uid="v")
+        self.worker.cancel("u")
+        self.worker.cancel("v")
+        self.assertIn("u", self.worker._routed)
+        self.assertEqual(self.worker._host_shards, {"a.example": 0})
+        self.shard_says(("cancelled", 0, "v", [waiting]), ("done", 0, "u", running, "u.png"))
+        self.assertEqual(self.calls, []) # Cancelled callbacks are never called
+        self.assertEqual(self.worker._routed, {})
+        self.assertEqual(self.worker._host_shards, {})
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,45 @@
+import json
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import snapshot
+
+PROJECTS = [{"oshwaUid": f"US{i:06d}", "projectWebsite": f"https://example.com/p{i}", "projectName": f"P{i}",
+             "primaryType": "Electronics"} for i in range(5)]
+
+class TouchedSourceTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.source = os.path.join(self.tmp.name, "projects.json")
+        self.cache = os.path.join(self.tmp.name, "cache")
+        with open(self.source, "w", encoding="utf-8") as f:
+            json.dump(PROJECTS, f)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def stored_key(self):
+        return snapshot.read_snapshot(os.path.join(self.cache, snapshot.SNAPSHOT_FILE))[0]
+
+    def test_touch_refreshes_key(self):
+        snapshot.load_projects(self.source, self.cache)
+        st = os.stat(self.source)
+        os.utime(self.source, ns=(st.st_atime_ns, st.st_mtime_ns + 5_000_000_000))
+
+        with mock.patch.object(snapshot, "parse_oshwa_projects") as parse:
+            self.assertEqual(len(snapshot.load_projects(self.source, self.cache).records), len(PROJECTS))
+            parse.assert_not_called()
+        self.assertEqual(self.stored_key()["mtime_ns"], os.stat(self.source).st_mtime_ns)
+
+        # The next start takes the fast path again, without hashing
+        with mock.patch.object(snapshot, "file_sha256") as sha256:
+            snapshot.load_projects(self.source, self.cache)
+            sha256.assert_not_called()
+
+if __name__ == "__main__":
+    unittest.main()
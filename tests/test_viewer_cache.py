@@ -0,0 +1,43 @@
+import os
+import queue
+import sys
+import threading
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from viewer_cache import ViewerImageCache
+
+class InvalidateTest(unittest.TestCase):
+    def setUp(self):
+        self.decoding = threading.Event() # Set once the first decode has started
+        self.release = threading.Event() # Lets the first decode finish
+        self.decodes = []
+        self.delivered = queue.Queue()
+        self.cache = ViewerImageCache(self.decode, lambda uid, pixels: self.delivered.put((uid, pixels)), neighbors=1)
+        self.cache.start()
+
+    def decode(self, uid):
+        self.decodes.append(uid)
+        if len(self.decodes) == 1:
+            self.decoding.set()
+            self.release.wait(5)
+        return f"{uid}#{len(self.decodes)}".encode()
+
+    def test_other_uid_does_not_drop_selection(self):
+        self.cache.select("A", [])
+        self.decoding.wait(5)
+        self.cache.invalidate("B") # A background capture of some other row lands
+        self.release.set()
+        self.assertEqual(self.delivered.get(timeout=5), ("A", b"A#1"))
+
+    def test_selected_uid_is_decoded_again(self):
+        self.cache.select("A", [])
+        self.decoding.wait(5)
+        self.cache.invalidate("A") # Recaptured while the old master was being decoded
+        self.release.set()
+        self.assertEqual(self.delivered.get(timeout=5), ("A", b"A#2"))
+        self.assertEqual(self.decodes, ["A", "A"])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,52 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from viewport import ViewportScheduler, VISIBLE_PRIORITY, LOOKAHEAD_PRIORITY, siblings, neighbors
+
+class Node:
+    def __init__(self, parent=None, row=0):
+        self.parent = parent
+        self.row = row
+        self.is_category = parent is None
+        self.children = []
+
+def category(count):
+    cat = Node()
+    cat.children = [Node(cat, row) for row in range(count)]
+    return cat
+
+def reversed_order(cat):
+    return cat.children[::-1]
+
+def rows(nodes):
+    return [n.row for n in nodes]
+
+class SiblingsTest(unittest.TestCase):
+    def test_child_order_by_default(self):
+        cat = category(6)
+        self.assertEqual(rows(siblings(cat.children[3], 1, 2)), [4, 5])
+        self.assertEqual(rows(siblings(cat.children[3], -1, 5)), [2, 1, 0])
+
+    def test_follows_displayed_order(self):
+        cat = category(6)
+        self.assertEqual(rows(siblings(cat.children[3], 1, 2, reversed_order)), [2, 1])
+        self.assertEqual(rows(siblings(cat.children[3], -1, 2, reversed_order)), [4, 5])
+
+    def test_plan_uses_displayed_order(self):
+        cat = category(6)
+        plan = ViewportScheduler(lookahead=2).plan([cat.children[3]], reversed_order)
+        self.assertEqual([(n.row, p) for n, p in plan],
+                         [(3, VISIBLE_PRIORITY), (2, LOOKAHEAD_PRIORITY), (4, LOOKAHEAD_PRIORITY),
+                          (1, LOOKAHEAD_PRIORITY), (5, LOOKAHEAD_PRIORITY)])
+
+class NeighborsTest(unittest.TestCase):
+    def test_follows_displayed_order(self):
+        cat = category(6)
+        self.assertEqual(rows(neighbors(cat.children[1], 2)), [2, 0, 3])
+        self.assertEqual(rows(neighbors(cat.children[1], 2, reversed_order)), [0, 2, 3])
+
+if __name__ == "__main__":
+    unittest.main()
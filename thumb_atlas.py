@@ -0,0 +1,161 @@
+import mmap
+import os
+import struct
+import threading
+
+ATLAS_FILE = "thumbs.atlas"
+INDEX_FILE = "thumbs.idx"
+
+MAGIC = b"OSHWATL1"
+HEADER = struct.Struct("<8sIII") # magic, width, height, channels
+HEADER_SIZE = 64
+GROW_SLOTS = 256 # Slots added each time the atlas file runs out of room
+
+class ThumbnailAtlas:
+    """
+    Packed store of raw thumbnail pixels: one file of fixed-size slots,
+    memory-mapped, plus an append-only text index mapping uid -> slot.
+
+    Pixels go in and come out as raw RGB bytes of exactly width x height,
+    ready for wx.Bitmap.FromBuffer, so reading a thumbnail is a slice of the
+    mapping instead of a file open and a PNG decode. Writes come from the
+    screenshot worker thread while the GUI thread reads, hence the lock.
+    """
+
+    def __init__(self, cache_dir, width, height, channels=3):
+        self.cache_dir = cache_dir
+        self.width = width
+        self.height = height
+        self.channels = channels
+        self.slot_size = width * height * channels
+        self.atlas_path = os.path.join(cache_dir, ATLAS_FILE)
+        self.index_path = os.path.join(cache_dir, INDEX_FILE)
+
+        self.slots = {} # uid -> slot number
+        self.free_slots = []
+        self.capacity = 0
+        self._lock = threading.Lock()
+        self._file = None
+        self._map = None
+
+        os.makedirs(cache_dir, exist_ok=True)
+        self._open()
+
+    def _open(self):
+        header = HEADER.pack(MAGIC, self.width, self.height, self.channels)
+        if os.path.exists(self.atlas_path):
+            with open(self.atlas_path, "rb") as f:
+                existing = f.read(HEADER.size)
+            if existing != header:
+                # Different thumbnail geometry or not an atlas at all: start over
+                remove_atlas(self.cache_dir)
+
+        if not os.path.exists(self.atlas_path):
+            with open(self.atlas_path, "wb") as f:
+                f.write(header.ljust(HEADER_SIZE, b"\0"))
+            if os.path.exists(self.index_path):
+                os.remove(self.index_path)
+
+        self._file = open(self.atlas_path, "r+b")
+        size = os.fstat(self._file.fileno()).st_size
+        self.capacity = (size - HEADER_SIZE) // self.slot_size
+        self._map = mmap.mmap(self._file.fileno(), 0)
+        self._load_index()
+
+    def _load_index(self):
+        if not os.path.exists(self.index_path):
+            return
+        lines = 0
+        with open(self.index_path, "r", encoding="utf-8") as f:
+            for line in f:
+                lines += 1
+                parts = line.split()
+                if len(parts) != 2:
+                    continue # Torn write from an interrupted run
+                uid, slot = parts
+                if slot == "-":
+                    self.slots.pop(uid, None)
+                elif slot.isdigit() and int(slot) < self.capacity:
+                    self.slots[uid] = int(slot)
+
+        used = set(self.slots.values())
+        self.free_slots = [s for s in range(self.capacity) if s not in used]
+        if lines > 2 * len(self.slots) + GROW_SLOTS:
+            self._rewrite_index()
+
+    def _rewrite_index(self):
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for uid, slot in self.slots.items():
+                f.write(f"{uid} {slot}\n")
+        os.replace(tmp_path, self.index_path)
+
+    def _append_index(self, uid, slot):
+        with open(self.index_path, "a", encoding="utf-8") as f:
+            f.write(f"{uid} {slot}\n")
+
+    def _grow(self):
+        # mmap.resize is not portable, so extend the file and map it again
+        self._map.close()
+        self._file.truncate(HEADER_SIZE + (self.capacity + GROW_SLOTS) * self.slot_size)
+        self._map = mmap.mmap(self._file.fileno(), 0)
+        self.free_slots.extend(range(self.capacity + GROW_SLOTS - 1, self.capacity - 1, -1))
+        self.capacity += GROW_SLOTS
+
+    def __contains__(self, uid):
+        return uid in self.slots
+
+    def __len__(self):
+        return len(self.slots)
+
+    def uids(self):
+        return list(self.slots)
+
+    def get(self, uid):
+        """Returns the raw pixels for uid as bytes, or None."""
+        with self._lock:
+            slot = self.slots.get(uid)
+            if slot is None or self._map is None:
+                return None
+            start = HEADER_SIZE + slot * self.slot_size
+            return self._map[start:start + self.slot_size]
+
+    def put(self, uid, pixels):
+        if len(pixels) != self.slot_size:
+            raise ValueError(f"Thumbnail for {uid} is {len(pixels)} bytes, expected {self.slot_size}")
+        with self._lock:
+            slot = self.slots.get(uid)
+            if slot is None:
+                if not self.free_slots:
+                    self._grow()
+                slot = self.free_slots.pop()
+            start = HEADER_SIZE + slot * self.slot_size
+            self._map[start:start + self.slot_size] = pixels
+            # Pixels reach the file before the index points at them
+            aligned = start - start % mmap.ALLOCATIONGRANULARITY
+            self._map.flush(aligned, start + self.slot_size - aligned)
+            if self.slots.get(uid) != slot:
+                self.slots[uid] = slot
+                self._append_index(uid, slot)
+
+    def remove(self, uid):
+        with self._lock:
+            slot = self.slots.pop(uid, None)
+            if slot is not None:
+                self.free_slots.append(slot)
+                self._append_index(uid, "-")
+
+    def close(self):
+        with self._lock:
+            if self._map is not None:
+                self._map.close()
+                self._map = None
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+def remove_atlas(cache_dir):
+    for name in (ATLAS_FILE, INDEX_FILE):
+        path = os.path.join(cache_dir, name)
+        if os.path.exists(path):
+            os.remove(path)
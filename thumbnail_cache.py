@@ -0,0 +1,94 @@
+from collections import OrderedDict
+
+DEFAULT_BUDGET_MB = 64
+
+class ThumbnailCache:
+    """
+    Least-recently-used cache of decoded thumbnail bitmaps, bounded by an
+    approximate byte budget rather than an entry count.
+
+    A lookup that misses asks `loader(uid)` to fetch the thumbnail in the
+    background; the loader answers later with put() or, when there is
+    nothing on disk, mark_missing(). Only lookups that start a load count
+    as misses, so repaints of a row still waiting on its image do not.
+    """
+
+    def __init__(self, budget_bytes=DEFAULT_BUDGET_MB * 1024 * 1024, loader=None):
+        self.budget_bytes = budget_bytes
+        self.loader = loader
+        self.size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict() # uid -> (bitmap, nbytes)
+        self._loading = set()
+        self._missing = set()
+
+    def __contains__(self, uid):
+        return uid in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, uid):
+        entry = self._entries.get(uid)
+        if entry is not None:
+            self._entries.move_to_end(uid)
+            self.hits += 1
+            return entry[0]
+
+        if uid not in self._loading and uid not in self._missing:
+            self.misses += 1
+            if self.loader:
+                self._loading.add(uid)
+                self.loader(uid)
+        return None
+
+    def put(self, uid, bitmap, nbytes):
+        self._loading.discard(uid)
+        self._missing.discard(uid)
+        old = self._entries.pop(uid, None)
+        if old is not None:
+            self.size_bytes -= old[1]
+        self._entries[uid] = (bitmap, nbytes)
+        self.size_bytes += nbytes
+
+        # Always keep the newest entry, even if it alone exceeds the budget
+        while self.size_bytes > self.budget_bytes and len(self._entries) > 1:
+            _, (_, evicted_bytes) = self._entries.popitem(last=False)
+            self.size_bytes -= evicted_bytes
+            self.evictions += 1
+
+    def mark_missing(self, uid):
+        self._loading.discard(uid)
+        self._missing.add(uid)
+
+    def reload(self, uid):
+        """
+        Asks the loader for uid again, e.g. after a recapture. A bitmap
+        already cached keeps being served until put() replaces it.
+        """
+        self._missing.discard(uid)
+        if self.loader:
+            self._loading.add(uid)
+            self.loader(uid)
+
+    def invalidate(self, uid):
+        """Forgets everything about uid so the next lookup reloads it."""
+        self._loading.discard(uid)
+        self._missing.discard(uid)
+        old = self._entries.pop(uid, None)
+        if old is not None:
+            self.size_bytes -= old[1]
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "size_bytes": self.size_bytes,
+            "budget_bytes": self.budget_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
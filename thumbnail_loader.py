@@ -0,0 +1,68 @@
+import threading
+import time
+from collections import deque
+
+FRAME_INTERVAL = 1 / 60 # Seconds between batches handed to the GUI
+
+class ThumbnailLoader(threading.Thread):
+    """
+    Reads thumbnail pixels off the GUI thread and hands them over in
+    batches.
+
+    request() queues a uid (repeats while it is still queued are merged);
+    this thread calls `read(uid)` for it, which returns raw RGB bytes or
+    None, and passes [(uid, pixels), ...] to `deliver` on this thread, no
+    more often than once per `interval`. A lone request is delivered at
+    once; a burst is merged into one batch per interval, so the GUI
+    builds its bitmaps and repaints once per frame rather than per row.
+    """
+
+    def __init__(self, read, deliver, interval=FRAME_INTERVAL):
+        super().__init__(daemon=True)
+        self.read = read
+        self.deliver = deliver
+        self.interval = interval
+        self.batches = 0
+        self.loaded = 0
+        self._queue = deque()
+        self._queued = set()
+        self._cond = threading.Condition()
+
+    def request(self, uid):
+        with self._cond:
+            if uid not in self._queued:
+                self._queued.add(uid)
+                self._queue.append(uid)
+                self._cond.notify()
+
+    def run(self):
+        last_delivery = -self.interval
+        while True:
+            with self._cond:
+                while not self._queue:
+                    self._cond.wait()
+            deadline = max(time.monotonic(), last_delivery + self.interval)
+
+            batch = []
+            while True:
+                with self._cond:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0 and (batch or not self._queue):
+                        break
+                    if not self._queue:
+                        self._cond.wait(remaining)
+                        continue
+                    uid = self._queue.popleft()
+                    self._queued.discard(uid)
+                try:
+                    pixels = self.read(uid)
+                except Exception as e:
+                    print(f"Error reading thumbnail for {uid}: {e}")
+                    pixels = None
+                batch.append((uid, pixels))
+
+            if batch:
+                self.batches += 1
+                self.loaded += len(batch)
+                self.deliver(batch)
+                last_delivery = time.monotonic()
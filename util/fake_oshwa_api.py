@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+# A local stand-in for https://certificationapi.oshwa.org/api/projects, for
+# trying the downloader offline: same limit/offset paging and response shape,
+# any bearer token accepted, with optional latency, random server errors and
+# a per-second rate limit answered with 429 + Retry-After.
+#
+#   python util/fake_oshwa_api.py --count 5000 --fail-rate 0.1 --rate-limit 20
+#   python util/oshwa_api_get_all_projects.py --url http://127.0.0.1:8765/api/projects --token-file <any file>
+
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+DEFAULT_PORT = 8765
+DEFAULT_LIMIT = 200
+API_PATH = "/api/projects"
+
+class FakeApi:
+    """Paging, failure injection and rate limiting over a fixed list of records."""
+
+    def __init__(self, records, latency=0.0, fail_rate=0.0, rate_limit=0, seed=None):
+        self.records = records
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.rate_limit = rate_limit # Requests per second, 0 for unlimited
+        self.rng = random.Random(seed)
+        self.requests = 0
+        self.failures = 0
+        self.throttled = 0
+        self._lock = threading.Lock()
+        self._window = 0
+        self._window_count = 0
+
+    def admit(self):
+        """(status, headers) to answer with instead of data, or None to serve the request."""
+        with self._lock:
+            self.requests += 1
+            if self.rate_limit:
+                now = time.time()
+                window = int(now)
+                if window != self._window:
+                    self._window, self._window_count = window, 0
+                self._window_count += 1
+                if self._window_count > self.rate_limit:
+                    self.throttled += 1
+                    return 429, {"Retry-After": f"{window + 1 - now:.2f}"}
+            if self.fail_rate and self.rng.random() < self.fail_rate:
+                self.failures += 1
+                return self.rng.choice((500, 502, 503)), {}
+        return None
+
+    def page(self, limit, offset) -> dict:
+        return {
+            "total": len(self.records),
+            "limit": limit,
+            "offset": offset,
+            "items": self.records[offset:offset + limit],
+        }
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1" # Keep-alive, like the real server
+
+    def do_GET(self):
+        api = self.server.api
+        parts = urlsplit(self.path)
+        if parts.path.rstrip("/") != API_PATH:
+            return self.reply(404, {"error": "not found"})
+        if not self.headers.get("Authorization", "").startswith("Bearer "):
+            return self.reply(401, {"error": "missing token"})
+        if api.latency:
+            time.sleep(api.latency)
+        refused = api.admit()
+        if refused is not None:
+            status, headers = refused
+            return self.reply(status, {"error": "try again"}, headers)
+
+        query = parse_qs(parts.query)
+        try:
+            limit = int(query.get("limit", [DEFAULT_LIMIT])[0])
+            offset = int(query.get("offset", [0])[0])
+        except ValueError:
+            return self.reply(400, {"error": "bad limit or offset"})
+        if limit < 0 or offset < 0:
+            return self.reply(400, {"error": "bad limit or offset"})
+        self.reply(200, api.page(limit, offset))
+
+    def reply(self, status, body, headers=None):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+def serve(records, port=0, verbose=False, **options):
+    """Starts the fake API on a background thread; returns the server (its .url, .api and .shutdown())."""
+    server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    server.daemon_threads = True
+    server.api = FakeApi(records, **options)
+    server.verbose = verbose
+    server.url = f"http://127.0.0.1:{server.server_address[1]}{API_PATH}"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def synthetic_records(count, seed=0):
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "benchmarks"))
+    from synthetic import api_records
+    return api_records(count, seed)
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for the OSHWA projects API")
+    parser.add_argument("--data", help="JSON list of project records to serve (e.g. oshwa_projects.json)")
+    parser.add_argument("--count", type=int, default=3500, help="Synthetic records to serve when --data is not given")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="Port to listen on (127.0.0.1)")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every response")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Fraction of requests answered with a 5xx")
+    parser.add_argument("--rate-limit", type=int, default=0, help="Requests per second before answering 429")
+    parser.add_argument("--seed", type=int, default=None, help="Seed for the failure injection")
+    parser.add_argument("--verbose", action="store_true", help="Log every request")
+    args = parser.parse_args()
+
+    if args.data:
+        with open(args.data, encoding="utf-8") as f:
+            records = json.load(f)
+    else:
+        records = synthetic_records(args.count)
+    server = serve(records, port=args.port, verbose=args.verbose, latency=args.latency,
+                   fail_rate=args.fail_rate, rate_limit=args.rate_limit, seed=args.seed)
+    print(f"Serving {len(records)} projects at {server.url}", file=sys.stderr)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        api = server.api
+        print(f"\n{api.requests} requests, {api.failures} failed on purpose, {api.throttled} throttled", file=sys.stderr)
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -3,86 +3,224 @@
 # Get information on all projects to a JSON file, using the API.
 # API documentation is here
 # https://certificationapi.oshwa.org/documentation
+#
+# Pages are fetched in parallel over one pooled Session; failed pages are
+# retried with backoff, and a 429 pauses every worker for its Retry-After.
+# Importable: ProjectFetcher(token).fetch_all() returns the item list.
+#
+# --incremental fetches only the page window where new projects appear and
+# merges it into the existing file. Either way, oshwa_projects.changes.json
+# lists the uids that were added, changed or removed, for prefetch.py --changed.
+#
+#   python util/oshwa_api_get_all_projects.py [--workers 4] [--output oshwa_projects.json] [--incremental]
+#   python util/oshwa_api_get_all_projects.py --url http://127.0.0.1:8765/api/projects   # util/fake_oshwa_api.py
 
+import argparse
+import json
 import os
-import sys
 import random
+import sys
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
 import requests
-import json
-from pprint import pprint as pp
-import locale
+from requests.adapters import HTTPAdapter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from oshwa_parser import changes_path, read_changes
+from sort_keys import date_key
+
+API_URL = "https://certificationapi.oshwa.org/api/projects"
+TOKEN_FILE = os.path.join(os.path.expanduser("~"), ".oshwa_token")
+OUTPUT_FILE = os.path.join(".", "oshwa_projects.json")
+
+PAGE_LIMIT = 200
+DEFAULT_WORKERS = 4
+MAX_RETRIES = 5
+BACKOFF_BASE = 0.5 # Seconds before the first retry, doubled per attempt
+BACKOFF_MAX = 30.0
+REQUEST_TIMEOUT = 30.0
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+# Known projects fetched alongside the new ones in an incremental sync; at
+# least one must turn up, or the window missed the old data and a full
+# download is done instead
+SYNC_OVERLAP = PAGE_LIMIT
+
+class FetchError(Exception):
+    pass
 
+def load_token(path=TOKEN_FILE) -> str:
+    # get home dir, look for file ".oshwa_token" and load the token
+    with open(path, "r") as inpfile:
+        return inpfile.read().rstrip('\n')
 
-# get home dir, look for file ".oshwa_token" and load the token
-with open(os.path.join(os.path.expanduser("~"),".oshwa_token"),"r") as inpfile:
-    token = inpfile.read().rstrip('\n')
+def retry_after_seconds(value):
+    """Seconds to wait for a Retry-After header, given as seconds or an HTTP date; None if unusable."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
 
-url = "https://certificationapi.oshwa.org/api/projects"
+def page_offsets(total, limit=PAGE_LIMIT, start=0):
+    """(offset, limit) of every page from `start` up to `total` items."""
+    return [(offset, min(limit, total - offset)) for offset in range(start, total, limit)]
 
+class ProjectFetcher:
+    """
+    Pages through /api/projects with a bounded pool of workers sharing one
+    keep-alive Session.
 
-# example determined total: 3237
-total = 0;
+    Each page is retried up to `retries` times on connection errors and
+    429/5xx responses, with jittered exponential backoff. A 429 with
+    Retry-After holds back every worker until it has passed, not just
+    the one that got it. Other HTTP errors fail at once.
+    """
 
-LIMIT = 200
+    def __init__(self, token, url=API_URL, limit=PAGE_LIMIT, workers=DEFAULT_WORKERS, retries=MAX_RETRIES,
+                 timeout=REQUEST_TIMEOUT, log=sys.stderr):
+        self.url = url
+        self.limit = limit
+        self.workers = max(1, workers)
+        self.retries = retries
+        self.timeout = timeout
+        self.log = log
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({
+            'Content-Type': 'application/json',
+            'Authorization': f'Bearer {token}'
+        })
+        self.requests = 0
+        self.retried = 0
+        self._lock = threading.Lock()
+        self._paused_until = 0.0
 
-payload = {
-    'limit': LIMIT,
-    'offset': 0
-}
+    def close(self):
+        self.session.close()
 
-headers = {
-    'Content-Type': 'application/json',
-    'Authorization': f'Bearer {token}'
-}
+    def __enter__(self):
+        return self
 
-cache_dir = "cache"
+    def __exit__(self, *exc):
+        self.close()
 
-# # print(response.text.encode('utf8'))
-# answer = response.text.encode('utf8')
-# pp(answer)
-# pp(r)
-items = []
-last_fetch = False
-while True:
-    if (last_fetch):
-        #print(f"final fetch: ({payload['offset'] }), limit: ({payload['limit']})", 
-        print("Last Fetch:", file=sys.stderr)
+    def _print(self, message):
+        if self.log is not None:
+            print(message, file=self.log)
 
-    # introduce a random delay between each fetch, 200 to 500 milliseconds
-    time.sleep(int(random.uniform(20,50)) / 100)
+    def _wait_for_pause(self):
+        while True:
+            with self._lock:
+                delay = self._paused_until - time.monotonic()
+            if delay <= 0:
+                return
+            time.sleep(delay)
 
-    print(f"GET (offset={payload['offset']} limit={payload['limit']}: ", file=sys.stderr, end="")
-    response = requests.request("GET", url, headers=headers, params=payload)
-    r = json.loads(response.text)
+    def _pause(self, seconds):
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
 
-    if not total:
-        total = int(r['total'])
+    def backoff(self, attempt) -> float:
+        return min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt) * random.uniform(0.5, 1.5)
 
-    for i in r['items']:
-        items.append(i)
+    def get(self, params, url=None) -> dict:
+        """One GET returning the decoded JSON body, retried as described above."""
+        url = url or self.url
+        for attempt in range(self.retries + 1):
+            self._wait_for_pause()
+            with self._lock:
+                self.requests += 1
+            try:
+                response = self.session.get(url, params=params, timeout=self.timeout)
+            except requests.RequestException as e:
+                error, delay = e, self.backoff(attempt)
+            else:
+                if response.status_code == 200:
+                    try:
+                        return response.json()
+                    except ValueError as e:
+                        error, delay = e, self.backoff(attempt) # Truncated body
+                elif response.status_code in RETRY_STATUSES:
+                    error = FetchError(f"HTTP {response.status_code}")
+                    delay = retry_after_seconds(response.headers.get("Retry-After"))
+                    if delay is None:
+                        delay = self.backoff(attempt)
+                    elif response.status_code == 429:
+                        self._pause(delay)
+                else:
+                    raise FetchError(f"GET {url} {params}: HTTP {response.status_code} {response.text[:200]}")
 
-    print(f"new total items is {len(items)}",file=sys.stderr)
-    if (last_fetch):
-        break
+            if attempt == self.retries:
+                raise FetchError(f"GET {url} {params} failed after {attempt + 1} attempts: {error}")
+            with self._lock:
+                self.retried += 1
+            self._print(f"GET {params}: {error}, retrying in {delay:.1f}s")
+            time.sleep(delay)
 
-    
-    payload['offset'] = payload['offset'] + LIMIT
-    new_offset = int(payload['offset'])
-    if (new_offset + LIMIT > total):
-        payload['limit'] = total - new_offset
-        last_fetch = True
+    def get_page(self, offset, limit) -> dict:
+        return self.get({'limit': limit, 'offset': offset})
 
+    def total(self) -> int:
+        """The API's current project count, from a one-item page."""
+        return int(self.get_page(0, 1)['total'])
 
-# if not os.path.exists(cache_dir):
-#     os.makedirs(cache_dir)
+    def fetch_all(self) -> list:
+        """Every item, in API order. The first page gives the total; the rest are fetched in parallel."""
+        first = self.get_page(0, self.limit)
+        total = int(first['total'])
+        self._print(f"total {total}: {len(page_offsets(total, self.limit))} pages over {self.workers} workers")
+        return first['items'] + self.fetch_range(self.limit, total, total)
 
-save_path = os.path.join(".", "oshwa_projects.json")
+    def fetch_range(self, start, stop, total=None) -> list:
+        """Items from offset `start` up to `stop`, in API order, pages fetched in parallel."""
+        pages = {}
 
-with open(save_path, mode="w", encoding=locale.getencoding()) as oupfile:
-    json.dump(items,oupfile)
+        def fetch(page):
+            offset, limit = page
+            r = self.get_page(offset, limit)
+            if total is not None and int(r.get('total', total)) != total:
+                self._print(f"warning: total changed to {r['total']} while fetching (offset={offset})")
+            return offset, r['items']
 
-def check_duplicates():
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            for offset, items in pool.map(fetch, page_offsets(stop, self.limit, start)):
+                pages[offset] = items
+                fetched = sum(len(p) for p in pages.values())
+                self._print(f"GET (offset={offset} limit={self.limit}): new total items is {fetched}")
+
+        items = []
+        for offset in sorted(pages):
+            items.extend(pages[offset])
+        return items
+
+def write_json_atomic(items, path):
+    """Writes next to `path` and renames over it, so readers never see half a file."""
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as oupfile:
+            json.dump(items, oupfile)
+            oupfile.flush()
+            os.fsync(oupfile.fileno())
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def check_duplicates(items) -> set:
+    # The live API has listed the same project twice before (US000046)
     ids = [ i['oshwaUid'] for i in items ]
     seen = set()
     dupes = set()
@@ -92,35 +230,167 @@ def check_duplicates():
         else:
             seen.add(x)
 
-    if (dupes):        
-        print(f"Duplicate IDs Found: {dupes}")
+    if (dupes):
+        print(f"Duplicate IDs Found: {dupes}", file=sys.stderr)
+    return dupes
+
+def record_date(item) -> float:
+    return date_key(item.get('certificationDate'))
+
+def dedupe(items) -> list:
+    """
+    One item per oshwaUid, each at the position its uid first appeared.
+    A duplicated uid keeps the record with the newest certificationDate,
+    the later one on a tie.
+    """
+    position = {}
+    result = []
+    for item in items:
+        uid = item.get('oshwaUid')
+        idx = position.get(uid)
+        if uid is None or idx is None:
+            position[uid] = len(result)
+            result.append(item)
+        elif record_date(item) >= record_date(result[idx]):
+            result[idx] = item
+    return result
+
+def diff_items(old, new):
+    """(added, changed, removed) uids going from the `old` item list to `new`."""
+    old_by_uid = {i.get('oshwaUid'): i for i in old}
+    new_by_uid = {i.get('oshwaUid'): i for i in new}
+    added = [uid for uid in new_by_uid if uid not in old_by_uid]
+    changed = [uid for uid, item in new_by_uid.items() if uid in old_by_uid and old_by_uid[uid] != item]
+    removed = [uid for uid in old_by_uid if uid not in new_by_uid]
+    return added, changed, removed
 
-"""
-https://github.com/vgalin/html2image#readme
-https://grokipedia.com/page/html2image
+def newest(items):
+    """The most recently certified item, or None."""
+    return max(items, key=lambda i: (record_date(i), i.get('oshwaUid') or ''), default=None)
 
-https://toga.beeware.org/en/latest/reference/api/
-https://pyjs.org/examples/
-https://www.wxpython.org/pages/downloads/
+def read_items(path):
+    try:
+        with open(path, "r", encoding="utf-8") as inpfile:
+            return json.load(inpfile)
+    except (OSError, json.JSONDecodeError):
+        return None
+
+def incremental_items(fetcher, existing, state):
+    """
+    (items, total): `existing` brought up to date by fetching only the
+    pages that can hold new projects, and the API's total. None when that
+    cannot be done safely and a full download is needed.
+
+    The stored total says how many projects are new. Where the newest
+    known project sits in the file says which end of the API's ordering
+    they are added at; that end is fetched, plus SYNC_OVERLAP known
+    projects so changes to recent ones are picked up too. Any mismatch
+    (fewer projects than before, new uids not adding up to the growth,
+    no overlap with known data) means the ordering assumption does not
+    hold and the caller falls back to a full download.
+    """
+    old_total = state.get('total')
+    if not existing or not isinstance(old_total, int):
+        return None
+    total = fetcher.total()
+    if total < old_total:
+        return None # Something was withdrawn; only a full listing shows what
+    grown = total - old_total
+
+    uids = [i.get('oshwaUid') for i in existing]
+    try:
+        appends = uids.index(state.get('newest_uid')) >= len(uids) // 2
+    except ValueError:
+        appends = True
+    if appends:
+        start = max(0, old_total - SYNC_OVERLAP)
+        fetched = fetcher.fetch_range(start, total, total)
+    else:
+        fetched = fetcher.fetch_range(0, min(total, grown + SYNC_OVERLAP), total)
+    fetcher._print(f"incremental: total {old_total} -> {total}, fetched {len(fetched)} "
+                   f"from the {'end' if appends else 'start'} of the listing")
+
+    position = {uid: idx for idx, uid in enumerate(uids)}
+    merged = list(existing)
+    new = []
+    overlap = 0
+    for item in dedupe(fetched):
+        idx = position.get(item.get('oshwaUid'))
+        if idx is None:
+            new.append(item)
+        else:
+            overlap += 1
+            if record_date(item) >= record_date(merged[idx]):
+                merged[idx] = item
+    if len(new) != grown or (overlap == 0 and len(fetched) > grown):
+        fetcher._print(f"incremental: found {len(new)} new projects for a growth of {grown}, "
+                       f"{overlap} known; falling back to a full download")
+        return None
+    return (merged + new if appends else new + merged), total
 
-"""
+def sync_projects(fetcher, path, incremental=False) -> dict:
+    """
+    Refreshes the project list at `path` and writes the sync report next
+    to it (oshwa_parser.changes_path). Returns the report.
+    """
+    existing = read_items(path)
+    state = read_changes(path) or {}
+    synced = None
+    if incremental and existing is not None:
+        synced = incremental_items(fetcher, existing, state)
+    if synced is not None:
+        mode = "incremental"
+        items, total = synced
+        items = dedupe(items)
+    else:
+        mode = "full"
+        raw = fetcher.fetch_all()
+        total = len(raw)
+        check_duplicates(raw)
+        items = dedupe(raw)
 
+    added, changed, removed = diff_items(existing or [], items)
+    latest = newest(items) or {}
+    report = {
+        "synced_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "mode": mode,
+        "total": total,
+        "newest_uid": latest.get('oshwaUid'),
+        "newest_date": latest.get('certificationDate'),
+        "added": added,
+        "changed": changed,
+        "removed": removed,
+    }
+    if added or changed or removed or existing is None:
+        write_json_atomic(items, path)
+    write_json_atomic(report, changes_path(path))
+    return report
 
+def main():
+    parser = argparse.ArgumentParser(description="Download every OSHWA project record to a JSON file")
+    parser.add_argument("--output", default=OUTPUT_FILE, help="File to write the project list to")
+    parser.add_argument("--url", default=API_URL, help="Projects endpoint (e.g. a local util/fake_oshwa_api.py)")
+    parser.add_argument("--token-file", default=TOKEN_FILE, help="File holding the API token")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Pages fetched at the same time")
+    parser.add_argument("--limit", type=int, default=PAGE_LIMIT, help="Projects per page")
+    parser.add_argument("--retries", type=int, default=MAX_RETRIES, help="Retries per page before giving up")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Fetch only new projects and merge them into --output (full download if that is not possible)")
+    args = parser.parse_args()
 
-"""
->>> uniq = list(set(ids))
->>> len(uniq)
-3199
->>> 
->>> seen = set()
->>> dupes = set()
->>> for x in ids:
-...   if x in seen:
-...     dupes.add(x)
-...   else:
-...     seen.add(x)
-... 
->>> dupes
-{'US000046'}
+    started = time.perf_counter()
+    with ProjectFetcher(load_token(args.token_file), url=args.url, limit=args.limit, workers=args.workers,
+                        retries=args.retries) as fetcher:
+        try:
+            report = sync_projects(fetcher, args.output, incremental=args.incremental)
+        except FetchError as e:
+            sys.exit(f"Download failed, {args.output} left unchanged: {e}")
+    print(f"{report['mode']} sync of {args.output} in {time.perf_counter() - started:.1f}s "
+          f"({fetcher.requests} requests, {fetcher.retried} retried): {len(report['added'])} added, "
+          f"{len(report['changed'])} changed, {len(report['removed'])} removed", file=sys.stderr)
+    for key in ("added", "changed", "removed"):
+        if report[key]:
+            print(f"  {key}: {' '.join(report[key])}", file=sys.stderr)
 
-"""
\ No newline at end of file
+if __name__ == "__main__":
+    main()
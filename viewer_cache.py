@@ -0,0 +1,102 @@
+import threading
+from collections import OrderedDict
+
+DEFAULT_NEIGHBORS = 3 # Rows above and below the selection decoded ahead of time
+SPARE_IMAGES = 4 # Images kept beyond the selection window, for stepping back
+
+class ViewerImageCache(threading.Thread):
+    """
+    Decoded viewer-panel images for the selected row and its neighbours,
+    so moving through the list shows a new image without disk I/O or
+    scaling on the GUI thread.
+
+    select() names the row now shown and the rows around it, nearest
+    first; this thread decodes whichever of them are missing, selection
+    first, with `decode(uid)` (returning raw RGB bytes, or None if there is
+    no image yet). When the selected row's image arrives, `deliver(uid,
+    pixels)` is called on this thread and is responsible for hopping back
+    to the GUI. A new select() replaces the previous wish list, so only the
+    newest selection's work is done while the user holds an arrow key.
+    """
+
+    def __init__(self, decode, deliver, neighbors=DEFAULT_NEIGHBORS):
+        super().__init__(daemon=True)
+        self.decode = decode
+        self.deliver = deliver
+        self.neighbors = neighbors
+        self.capacity = 2 * neighbors + 1 + SPARE_IMAGES
+        self.hits = 0
+        self.misses = 0
+        self._images = OrderedDict() # uid -> RGB bytes, least recently used first
+        self._wanted = [] # uids still to decode, most urgent first
+        self._window = set() # The selection and its neighbours, as last passed to select()
+        self._selected = None
+        self._generations = {} # uid -> times invalidated; a decode started before a bump is dropped
+        self._cond = threading.Condition()
+
+    def get(self, uid):
+        with self._cond:
+            pixels = self._images.get(uid)
+            if pixels is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._images.move_to_end(uid)
+            return pixels
+
+    def select(self, uid, neighbor_uids):
+        with self._cond:
+            self._selected = uid
+            self._wanted = [uid] + [u for u in neighbor_uids if u != uid]
+            self._window = set(self._wanted)
+            self._cond.notify()
+
+    def invalidate(self, uid):
+        """Forgets uid's image, e.g. after a recapture; select() again to reload it."""
+        with self._cond:
+            self._images.pop(uid, None)
+            self._generations[uid] = self._generations.get(uid, 0) + 1
+
+    def _next_missing(self):
+        # Called with the lock held
+        while self._wanted:
+            uid = self._wanted.pop(0)
+            if uid not in self._images:
+                return uid
+        return None
+
+    def run(self):
+        while True:
+            with self._cond:
+                uid = self._next_missing()
+                while uid is None:
+                    self._cond.wait()
+                    uid = self._next_missing()
+                generation = self._generations.get(uid, 0)
+
+            try:
+                pixels = self.decode(uid)
+            except Exception as e:
+                print(f"Error decoding viewer image for {uid}: {e}")
+                pixels = None
+            if pixels is None:
+                continue
+
+            with self._cond:
+                if generation != self._generations.get(uid, 0):
+                    # May predate a recapture; decode the new one if the row is still wanted
+                    if uid == self._selected:
+                        self._wanted.insert(0, uid)
+                    elif uid in self._window and uid not in self._wanted:
+                        self._wanted.append(uid)
+                    continue
+                self._images[uid] = pixels
+                keep = set(self._wanted) | {self._selected}
+                for old in list(self._images):
+                    if len(self._images) <= self.capacity:
+                        break
+                    if old not in keep:
+                        del self._images[old]
+                selected = uid == self._selected
+            if selected:
+                self.deliver(uid, pixels)
@@ -0,0 +1,77 @@
+# Priorities handed to the screenshot worker for timer-driven fetches.
+# Lower values are served first; selection (5) and reload (0) stay ahead.
+VISIBLE_PRIORITY = 8
+LOOKAHEAD_PRIORITY = 10
+
+# Rows above and below the viewport that are fetched ahead of scrolling
+DEFAULT_LOOKAHEAD = 10
+
+class ViewportScheduler:
+    """
+    Decides which project rows deserve a thumbnail fetch, given the rows
+    currently on screen.
+
+    Rows in view get VISIBLE_PRIORITY, and up to `lookahead` siblings
+    before the first and after the last visible row get LOOKAHEAD_PRIORITY.
+    The caller passes a cheap signature of the viewport; when it matches the
+    previous tick, no planning is done at all. Siblings are taken in the
+    order the control shows them: `ordered(parent)` gives a category's
+    children sorted and filtered as on screen, and defaults to the model's
+    own child list.
+    """
+
+    def __init__(self, lookahead=DEFAULT_LOOKAHEAD):
+        self.lookahead = lookahead
+        self.last_signature = None
+
+    def changed(self, signature) -> bool:
+        if signature == self.last_signature:
+            return False
+        self.last_signature = signature
+        return True
+
+    def invalidate(self):
+        self.last_signature = None
+
+    def plan(self, visible_nodes, ordered=None) -> list:
+        """
+        Returns (node, priority) pairs for the visible project rows followed
+        by the lookahead window, nearest rows first.
+        """
+        rows = [n for n in visible_nodes if not n.is_category]
+        plan = [(n, VISIBLE_PRIORITY) for n in rows]
+        if not rows or self.lookahead <= 0:
+            return plan
+
+        seen = {id(n) for n in rows}
+        after = siblings(rows[-1], 1, self.lookahead, ordered)
+        before = siblings(rows[0], -1, self.lookahead, ordered)
+        # Interleave so the rows closest to either edge come first
+        for i in range(max(len(after), len(before))):
+            for side in (after, before):
+                if i < len(side) and id(side[i]) not in seen:
+                    seen.add(id(side[i]))
+                    plan.append((side[i], LOOKAHEAD_PRIORITY))
+        return plan
+
+def siblings(node, direction, count, ordered=None):
+    """
+    Up to `count` siblings after (direction > 0) or before node, nearest
+    first, in the order `ordered(parent)` returns (the child list by default).
+    """
+    if not node.parent:
+        return []
+    children = ordered(node.parent) if ordered else node.parent.children
+    try:
+        idx = next(i for i, n in enumerate(children) if n is node)
+    except StopIteration:
+        return []
+    if direction > 0:
+        return children[idx + 1:idx + 1 + count]
+    return children[max(0, idx - count):idx][::-1]
+
+def neighbors(node, count, ordered=None):
+    """Up to `count` siblings on each side of node, alternating after/before, nearest first."""
+    after = siblings(node, 1, count, ordered)
+    before = siblings(node, -1, count, ordered)
+    return [n for i in range(max(len(after), len(before))) for n in (after[i:i + 1] + before[i:i + 1])]
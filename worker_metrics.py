@@ -0,0 +1,200 @@
+import json
+import os
+import re
+import threading
+import time
+from collections import Counter, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Where a capture's time goes, in order. "queue" is from request to slot,
+# "acquire" getting a page, "process" the image pipeline, "store" writing
+# the atlas and manifest, "total" everything after the slot was granted.
+PHASES = ("queue", "acquire", "goto", "screenshot", "process", "store", "total")
+
+# Histogram bucket upper bounds in seconds; anything slower lands in +inf
+BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0)
+
+RATE_WINDOW = 60.0 # Seconds of completions behind "captures per minute"
+
+NET_ERROR = re.compile(r"net::ERR_[A-Z_]+")
+
+def error_kind(error) -> str:
+    """A short, groupable name for a capture failure, e.g. TimeoutError or Error net::ERR_NAME_NOT_RESOLVED."""
+    kind = type(error).__name__
+    match = NET_ERROR.search(str(error))
+    return f"{kind} {match.group(0)}" if match else kind
+
+class Histogram:
+    __slots__ = ("counts", "count", "total", "max")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        i = 0
+        while i < len(BUCKETS) and seconds > BUCKETS[i]:
+            i += 1
+        self.counts[i] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def quantile(self, q) -> float:
+        """Upper bound of the bucket holding the q-quantile (max for the overflow bucket)."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank and n:
+                return BUCKETS[i] if i < len(BUCKETS) else self.max
+        return self.max
+
+    def report(self) -> dict:
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else 0.0,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "max": self.max,
+            "buckets": {**{str(b): n for b, n in zip(BUCKETS, self.counts)}, "+inf": self.counts[-1]},
+        }
+
+class WorkerMetrics:
+    """
+    Counters for one screenshot worker: per-phase latency histograms,
+    cache hits and misses, failures by kind and a sliding captures-per-
+    minute rate. Updated from the worker's loop thread, read from any
+    thread through report().
+    """
+
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self.started = clock()
+        self.phases = {phase: Histogram() for phase in PHASES}
+        self.hits = 0
+        self.misses = 0
+        self.captured = 0
+        self.failed = 0
+        self.errors = Counter()
+        self._recent = deque() # Successful completion times within RATE_WINDOW
+        self._lock = threading.Lock()
+
+    def observe(self, phase, seconds):
+        with self._lock:
+            self.phases[phase].observe(seconds)
+
+    def hit(self):
+        with self._lock:
+            self.hits += 1
+
+    def miss(self):
+        with self._lock:
+            self.misses += 1
+
+    def error(self, kind):
+        with self._lock:
+            self.errors[kind] += 1
+
+    def completed(self, ok):
+        now = self.clock()
+        with self._lock:
+            if ok:
+                self.captured += 1
+                self._recent.append(now) # Failures are counted, not rated
+            else:
+                self.failed += 1
+            self._trim(now)
+
+    def _trim(self, now):
+        while self._recent and self._recent[0] < now - RATE_WINDOW:
+            self._recent.popleft()
+
+    def report(self) -> dict:
+        now = self.clock()
+        with self._lock:
+            self._trim(now)
+            # Over the uptime until a full window has passed, but never a tiny one
+            window = max(min(RATE_WINDOW, now - self.started), 1.0)
+            requests = self.hits + self.misses
+            return {
+                "uptime": now - self.started,
+                "captured": self.captured,
+                "failed": self.failed,
+                "per_minute": len(self._recent) / window * 60,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / requests if requests else 0.0,
+                "errors": dict(self.errors.most_common()),
+                "phases": {phase: h.report() for phase, h in self.phases.items() if h.count},
+            }
+
+class MetricsForwarder:
+    """
+    Stands in for WorkerMetrics inside a shard process: every update is
+    sent to the parent as ("metric", method, args) and replayed there on
+    the parent's WorkerMetrics.
+    """
+
+    def __init__(self, results):
+        self.results = results
+
+    def __getattr__(self, method):
+        if method not in ("observe", "hit", "miss", "error", "completed"):
+            raise AttributeError(method)
+        return lambda *args: self.results.put(("metric", method, args))
+
+def format_status(report) -> str:
+    """One status-bar line from a worker report()."""
+    parts = [f"{report['per_minute']:.1f} captures/min"]
+    if report.get("browser") is False:
+        parts.append("browser not running")
+    if "in_flight" in report:
+        parts.append(f"{report['in_flight']} in flight")
+    queued = report.get("queued") or {}
+    if queued:
+        parts.append("queued " + " ".join(f"p{p}:{n}" for p, n in sorted(queued.items())))
+    if report["hits"] + report["misses"]:
+        parts.append(f"cache hits {report['hit_rate']:.0%}")
+    for phase in ("goto", "process"):
+        stats = report["phases"].get(phase)
+        if stats:
+            parts.append(f"{phase} p50 {stats['p50']:g}s p95 {stats['p95']:g}s")
+    if report["failed"]:
+        top = ", ".join(f"{kind} {n}" for kind, n in list(report["errors"].items())[:2])
+        parts.append(f"{report['failed']} failed ({top})")
+    return " | ".join(parts)
+
+def dump_metrics(report, path):
+    """Writes a report as JSON, replacing `path` atomically."""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=1)
+    os.replace(tmp_path, path)
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?", 1)[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        body = json.dumps(self.server.report(), indent=1).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def serve_metrics(report, port):
+    """Serves report() as JSON at http://127.0.0.1:<port>/metrics from a daemon thread; returns the server."""
+    server = ThreadingHTTPServer(("127.0.0.1", port), _MetricsHandler)
+    server.daemon_threads = True
+    server.report = report
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server